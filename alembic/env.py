@@ -5,7 +5,7 @@ from alembic import context
 import os
 
 from app.database import Base
-from app.models import server  # noqa: F401
+from app.models import server, health, inventory  # noqa: F401
 
 config = context.config
 
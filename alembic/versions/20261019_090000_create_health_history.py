@@ -0,0 +1,45 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261019_090000"
+down_revision = "20250731_160037"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "health_samples",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("host", sa.String(length=255), nullable=False),
+        sa.Column("recorded_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("reachable", sa.Boolean(), nullable=False),
+        sa.Column("ssh_successful", sa.Boolean(), nullable=False),
+        sa.Column("rtt_ms", sa.Float(), nullable=True),
+        sa.Column("uptime_seconds", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_health_samples_host_recorded_at", "health_samples", ["host", "recorded_at"])
+
+    op.create_table(
+        "health_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("host", sa.String(length=255), nullable=False),
+        sa.Column("bucket_seconds", sa.Integer(), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+        sa.Column("reachable_count", sa.Integer(), nullable=False),
+        sa.Column("ssh_success_count", sa.Integer(), nullable=False),
+        sa.Column("rtt_sum_ms", sa.Float(), nullable=False),
+        sa.Column("rtt_count", sa.Integer(), nullable=False),
+        sa.Column("rtt_max_ms", sa.Float(), nullable=True),
+        sa.Column("last_uptime_seconds", sa.Float(), nullable=True),
+        sa.UniqueConstraint("host", "bucket_seconds", "bucket_start", name="uq_health_rollups_bucket"),
+    )
+    op.create_index("ix_health_rollups_lookup", "health_rollups", ["bucket_seconds", "bucket_start"])
+
+
+def downgrade():
+    op.drop_index("ix_health_rollups_lookup", table_name="health_rollups")
+    op.drop_table("health_rollups")
+    op.drop_index("ix_health_samples_host_recorded_at", table_name="health_samples")
+    op.drop_table("health_samples")
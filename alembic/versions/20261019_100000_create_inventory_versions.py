@@ -0,0 +1,19 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261019_100000"
+down_revision = "20261019_090000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "inventory_versions",
+        sa.Column("name", sa.String(length=64), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    op.drop_table("inventory_versions")
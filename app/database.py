@@ -1,7 +1,11 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from .metrics import DB_QUERY_SECONDS
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./servers.db")
 
 engine = create_engine(
@@ -13,6 +17,17 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_SECONDS.observe(elapsed, statement=statement.lstrip().split(None, 1)[0].upper())
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,41 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, Index, Integer, String, UniqueConstraint
+from ..database import Base
+
+
+class HealthSample(Base):
+    """One raw /healthz observation of a host. Append-only; pruned after retention."""
+
+    __tablename__ = "health_samples"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    host = Column(String(255), nullable=False)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    reachable = Column(Boolean, nullable=False)
+    ssh_successful = Column(Boolean, nullable=False)
+    rtt_ms = Column(Float, nullable=True)
+    uptime_seconds = Column(Float, nullable=True)
+
+    __table_args__ = (Index("ix_health_samples_host_recorded_at", "host", "recorded_at"),)
+
+
+class HealthRollup(Base):
+    """Pre-aggregated counters for one host over one hourly or daily bucket."""
+
+    __tablename__ = "health_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    host = Column(String(255), nullable=False)
+    bucket_seconds = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    reachable_count = Column(Integer, nullable=False, default=0)
+    ssh_success_count = Column(Integer, nullable=False, default=0)
+    rtt_sum_ms = Column(Float, nullable=False, default=0.0)
+    rtt_count = Column(Integer, nullable=False, default=0)
+    rtt_max_ms = Column(Float, nullable=True)
+    last_uptime_seconds = Column(Float, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("host", "bucket_seconds", "bucket_start", name="uq_health_rollups_bucket"),
+        Index("ix_health_rollups_lookup", "bucket_seconds", "bucket_start"),
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+from ..database import Base
+
+
+class InventoryVersion(Base):
+    """Monotonic change counter per inventory source, shared by all worker processes."""
+
+    __tablename__ = "inventory_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
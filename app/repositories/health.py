@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from ..models.health import HealthRollup, HealthSample
+from ..models.server import Server
+
+HOUR = 3600
+DAY = 86400
+ROLLUP_BUCKETS = (HOUR, DAY)
+
+
+def bucket_start(moment: datetime, bucket_seconds: int) -> datetime:
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % bucket_seconds, tz=timezone.utc)
+
+
+class HealthRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(self, samples: List[dict], recorded_at: Optional[datetime] = None) -> None:
+        """Append raw samples and fold them into the hourly and daily rollups.
+
+        Each sample is a dict with ``host``, ``reachable``, ``ssh_successful``
+        and optional ``rtt_ms``/``uptime_seconds``.
+        """
+        recorded_at = recorded_at or datetime.now(timezone.utc)
+        for sample in samples:
+            self.db.add(HealthSample(recorded_at=recorded_at, **sample))
+            for bucket_seconds in ROLLUP_BUCKETS:
+                self._fold(sample, bucket_seconds, bucket_start(recorded_at, bucket_seconds))
+        self.db.commit()
+
+    def _fold(self, sample: dict, bucket_seconds: int, start: datetime) -> None:
+        rollup = (
+            self.db.query(HealthRollup)
+            .filter(
+                HealthRollup.host == sample["host"],
+                HealthRollup.bucket_seconds == bucket_seconds,
+                HealthRollup.bucket_start == start,
+            )
+            .first()
+        )
+        if rollup is None:
+            rollup = HealthRollup(
+                host=sample["host"], bucket_seconds=bucket_seconds, bucket_start=start,
+                samples=0, reachable_count=0, ssh_success_count=0, rtt_sum_ms=0.0, rtt_count=0,
+            )
+            self.db.add(rollup)
+        rollup.samples += 1
+        rollup.reachable_count += int(bool(sample["reachable"]))
+        rollup.ssh_success_count += int(bool(sample["ssh_successful"]))
+        rtt = sample.get("rtt_ms")
+        if rtt is not None:
+            rollup.rtt_sum_ms += rtt
+            rollup.rtt_count += 1
+            rollup.rtt_max_ms = rtt if rollup.rtt_max_ms is None else max(rollup.rtt_max_ms, rtt)
+        if sample.get("uptime_seconds") is not None:
+            rollup.last_uptime_seconds = sample["uptime_seconds"]
+        self.db.flush()
+
+    def samples(self, host: str, since: datetime, until: datetime, limit: int = 1000) -> List[HealthSample]:
+        return (
+            self.db.query(HealthSample)
+            .filter(HealthSample.host == host, HealthSample.recorded_at >= since, HealthSample.recorded_at < until)
+            .order_by(HealthSample.recorded_at)
+            .limit(limit)
+            .all()
+        )
+
+    def availability(
+        self,
+        since: datetime,
+        until: datetime,
+        host: Optional[str] = None,
+        provider: Optional[str] = None,
+        role: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> Dict[str, dict]:
+        """Availability per host over [since, until), answered from rollups only.
+
+        Daily buckets are used for ranges of two days or more and hourly ones
+        otherwise; buckets overlapping either end of the range are included whole.
+        """
+        bucket_seconds = DAY if until - since >= timedelta(days=2) else HOUR
+        query = self.db.query(
+            HealthRollup.host,
+            func.sum(HealthRollup.samples),
+            func.sum(HealthRollup.reachable_count),
+            func.sum(HealthRollup.ssh_success_count),
+            func.sum(HealthRollup.rtt_sum_ms),
+            func.sum(HealthRollup.rtt_count),
+            func.max(HealthRollup.rtt_max_ms),
+        ).filter(
+            HealthRollup.bucket_seconds == bucket_seconds,
+            HealthRollup.bucket_start >= bucket_start(since, bucket_seconds),
+            HealthRollup.bucket_start < until,
+        )
+        if host:
+            query = query.filter(HealthRollup.host == host)
+        if provider or role or status:
+            query = query.join(
+                Server, or_(Server.hostname == HealthRollup.host, Server.public_ip == HealthRollup.host)
+            )
+            if provider:
+                query = query.filter(Server.provider == provider)
+            if role:
+                query = query.filter(Server.role == role)
+            if status:
+                query = query.filter(Server.status == status)
+
+        result = {}
+        for name, samples, reachable, ssh_ok, rtt_sum, rtt_count, rtt_max in query.group_by(HealthRollup.host):
+            result[name] = {
+                "samples": samples,
+                "reachable_ratio": round(reachable / samples, 4) if samples else None,
+                "ssh_success_ratio": round(ssh_ok / samples, 4) if samples else None,
+                "rtt_avg_ms": round(rtt_sum / rtt_count, 3) if rtt_count else None,
+                "rtt_max_ms": rtt_max,
+            }
+        return result
+
+    def prune(self, raw_before: datetime, hourly_before: Optional[datetime] = None) -> int:
+        """Drop raw samples (and optionally hourly rollups) older than the cut-offs."""
+        deleted = self.db.query(HealthSample).filter(HealthSample.recorded_at < raw_before).delete()
+        if hourly_before is not None:
+            deleted += (
+                self.db.query(HealthRollup)
+                .filter(HealthRollup.bucket_seconds == HOUR, HealthRollup.bucket_start < hourly_before)
+                .delete()
+            )
+        self.db.commit()
+        return deleted
@@ -0,0 +1,34 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models.inventory import InventoryVersion
+
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+_UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class InventoryVersionRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, name: str) -> int:
+        row = self.db.get(InventoryVersion, name)
+        return row.version if row else 0
+
+    def bump(self, name: str, commit: bool = True) -> None:
+        """Atomically increment the counter for ``name``, creating it on first use.
+
+        One upsert statement, so workers bumping a new counter at the same
+        time cannot both try to insert it.
+        """
+        insert = _UPSERTS[self.db.get_bind().dialect.name]
+        self.db.execute(
+            insert(InventoryVersion)
+            .values(name=name, version=1)
+            .on_conflict_do_update(
+                index_elements=[InventoryVersion.name], set_={"version": InventoryVersion.version + 1}
+            )
+        )
+        if commit:
+            self.db.commit()
@@ -15,7 +15,7 @@ class ServerRepository:
     def list(
         self,
         skip: int = 0,
-        limit: int = 100,
+        limit: Optional[int] = 100,
         provider: Optional[str] = None,
         role: Optional[str] = None,
         status: Optional[str] = None,
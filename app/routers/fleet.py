@@ -0,0 +1,151 @@
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal, get_db
+from ..models.server import Server
+from ..repositories.server import ServerRepository
+from ..schemas.fleet import FleetEditRequest, FleetEditResponse, FleetGrepRequest, LogTailRequest, ServerSelector
+from ..services.collector import collector
+from ..services.fleet_edit import edit_fleet
+from ..services.fleet_grep import fleet_grep
+from ..services.fleet_stream import FleetStream
+from ..services.log_tail import fleet_tail
+from ..ssh.broker import broker_client
+from ..ssh.client import find_server
+
+router = APIRouter(prefix="/fleet", tags=["fleet"])
+# WebSocket routes; included with their own API key check since header
+# dependencies like APIKeyHeader only work on HTTP requests
+ws_router = APIRouter(prefix="/fleet", tags=["fleet"])
+
+
+def resolve_servers(selector: ServerSelector, db: Session) -> List[Server]:
+    """Return the servers named explicitly, or those matching the filters."""
+    if selector.servers:
+        return [find_server(db, name) for name in selector.servers]
+    if not (selector.provider or selector.role or selector.status):
+        raise HTTPException(status_code=400, detail="Specify servers or at least one filter")
+    repo = ServerRepository(db)
+    return repo.list(
+        limit=None, provider=selector.provider, role=selector.role, status=selector.status
+    )
+
+
+def resolve_targets(selector: ServerSelector) -> List[Tuple[str, Optional[dict]]]:
+    """(hostname, tags) of the selected servers, from a session closed right away.
+
+    Streaming endpoints use this so a long-lived stream does not keep a
+    database connection checked out.
+    """
+    db = SessionLocal()
+    try:
+        return [(server.hostname, server.tags) for server in resolve_servers(selector, db)]
+    finally:
+        db.close()
+
+
+@router.post("/edit", response_model=FleetEditResponse)
+def edit_file_across_fleet(request: FleetEditRequest, db: Session = Depends(get_db)):
+    """Apply a YAML or text edit set to ``path`` on every selected server."""
+    servers = resolve_servers(request, db)
+    targets = [(server.hostname, server.tags) for server in servers]
+    if broker_client is not None:
+        # SFTP needs the SSH session, so the edit runs where the sessions live
+        return FleetEditResponse(dry_run=request.dry_run, results=broker_client.edit_fleet(targets, request))
+    return FleetEditResponse(dry_run=request.dry_run, results=edit_fleet(targets, request))
+
+
+def metrics_collector():
+    """The collector holding fleet metrics: the broker's when there is one, else this worker's."""
+    return broker_client if broker_client is not None else collector
+
+
+@router.post("/metrics/collect")
+def collect_fleet_metrics(selector: ServerSelector, db: Session = Depends(get_db)):
+    """Run one collection cycle on the selected servers now."""
+    servers = resolve_servers(selector, db)
+    return {"results": metrics_collector().collect_once([(server.hostname, server.tags) for server in servers])}
+
+
+@router.get("/metrics")
+def latest_fleet_metrics():
+    """Most recent sample for every host the collector has seen."""
+    return {"hosts": metrics_collector().latest()}
+
+
+@router.get("/metrics/{hostname}")
+def host_metrics_series(hostname: str, since: Optional[float] = None):
+    """Buffered samples for one host, oldest first, optionally newer than ``since`` (epoch seconds)."""
+    source = metrics_collector()
+    series = source.series(hostname, since)
+    if not series and hostname not in source.latest():
+        raise HTTPException(status_code=404, detail="No metrics for this host")
+    return {"host": hostname, "fields": list(series[0].keys()) if series else [], "samples": series}
+
+
+async def sse_events(stream: FleetStream) -> AsyncIterator[str]:
+    """Server-sent events for ``stream``, with comment lines as keepalives."""
+    async for event in stream.events():
+        yield ": keepalive\n\n" if event is None else f"data: {json.dumps(event)}\n\n"
+
+
+def tail_stream(request: LogTailRequest) -> FleetStream:
+    return fleet_tail(resolve_targets(request), request.paths, request.lines, request.pattern)
+
+
+@router.post("/logs/tail")
+def tail_fleet_logs(request: LogTailRequest):
+    """Follow ``paths`` on every selected server as one server-sent event stream.
+
+    Each event is ``{"host", "file", "line"}``; a host that cannot be reached
+    yields an ``error`` event instead. The stream runs until the client
+    disconnects.
+    """
+    stream = tail_stream(request)
+    return StreamingResponse(sse_events(stream), media_type="text/event-stream")
+
+
+@ws_router.websocket("/logs/tail/ws")
+async def tail_fleet_logs_ws(websocket: WebSocket):
+    """WebSocket form of ``/fleet/logs/tail``: send the request as the first message, receive events as JSON."""
+    await websocket.accept()
+    try:
+        request = LogTailRequest.model_validate(await websocket.receive_json())
+        stream = await run_in_threadpool(tail_stream, request)
+    except (ValidationError, ValueError) as error:
+        await websocket.close(code=1003, reason=str(error)[:120])
+        return
+    except HTTPException as error:
+        await websocket.close(code=1008, reason=str(error.detail)[:120])
+        return
+    try:
+        async for event in stream.events():
+            await websocket.send_json({"heartbeat": True} if event is None else event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.post("/grep")
+def grep_fleet(request: FleetGrepRequest):
+    """Search ``paths`` on every selected server, streaming matches as server-sent events.
+
+    Filtering runs on the hosts, so only matching lines are transferred. Each
+    match is ``{"host", "file", "line_number", "line"}``; a host that hits
+    ``max_matches`` ends with a ``truncated`` event, otherwise with its
+    ``exit_status`` (1 means no matches).
+    """
+    stream = fleet_grep(
+        resolve_targets(request),
+        request.pattern,
+        request.paths,
+        request.ignore_case,
+        request.max_matches,
+        request.concurrency,
+    )
+    return StreamingResponse(sse_events(stream), media_type="text/event-stream")
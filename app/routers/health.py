@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..repositories.health import HealthRepository
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/availability")
+def availability(
+    days: float = Query(7, gt=0),
+    host: Optional[str] = None,
+    provider: Optional[str] = None,
+    role: Optional[str] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Availability per host and overall for the last ``days``, from precomputed rollups."""
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(days=days)
+    hosts = HealthRepository(db).availability(
+        since, until, host=host, provider=provider, role=role, status=status
+    )
+    total = sum(h["samples"] for h in hosts.values())
+    overall = {
+        "samples": total,
+        "reachable_ratio": round(sum(h["reachable_ratio"] * h["samples"] for h in hosts.values()) / total, 4)
+        if total else None,
+        "ssh_success_ratio": round(sum(h["ssh_success_ratio"] * h["samples"] for h in hosts.values()) / total, 4)
+        if total else None,
+    }
+    return {"since": since, "until": until, "overall": overall, "hosts": hosts}
+
+
+@router.get("/history/{host}")
+def history(
+    host: str,
+    hours: float = Query(24, gt=0),
+    limit: int = Query(1000, gt=0, le=10000),
+    db: Session = Depends(get_db),
+):
+    """Raw health samples for one host over the last ``hours``."""
+    until = datetime.now(timezone.utc)
+    samples = HealthRepository(db).samples(host, until - timedelta(hours=hours), until, limit=limit)
+    return {
+        "host": host,
+        "samples": [
+            {
+                "recorded_at": s.recorded_at,
+                "reachable": s.reachable,
+                "ssh_successful": s.ssh_successful,
+                "rtt_ms": s.rtt_ms,
+                "uptime_seconds": s.uptime_seconds,
+            }
+            for s in samples
+        ],
+    }
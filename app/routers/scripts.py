@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Body, HTTPException
+
+from ..services.scripts import check_digest, script_store
+
+router = APIRouter(prefix="/scripts", tags=["scripts"])
+
+
+@router.post("")
+def upload_script(content: str = Body(..., embed=True)):
+    """Store a script and return the hash to run it by via ``/ssh_execute/script``."""
+    encoded = content.encode()
+    return {"sha256": script_store.put(encoded), "size": len(encoded)}
+
+
+@router.get("/{sha256}")
+def script_exists(sha256: str):
+    """Whether a script is stored, so clients can skip re-uploading it."""
+    if not script_store.exists(check_digest(sha256)):
+        raise HTTPException(status_code=404, detail="Script not found")
+    return {"sha256": sha256}
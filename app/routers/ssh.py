@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal, get_db
+from ..schemas.fleet import ServerSelector
+from ..services import warmup
+from ..ssh.breaker import breakers
+from ..ssh.broker import broker_client
+from ..ssh.client import find_server
+from ..ssh.shell import shell_relay
+from ..ssh.timeouts import latency_history
+from .fleet import resolve_servers
+
+router = APIRouter(prefix="/ssh", tags=["ssh"])
+# WebSocket routes, included with the WebSocket API key check
+ws_router = APIRouter(prefix="/ssh", tags=["ssh"])
+
+
+@router.get("/breakers")
+def list_breakers():
+    """Circuit breaker state for every host with recent connection failures."""
+    if broker_client is not None:
+        # Connections (and so breakers) live in the shared broker process
+        return {"breakers": broker_client.call("breakers")}
+    return {"breakers": breakers.snapshot()}
+
+
+@router.delete("/breakers/{hostname}")
+def reset_breaker(hostname: str):
+    """Close ``hostname``'s circuit so the next request tries to connect again."""
+    if broker_client is not None:
+        reset = broker_client.call("reset_breaker", hostname)
+    else:
+        reset = breakers.reset(hostname)
+    if not reset:
+        raise HTTPException(status_code=404, detail="No circuit breaker for this host")
+    return {"message": f"Circuit breaker for '{hostname}' reset."}
+
+
+@router.get("/timeouts/{server_name}")
+def host_timeouts(server_name: str, db: Session = Depends(get_db)):
+    """Adaptive SSH timeouts currently applied to a server and the latency history behind them."""
+    server = find_server(db, server_name)
+    if broker_client is not None:
+        return broker_client.call("timeouts", server.hostname, server.tags)
+    return latency_history.describe(server.hostname, server.tags)
+
+
+@router.get("/warmup")
+def warmup_report():
+    """Result of the most recent SSH warm-up (startup or manual)."""
+    if warmup.last_report is None:
+        raise HTTPException(status_code=404, detail="No warm-up has run yet")
+    return warmup.last_report
+
+
+@router.post("/warmup")
+def warm_up_servers(selector: ServerSelector, db: Session = Depends(get_db)):
+    """Open pooled SSH sessions to the selected servers now and report how long it took."""
+    servers = resolve_servers(selector, db)
+    return warmup.warm_up_targets([(server.hostname, server.tags) for server in servers])
+
+
+def shell_target(server_name: str) -> tuple:
+    """(hostname, tags) of a server, from a session closed before the shell starts."""
+    db = SessionLocal()
+    try:
+        server = find_server(db, server_name)
+        return server.hostname, server.tags
+    finally:
+        db.close()
+
+
+@ws_router.websocket("/shell/{server_name}")
+async def interactive_shell(
+    websocket: WebSocket,
+    server_name: str,
+    term: str = "xterm-256color",
+    cols: int = Query(80, ge=1, le=1000),
+    rows: int = Query(24, ge=1, le=1000),
+):
+    """Interactive PTY shell on a server; see ``app.ssh.shell`` for the framing.
+
+    The server is looked up in a short-lived database session, so open
+    shells do not hold database connections.
+    """
+    await websocket.accept()
+    try:
+        hostname, tags = await run_in_threadpool(shell_target, server_name)
+        async with shell_relay.open(hostname, tags, term, cols, rows) as channel:
+            exit_status = await shell_relay.relay(websocket, channel)
+        if exit_status is not None:
+            await websocket.send_json({"type": "exit", "status": exit_status})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as error:
+        code = status.WS_1013_TRY_AGAIN_LATER if error.status_code == 503 else status.WS_1008_POLICY_VIOLATION
+        await websocket.close(code=code, reason=str(error.detail)[:120])
+    except Exception as error:
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason=f"SSH shell error: {error}"[:120])
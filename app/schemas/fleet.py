@@ -0,0 +1,50 @@
+from typing import Any, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class ServerSelector(BaseModel):
+    """Targets either an explicit list of servers or an inventory filter."""
+
+    servers: List[str] = []  # hostnames or public IPs
+    provider: Optional[str] = None
+    role: Optional[str] = None
+    status: Optional[str] = None
+
+
+class FleetEditRequest(ServerSelector):
+    path: str
+    kind: Literal["yaml", "text"] = "yaml"
+    # yaml: YamlEditor.apply_patch entries ({"op", "path", "value"})
+    # text: FileEditor.apply_edits entries ([operation, *arguments])
+    edits: List[Any]
+    dry_run: bool = True
+    concurrency: int = Field(default=16, ge=1, le=128)
+
+
+class LogTailRequest(ServerSelector):
+    paths: List[str]
+    # Extended regex applied on each host, so only matching lines cross the network
+    pattern: Optional[str] = None
+    lines: int = Field(default=10, ge=0, le=10000)
+
+
+class FleetGrepRequest(ServerSelector):
+    pattern: str  # extended regex
+    paths: List[str]  # files or directories, searched recursively
+    ignore_case: bool = False
+    # Matches returned per host before its search is cut off
+    max_matches: int = Field(default=1000, ge=1, le=10000)
+    concurrency: int = Field(default=32, ge=1, le=128)
+
+
+class HostEditResult(BaseModel):
+    server: str
+    changed: bool = False
+    written: bool = False
+    diff: str = ""
+    error: Optional[str] = None
+
+
+class FleetEditResponse(BaseModel):
+    dry_run: bool
+    results: List[HostEditResult]
@@ -0,0 +1,255 @@
+"""Fleet metrics collector.
+
+Each cycle runs one composite probe script per host over a pooled SSH
+session, parses the sections it prints, and appends the numbers to a
+fixed-size, array-backed ring buffer per host.
+"""
+
+import os
+import socket
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..database import SessionLocal
+from ..repositories.server import ServerRepository
+from ..ssh.pool import SSHPool, ssh_pool
+from ..ssh.timeouts import latency_history
+
+# Probe timeout for hosts without a command_timeout tag, so a hung host
+# cannot hold its collector slot forever
+COLLECTOR_PROBE_TIMEOUT = float(os.getenv("COLLECTOR_PROBE_TIMEOUT", "30"))
+
+# Sections are delimited by "@@name" marker lines so a single exec channel
+# returns everything; missing tools simply leave a section empty.
+PROBE_SCRIPT = "; ".join([
+    "echo @@hostname", "hostname",
+    "echo @@uptime", "cat /proc/uptime",
+    "echo @@loadavg", "cat /proc/loadavg",
+    "echo @@meminfo", "cat /proc/meminfo",
+    "echo @@stat", "head -n 1 /proc/stat",
+    "echo @@df", "df -P -k / 2>/dev/null",
+])
+
+FIELDS = (
+    "timestamp",
+    "uptime_seconds",
+    "load1",
+    "load5",
+    "load15",
+    "cpu_percent",
+    "mem_total_kb",
+    "mem_available_kb",
+    "mem_used_percent",
+    "swap_used_percent",
+    "disk_used_percent",
+)
+
+NAN = float("nan")
+
+
+def split_sections(output: str) -> Dict[str, List[str]]:
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in output.splitlines():
+        if line.startswith("@@"):
+            current = sections.setdefault(line[2:].strip(), [])
+        elif current is not None and line.strip():
+            current.append(line)
+    return sections
+
+
+def parse_probe_output(output: str) -> dict:
+    """Turn the probe script's output into a flat metrics dict.
+
+    ``cpu_total``/``cpu_idle`` are cumulative jiffies; CPU percent is derived
+    from two consecutive samples by the collector.
+    """
+    sections = split_sections(output)
+    sample = {name: NAN for name in FIELDS}
+    sample["timestamp"] = time.time()
+    sample["hostname"] = sections.get("hostname", [""])[0].strip()
+
+    if sections.get("uptime"):
+        sample["uptime_seconds"] = float(sections["uptime"][0].split()[0])
+    if sections.get("loadavg"):
+        parts = sections["loadavg"][0].split()
+        sample["load1"], sample["load5"], sample["load15"] = (float(v) for v in parts[:3])
+
+    meminfo = {}
+    for line in sections.get("meminfo", []):
+        key, _, rest = line.partition(":")
+        if rest.split():
+            meminfo[key] = float(rest.split()[0])
+    if meminfo.get("MemTotal"):
+        sample["mem_total_kb"] = meminfo["MemTotal"]
+        available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0.0))
+        sample["mem_available_kb"] = available
+        sample["mem_used_percent"] = round(100.0 * (1 - available / meminfo["MemTotal"]), 2)
+    if meminfo.get("SwapTotal"):
+        sample["swap_used_percent"] = round(100.0 * (1 - meminfo.get("SwapFree", 0.0) / meminfo["SwapTotal"]), 2)
+
+    if sections.get("stat"):
+        jiffies = [float(v) for v in sections["stat"][0].split()[1:]]
+        sample["cpu_total"] = sum(jiffies)
+        # idle + iowait
+        sample["cpu_idle"] = jiffies[3] + (jiffies[4] if len(jiffies) > 4 else 0.0)
+
+    df_lines = sections.get("df", [])
+    if len(df_lines) >= 2:
+        parts = df_lines[-1].split()
+        used, available = float(parts[2]), float(parts[3])
+        if used + available:
+            sample["disk_used_percent"] = round(100.0 * used / (used + available), 2)
+    return sample
+
+
+class RingBuffer:
+    """Fixed-capacity columnar store of float samples (one ``array('d')`` per field)."""
+
+    def __init__(self, capacity: int, fields: Tuple[str, ...] = FIELDS):
+        self.capacity = capacity
+        self.fields = fields
+        self._columns = {name: array("d", [NAN]) * capacity for name in fields}
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, sample: Dict[str, float]):
+        for name in self.fields:
+            self._columns[name][self._next] = sample.get(name, NAN)
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def rows(self, since: Optional[float] = None) -> List[Dict[str, Optional[float]]]:
+        """Return samples oldest-first, optionally only those newer than ``since``."""
+        start = (self._next - self._size) % self.capacity
+        rows = []
+        for offset in range(self._size):
+            index = (start + offset) % self.capacity
+            if since is not None and self._columns["timestamp"][index] <= since:
+                continue
+            rows.append({
+                name: (None if value != value else value)  # NaN -> None for JSON
+                for name, value in ((name, self._columns[name][index]) for name in self.fields)
+            })
+        return rows
+
+
+def inventory_targets(status: str = "online") -> List[Tuple[str, Optional[dict]]]:
+    """(hostname, tags) for every inventory server with the given status."""
+    db = SessionLocal()
+    try:
+        return [(server.hostname, server.tags) for server in ServerRepository(db).list(limit=None, status=status)]
+    finally:
+        db.close()
+
+
+class FleetCollector:
+    """Collects host metrics for a set of targets, once or on an interval."""
+
+    def __init__(
+        self,
+        capacity: int = 720,
+        pool: SSHPool = ssh_pool,
+        max_workers: int = 32,
+        probe_timeout: float = COLLECTOR_PROBE_TIMEOUT,
+    ):
+        self.capacity = capacity
+        self.pool = pool
+        self.max_workers = max_workers
+        self.probe_timeout = probe_timeout
+        self._buffers: Dict[str, RingBuffer] = {}
+        self._latest: Dict[str, dict] = {}
+        self._cpu: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def collect_host(self, hostname: str, tags: Optional[dict]) -> dict:
+        """Run the probe script on one host and record the result.
+
+        A broken transport is dropped by ``pool.session``; other failures,
+        including unparsable output, leave the host's transports (and any
+        shells or tails on them) alone.
+        """
+        timeout = latency_history.timeouts(hostname, tags).command or self.probe_timeout
+        try:
+            with self.pool.session(hostname, tags) as client:
+                _, stdout, _ = client.exec_command(PROBE_SCRIPT, timeout=timeout)
+                try:
+                    output = stdout.read()
+                except socket.timeout:
+                    stdout.channel.close()
+                    raise HTTPException(status_code=504, detail=f"Probe on {hostname} timed out after {timeout:g}s")
+        except HTTPException as error:
+            return {"host": hostname, "ok": False, "error": str(error.detail)}
+        except Exception as error:
+            return {"host": hostname, "ok": False, "error": f"{type(error).__name__}: {error}"}
+        try:
+            sample = parse_probe_output(output.decode(errors="replace"))
+        except (ValueError, IndexError) as error:
+            return {"host": hostname, "ok": False, "error": f"Unparsable probe output: {error}"}
+
+        with self._lock:
+            previous = self._cpu.get(hostname)
+            if "cpu_total" in sample:
+                total, idle = sample.pop("cpu_total"), sample.pop("cpu_idle")
+                if previous and total > previous[0]:
+                    sample["cpu_percent"] = round(100.0 * (1 - (idle - previous[1]) / (total - previous[0])), 2)
+                self._cpu[hostname] = (total, idle)
+            buffer = self._buffers.get(hostname)
+            if buffer is None:
+                buffer = self._buffers[hostname] = RingBuffer(self.capacity)
+            buffer.append(sample)
+            self._latest[hostname] = {k: (None if isinstance(v, float) and v != v else v) for k, v in sample.items()}
+        return {"host": hostname, "ok": True}
+
+    def collect_once(self, targets: Iterable[Tuple[str, Optional[dict]]]) -> List[dict]:
+        targets = list(targets)
+        if not targets:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets))) as executor:
+            return list(executor.map(lambda target: self.collect_host(*target), targets))
+
+    def latest(self) -> Dict[str, dict]:
+        with self._lock:
+            return dict(self._latest)
+
+    def series(self, hostname: str, since: Optional[float] = None) -> List[dict]:
+        with self._lock:
+            buffer = self._buffers.get(hostname)
+            return buffer.rows(since) if buffer else []
+
+    def start(self, interval: float, targets: Callable[[], Iterable[Tuple[str, Optional[dict]]]]):
+        """Collect from ``targets()`` every ``interval`` seconds in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.collect_once(targets())
+                except Exception:
+                    pass
+                self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+        self._thread = threading.Thread(target=loop, name="fleet-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+collector = FleetCollector()
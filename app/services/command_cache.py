@@ -0,0 +1,114 @@
+"""Opt-in cache for remote command results.
+
+Callers ask for a result no older than ``max_age`` seconds. Fresh results are
+served from a size-bounded LRU; otherwise the first caller runs the command
+and any identical requests arriving meanwhile wait for and share its result
+(single-flight), so N concurrent requests cause one remote execution.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from ..metrics import COMMAND_CACHE_REQUESTS
+
+COMMAND_CACHE_ENTRIES = int(os.getenv("COMMAND_CACHE_ENTRIES", "1024"))
+COMMAND_CACHE_BYTES = int(os.getenv("COMMAND_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+
+class _Flight:
+    """A remote execution in progress that identical requests can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def output_size(value: Tuple[list, float]) -> int:
+    """Approximate size in bytes of an ``(output lines, queue wait)`` result."""
+    return sum(len(line) for line in value[0])
+
+
+class ResultCache:
+    """LRU of results bounded by entry count and total size, with single-flight misses.
+
+    Failed executions are never cached, but waiters of a failing flight get
+    the same error.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = COMMAND_CACHE_ENTRIES,
+        max_bytes: int = COMMAND_CACHE_BYTES,
+        sizeof: Callable[[Any], int] = output_size,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        # key -> (stored at, value, size)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: Hashable, value: Any):
+        """Insert ``value`` and evict least recently used entries; called with the lock held."""
+        size = self._sizeof(value)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic(), value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def get_or_run(self, key: Hashable, max_age: float, run: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return ``(value, cached)``, calling ``run()`` only if no fresh value or flight exists."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= max_age:
+                self._entries.move_to_end(key)
+                COMMAND_CACHE_REQUESTS.inc(result="hit")
+                return entry[1], True
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            COMMAND_CACHE_REQUESTS.inc(result="coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        COMMAND_CACHE_REQUESTS.inc(result="miss")
+        try:
+            flight.value = run()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+command_cache = ResultCache()
@@ -0,0 +1,100 @@
+"""Apply YamlEditor/FileEditor edit sets to a file on many servers over SFTP."""
+
+import difflib
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from file_editor import FileEditor
+from yaml_editor import YamlEditor
+from ..schemas.fleet import FleetEditRequest, HostEditResult
+from ..ssh.pool import SSHPool, ssh_pool
+
+
+def apply_local_edits(local_path: str, kind: str, edits: list):
+    """Run the edit set against a local copy of the file."""
+    if kind == "yaml":
+        YamlEditor(local_path).apply_patch(edits)
+    else:
+        FileEditor.apply_edits(local_path, edits)
+
+
+def edit_remote_file(
+    hostname: str,
+    tags: Optional[dict],
+    request: FleetEditRequest,
+    pool: SSHPool = ssh_pool,
+) -> HostEditResult:
+    """Read the remote file once, edit a local copy, and write it back once.
+
+    The new content is uploaded to a uniquely named sibling temp path, given
+    the original's mode, owner and group, and renamed over the original so
+    readers on the host never see a partial file.
+    """
+    result = HostEditResult(server=hostname)
+    try:
+        with pool.session(hostname, tags) as client, client.open_sftp() as sftp:
+            with sftp.open(request.path, "rb") as remote_file:
+                original = remote_file.read()
+
+            fd, local_path = tempfile.mkstemp(suffix=os.path.splitext(request.path)[1])
+            try:
+                with os.fdopen(fd, "wb") as local_file:
+                    local_file.write(original)
+                apply_local_edits(local_path, request.kind, request.edits)
+                with open(local_path, "rb") as local_file:
+                    updated = local_file.read()
+            finally:
+                os.unlink(local_path)
+
+            result.changed = updated != original
+            result.diff = "".join(
+                difflib.unified_diff(
+                    original.decode(errors="replace").splitlines(keepends=True),
+                    updated.decode(errors="replace").splitlines(keepends=True),
+                    fromfile=f"{hostname}:{request.path}",
+                    tofile=f"{hostname}:{request.path}",
+                )
+            )
+            if result.changed and not request.dry_run:
+                # Unique so concurrent edits of the same file cannot clobber each other's upload
+                temp_path = f"{request.path}.vpsmanager.{uuid.uuid4().hex}.tmp"
+                st = sftp.stat(request.path)
+                try:
+                    with sftp.open(temp_path, "wb") as remote_file:
+                        remote_file.write(updated)
+                    sftp.chown(temp_path, st.st_uid, st.st_gid)
+                    sftp.chmod(temp_path, st.st_mode & 0o7777)
+                    sftp.posix_rename(temp_path, request.path)
+                except Exception:
+                    try:
+                        sftp.remove(temp_path)
+                    except OSError:
+                        pass
+                    raise
+                result.written = True
+    except HTTPException as error:
+        result.error = str(error.detail)
+    except Exception as error:
+        result.error = f"{type(error).__name__}: {error}"
+    return result
+
+
+def edit_fleet(
+    targets: List[Tuple[str, Optional[dict]]],
+    request: FleetEditRequest,
+    pool: SSHPool = ssh_pool,
+) -> List[HostEditResult]:
+    """Edit the file on every (hostname, tags) target concurrently."""
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(request.concurrency, len(targets))) as executor:
+        futures = [
+            executor.submit(edit_remote_file, hostname, tags, request, pool)
+            for hostname, tags in targets
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,71 @@
+"""Search files across the fleet, filtering on each host.
+
+Every host runs one search over all requested paths and only matching lines
+come back. ``rg`` is used when installed, then ``grep``; hosts with neither
+get a small ``find``/``awk`` helper sent along with the command. Paths are
+searched recursively and the pattern is an extended regex in every case.
+"""
+
+import os
+import shlex
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .fleet_stream import FleetStream, StreamJob
+
+FLEET_GREP_MAX_MATCHES = int(os.getenv("FLEET_GREP_MAX_MATCHES", "1000"))
+FLEET_GREP_CONCURRENCY = int(os.getenv("FLEET_GREP_CONCURRENCY", "32"))
+
+# Prints "<file>\0<line number>:<line>" like grep -Z/rg --null, so file
+# names containing ":" parse unambiguously. The pattern arrives through the
+# environment because "awk -v" would expand its backslash escapes ("\." -> ".").
+_AWK_HELPER = (
+    'BEGIN { pat = ENVIRON["VPSMANAGER_GREP_PATTERN"]; if (icase) pat = tolower(pat) } '
+    '(icase ? tolower($0) : $0) ~ pat { printf "%s%c%d:%s\\n", FILENAME, 0, FNR, $0 }'
+)
+
+
+def grep_command(pattern: str, paths: List[str], ignore_case: bool = False, max_matches: Optional[int] = None) -> str:
+    """Shell command that prints matches of ``pattern`` under ``paths`` as ``file\\0line:text``."""
+    if not paths:
+        raise HTTPException(status_code=400, detail="Specify at least one path to search")
+    quoted_pattern = shlex.quote(pattern)
+    quoted_paths = " ".join(shlex.quote(path) for path in paths)
+    case = " -i" if ignore_case else ""
+    # Per-file cap so one huge file cannot use up the host's whole budget on the remote side
+    limit = f" -m {int(max_matches)}" if max_matches else ""
+    awk = f"awk -v icase={int(ignore_case)} {shlex.quote(_AWK_HELPER)}"
+    return (
+        "if command -v rg >/dev/null 2>&1; then "
+        f"rg --no-heading --with-filename --line-number --null --no-messages --color never{case}{limit}"
+        f" -e {quoted_pattern} -- {quoted_paths}; "
+        "elif command -v grep >/dev/null 2>&1; then "
+        f"grep -rHnZsE{case}{limit} -e {quoted_pattern} -- {quoted_paths}; "
+        f"else VPSMANAGER_GREP_PATTERN={quoted_pattern} find {quoted_paths} -type f -exec {awk} {{}} + 2>/dev/null; fi"
+    )
+
+
+def parse_match(job: StreamJob, raw: str) -> Optional[dict]:
+    path, separator, rest = raw.partition("\0")
+    number, colon, text = rest.partition(":")
+    if not separator or not colon or not number.isdigit():
+        return None
+    return {**job.fields, "file": path, "line_number": int(number), "line": text}
+
+
+def fleet_grep(
+    targets: List[Tuple[str, Optional[dict]]],
+    pattern: str,
+    paths: List[str],
+    ignore_case: bool = False,
+    max_matches: int = FLEET_GREP_MAX_MATCHES,
+    concurrency: int = FLEET_GREP_CONCURRENCY,
+) -> FleetStream:
+    """A stream of ``{"host", "file", "line_number", "line"}`` matches, at most ``max_matches`` per host."""
+    command = grep_command(pattern, paths, ignore_case, max_matches)
+    jobs = [
+        StreamJob(hostname, tags, command, {"host": hostname}, max_lines=max_matches)
+        for hostname, tags in targets
+    ]
+    return FleetStream(jobs, parse=parse_match, concurrency=concurrency)
@@ -0,0 +1,197 @@
+"""Merge the output of long-running remote commands into one stream.
+
+Each job runs one command on its own channel of the host's pooled transport
+and is read by a thread that splits the output into lines and tags them with
+the job's fields (host, file, ...). All jobs of a stream share one bounded
+buffer of ``FLEET_STREAM_BUFFER`` events: when a slow client lets it fill
+up, readers stop pulling from their channels, SSH flow control pauses the
+remote commands, and memory stays bounded instead of growing with the lag.
+Lines longer than ``FLEET_STREAM_MAX_LINE`` bytes (binary files, runaway
+output without newlines) are cut there and flagged ``line_truncated``.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+from fastapi import HTTPException
+
+from ..ssh.broker import BrokerClient, session_owner
+from ..ssh.pool import SSHPool
+
+FLEET_STREAM_BUFFER = int(os.getenv("FLEET_STREAM_BUFFER", "1000"))
+FLEET_STREAM_MAX_JOBS = int(os.getenv("FLEET_STREAM_MAX_JOBS", "256"))
+FLEET_STREAM_MAX_LINE = int(os.getenv("FLEET_STREAM_MAX_LINE", str(64 * 1024)))
+
+# How often blocked readers check whether the stream was closed
+_POLL_SECONDS = 0.5
+
+_DONE = object()
+
+
+@dataclass
+class StreamJob:
+    hostname: str
+    tags: Optional[dict]
+    command: str
+    # Merged into every event from this job, e.g. {"host": ..., "file": ...}
+    fields: Dict[str, str] = field(default_factory=dict)
+    # Stop after this many lines and report the job as truncated
+    max_lines: Optional[int] = None
+
+
+def line_event(job: StreamJob, line: str) -> dict:
+    return {**job.fields, "line": line}
+
+
+class FleetStream:
+    """Runs ``jobs`` concurrently and yields their tagged output lines as they arrive.
+
+    ``parse(job, line)`` turns a raw line into an event, or ``None`` to skip it.
+    A job ends with an ``exit_status`` event, or an ``error`` event if the
+    host could not be reached. By default every job runs at once (as needed
+    to follow logs); finite jobs can be limited to ``concurrency`` at a time.
+    """
+
+    def __init__(
+        self,
+        jobs: List[StreamJob],
+        buffer: int = FLEET_STREAM_BUFFER,
+        pool: Union[SSHPool, BrokerClient] = session_owner,
+        parse: Callable[[StreamJob, str], Optional[dict]] = line_event,
+        concurrency: Optional[int] = None,
+        max_line: int = FLEET_STREAM_MAX_LINE,
+    ):
+        self.workers = len(jobs) if concurrency is None else min(concurrency, len(jobs))
+        if self.workers > FLEET_STREAM_MAX_JOBS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many concurrent streams ({self.workers}); the limit is {FLEET_STREAM_MAX_JOBS}",
+            )
+        self.jobs = jobs
+        self.pool = pool
+        self.parse = parse
+        self.max_line = max_line
+        self._slots = threading.BoundedSemaphore(buffer)
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = deque(jobs)
+        self._running = self.workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _put(self, item) -> bool:
+        """Queue ``item``, waiting while the buffer is full; False once the stream is closed."""
+        while not self._stopped.is_set():
+            if self._slots.acquire(timeout=_POLL_SECONDS):
+                try:
+                    self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+                except RuntimeError:  # event loop already closed
+                    return False
+                return True
+        return False
+
+    def _read(self, job: StreamJob, channel) -> Optional[int]:
+        """Forward ``channel``'s lines; returns the exit status, or None if cut short."""
+        pending = b""
+        # Set while dropping the rest of a line that was already sent cut short
+        skipping = False
+        emitted = 0
+        while not self._stopped.is_set():
+            try:
+                data = channel.recv(32768)
+            except socket.timeout:
+                continue
+            if not data:
+                break
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            if skipping:
+                if not lines:
+                    pending = b""
+                    continue
+                lines.pop(0)
+                skipping = False
+            ready = [(raw, False) for raw in lines]
+            if len(pending) > self.max_line:
+                ready.append((pending[:self.max_line], True))
+                pending, skipping = b"", True
+            for raw, cut in ready:
+                event = self.parse(job, raw.decode(errors="replace"))
+                if event is None:
+                    continue
+                if cut:
+                    event["line_truncated"] = True
+                if not self._put(event):
+                    return None
+                emitted += 1
+                if job.max_lines is not None and emitted >= job.max_lines:
+                    self._put({**job.fields, "truncated": True})
+                    return None
+        if self._stopped.is_set():
+            return None
+        if pending:
+            event = self.parse(job, pending.decode(errors="replace"))
+            if event is not None:
+                self._put(event)
+        return channel.recv_exit_status()
+
+    def _follow(self, job: StreamJob):
+        try:
+            with self.pool.channel(job.hostname, job.tags, job.command) as channel:
+                channel.settimeout(_POLL_SECONDS)
+                status = self._read(job, channel)
+            if status is not None:
+                self._put({**job.fields, "exit_status": status})
+        except HTTPException as error:
+            self._put({**job.fields, "error": str(error.detail)})
+        except Exception as error:
+            self._put({**job.fields, "error": f"{type(error).__name__}: {error}"})
+
+    def _work(self):
+        try:
+            while not self._stopped.is_set():
+                with self._lock:
+                    if not self._pending:
+                        break
+                    job = self._pending.popleft()
+                self._follow(job)
+        finally:
+            with self._lock:
+                self._running -= 1
+                finished = self._running == 0
+            if finished:
+                self._put(_DONE)
+
+    async def events(self, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """Yield events until every job has ended; yields ``None`` after ``heartbeat`` idle seconds.
+
+        Leaving the iteration early (e.g. the client disconnected) closes the stream.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"fleet-stream-{i}", daemon=True).start()
+        if not self.workers:
+            return
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                self._slots.release()
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop every reader; their channels are closed as they exit."""
+        self._stopped.set()
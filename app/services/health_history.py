@@ -0,0 +1,40 @@
+"""Persist /healthz results into the health history tables."""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from ..repositories.health import HealthRepository
+
+RAW_RETENTION = timedelta(days=float(os.getenv("HEALTH_RAW_RETENTION_DAYS", "7")))
+HOURLY_RETENTION = timedelta(days=float(os.getenv("HEALTH_HOURLY_RETENTION_DAYS", "90")))
+PRUNE_INTERVAL = timedelta(hours=1)
+
+_last_prune = datetime.min.replace(tzinfo=timezone.utc)
+_prune_lock = threading.Lock()
+
+
+def record_healthz(db: Session, host_status: dict) -> None:
+    """Append one sample per host from a /healthz result and prune old data hourly."""
+    global _last_prune
+    samples = []
+    for host, status in host_status.items():
+        probe = status.get("probe") or {}
+        samples.append({
+            "host": host,
+            "reachable": bool(status.get("ping_reachable")),
+            "ssh_successful": bool(status.get("ssh_successful")),
+            "rtt_ms": probe.get("rtt_avg_ms"),
+            "uptime_seconds": status.get("uptime_seconds"),
+        })
+    repo = HealthRepository(db)
+    now = datetime.now(timezone.utc)
+    repo.record(samples, recorded_at=now)
+
+    with _prune_lock:
+        if now - _last_prune < PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    repo.prune(raw_before=now - RAW_RETENTION, hourly_before=now - HOURLY_RETENTION)
@@ -0,0 +1,67 @@
+"""Cross-process invalidation for per-worker inventory caches.
+
+Each worker keeps its own copy of inventory data; writers bump a counter in
+the shared database and readers compare it with the version their copy was
+built from, polling at most once per ``poll_interval`` seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..database import SessionLocal
+from ..repositories.inventory import InventoryVersionRepository
+
+POLL_INTERVAL = float(os.getenv("INVENTORY_POLL_SECONDS", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+class VersionWatcher:
+    def __init__(self, name: str, poll_interval: float = POLL_INTERVAL, session_factory=SessionLocal):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory
+        self._version = 0
+        self._polled_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        """The shared version, re-read from the database at most every poll interval."""
+        with self._lock:
+            if time.monotonic() - self._polled_at < self.poll_interval:
+                return self._version
+            self._polled_at = time.monotonic()
+        db = self.session_factory()
+        try:
+            version = InventoryVersionRepository(db).get(self.name)
+        except SQLAlchemyError as error:
+            logger.warning("Could not read inventory version %s: %s", self.name, error)
+            return self._version
+        finally:
+            db.close()
+        with self._lock:
+            self._version = version
+        return version
+
+    def bump(self) -> int:
+        """Record a change so other workers reload on their next poll."""
+        db = self.session_factory()
+        try:
+            repo = InventoryVersionRepository(db)
+            repo.bump(self.name)
+            version = repo.get(self.name)
+        finally:
+            db.close()
+        with self._lock:
+            self._version = version
+            self._polled_at = time.monotonic()
+        return version
+
+
+# The servers table needs no watcher: workers query it directly rather than
+# keeping a copy of their own
+servers_json_version = VersionWatcher("servers_json")
@@ -0,0 +1,40 @@
+"""Follow log files across the fleet (``tail -F``) as one merged stream."""
+
+import shlex
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .fleet_stream import FleetStream, StreamJob
+
+
+def tail_command(path: str, lines: int = 10, pattern: Optional[str] = None) -> str:
+    """``tail -F`` of ``path``, optionally filtered remotely by an extended regex.
+
+    The pipeline runs in the background while ``cat`` waits for the channel
+    to close; then the whole process group is killed, so a quiet log does not
+    leave ``tail`` running on the host.
+    """
+    command = f"tail -n {int(lines)} -F -- {shlex.quote(path)}"
+    if pattern:
+        command += f" | grep --line-buffered -E -e {shlex.quote(pattern)}"
+    return f"{command} & cat >/dev/null; kill 0"
+
+
+def tail_jobs(
+    targets: List[Tuple[str, Optional[dict]]], paths: List[str], lines: int = 10, pattern: Optional[str] = None
+) -> List[StreamJob]:
+    if not paths:
+        raise HTTPException(status_code=400, detail="Specify at least one file to follow")
+    return [
+        StreamJob(hostname, tags, tail_command(path, lines, pattern), {"host": hostname, "file": path})
+        for hostname, tags in targets
+        for path in paths
+    ]
+
+
+def fleet_tail(
+    targets: List[Tuple[str, Optional[dict]]], paths: List[str], lines: int = 10, pattern: Optional[str] = None
+) -> FleetStream:
+    """A stream of ``{"host", "file", "line"}`` events for every path on every target."""
+    return FleetStream(tail_jobs(targets, paths, lines, pattern))
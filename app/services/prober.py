@@ -0,0 +1,183 @@
+"""In-process reachability prober.
+
+Sends ICMP echo requests over unprivileged datagram sockets where the kernel
+allows it (``net.ipv4.ping_group_range``), and otherwise falls back to timing
+a TCP connect to the SSH port. All hosts are probed concurrently on a single
+event loop instead of forking one ``ping`` process per host.
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from ..metrics import PING_SECONDS
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+_icmp_available: Optional[bool] = None
+
+
+@dataclass
+class ProbeResult:
+    host: str
+    method: str
+    sent: int = 0
+    received: int = 0
+    rtts_ms: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def reachable(self) -> bool:
+        return self.received > 0
+
+    @property
+    def loss(self) -> float:
+        return 1.0 - self.received / self.sent if self.sent else 1.0
+
+    def as_dict(self) -> dict:
+        rtts = self.rtts_ms
+        return {
+            "reachable": self.reachable,
+            "method": self.method,
+            "sent": self.sent,
+            "received": self.received,
+            "loss": round(self.loss, 3),
+            "rtt_min_ms": round(min(rtts), 3) if rtts else None,
+            "rtt_avg_ms": round(sum(rtts) / len(rtts), 3) if rtts else None,
+            "rtt_max_ms": round(max(rtts), 3) if rtts else None,
+            "error": self.error,
+        }
+
+
+def icmp_available() -> bool:
+    """Return True if this process may open unprivileged ICMP sockets."""
+    global _icmp_available
+    if _icmp_available is None:
+        try:
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+            _icmp_available = True
+        except OSError:
+            _icmp_available = False
+    return _icmp_available
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(sequence: int) -> bytes:
+    payload = struct.pack("!d", time.monotonic())
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, os.getpid() & 0xFFFF, sequence)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, os.getpid() & 0xFFFF, sequence) + payload
+
+
+async def _resolve(host: str) -> str:
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    return infos[0][4][0]
+
+
+async def probe_icmp(host: str, count: int = 1, timeout: float = 1.0) -> ProbeResult:
+    """Send ``count`` ICMP echo requests and collect round-trip times."""
+    result = ProbeResult(host=host, method="icmp")
+    loop = asyncio.get_running_loop()
+    try:
+        address = await _resolve(host)
+    except OSError as error:
+        result.error = f"resolve failed: {error}"
+        return result
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    sock.setblocking(False)
+    try:
+        for sequence in range(count):
+            start = time.perf_counter()
+            await loop.sock_sendto(sock, _echo_request(sequence), (address, 0))
+            result.sent += 1
+            deadline = start + timeout
+            # The kernel rewrites the identifier and routes replies to this socket,
+            # so only the sequence number needs checking.
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    data, _ = await asyncio.wait_for(loop.sock_recvfrom(sock, 1024), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if len(data) >= 8:
+                    kind, _, _, _, reply_sequence = struct.unpack("!BBHHH", data[:8])
+                    if kind == ICMP_ECHO_REPLY and reply_sequence == sequence:
+                        result.received += 1
+                        result.rtts_ms.append((time.perf_counter() - start) * 1000)
+                        break
+    except OSError as error:
+        result.error = str(error)
+    finally:
+        sock.close()
+    return result
+
+
+async def probe_tcp(host: str, port: int = 22, count: int = 1, timeout: float = 1.0) -> ProbeResult:
+    """Time TCP connects to ``port``. A refused connection still proves the host is up."""
+    result = ProbeResult(host=host, method="tcp")
+    for _ in range(count):
+        result.sent += 1
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.close()
+        except ConnectionRefusedError:
+            pass
+        except (asyncio.TimeoutError, OSError) as error:
+            result.error = str(error) or type(error).__name__
+            continue
+        result.received += 1
+        result.rtts_ms.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+async def probe_host(host: str, count: int = 1, timeout: float = 1.0, port: int = 22) -> ProbeResult:
+    start = time.perf_counter()
+    if icmp_available():
+        result = await probe_icmp(host, count, timeout)
+    else:
+        result = await probe_tcp(host, port, count, timeout)
+    PING_SECONDS.observe(time.perf_counter() - start, reachable=result.reachable)
+    return result
+
+
+async def probe_hosts(
+    hosts: Iterable[str],
+    count: int = 1,
+    timeout: float = 1.0,
+    ports: Optional[Dict[str, int]] = None,
+    concurrency: int = 256,
+) -> Dict[str, ProbeResult]:
+    """Probe every host concurrently and return results keyed by host."""
+    ports = ports or {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(host: str) -> ProbeResult:
+        async with semaphore:
+            return await probe_host(host, count, timeout, ports.get(host, 22))
+
+    hosts = list(dict.fromkeys(hosts))
+    results = await asyncio.gather(*(bounded(host) for host in hosts))
+    return dict(zip(hosts, results))
+
+
+def probe_hosts_sync(hosts: Iterable[str], **kwargs) -> Dict[str, ProbeResult]:
+    """Blocking wrapper for callers running outside an event loop (e.g. sync endpoints)."""
+    return asyncio.run(probe_hosts(hosts, **kwargs))
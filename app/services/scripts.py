@@ -0,0 +1,135 @@
+"""Content-addressed script cache.
+
+Scripts are stored once, keyed by their SHA-256, and run by hash. Each host
+keeps its own copy under ``SCRIPT_REMOTE_DIR`` (relative paths are taken from
+the remote user's home; a ``script_dir`` tag overrides it). A run first tries
+the host's cached copy; only when the host reports it missing is the script
+uploaded, in base64 chunks over the normal command path, verified, renamed
+into place and run. Repeated runs send just the hash and the arguments.
+"""
+
+import base64
+import hashlib
+import os
+import re
+import shlex
+import tempfile
+import uuid
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+SCRIPT_STORE_DIR = os.getenv("SCRIPT_STORE_DIR") or os.path.expanduser("~/.cache/vpsmanager/script-store")
+SCRIPT_REMOTE_DIR = os.getenv("SCRIPT_REMOTE_DIR", ".cache/vpsmanager/scripts")
+SCRIPT_MAX_BYTES = int(os.getenv("SCRIPT_MAX_BYTES", str(1024 * 1024)))
+
+# base64 characters per upload command: a multiple of 4 so chunks decode
+# independently, and well below Linux's 128 KiB limit on one argument
+UPLOAD_CHUNK = 64 * 1024
+
+MISSING_MARKER = "__vpsmanager_script_missing__"
+FAILED_MARKER = "__vpsmanager_script_upload_failed__"
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def check_digest(digest: str) -> str:
+    if not _DIGEST.match(digest):
+        raise HTTPException(status_code=400, detail="Script hash must be a lowercase hex SHA-256")
+    return digest
+
+
+class ScriptStore:
+    """Scripts on local disk, one file per SHA-256."""
+
+    def __init__(self, directory: str = SCRIPT_STORE_DIR, max_bytes: int = SCRIPT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, check_digest(digest))
+
+    def put(self, content: bytes) -> str:
+        """Store ``content`` (a no-op if already stored) and return its hash."""
+        if len(content) > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Script exceeds {self.max_bytes} bytes")
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Script not found; upload it to /scripts first")
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+
+def remote_dir(tags: Optional[dict]) -> str:
+    """Shell expression for the host's script cache directory."""
+    directory = (tags or {}).get("script_dir", SCRIPT_REMOTE_DIR)
+    if os.path.isabs(directory):
+        return shlex.quote(directory)
+    return f'"$HOME"/{shlex.quote(directory)}'
+
+
+def run_command(digest: str, args: List[str], tags: Optional[dict] = None) -> str:
+    """Run the cached copy, or print ``MISSING_MARKER`` if the host lacks it."""
+    return (
+        f"f={remote_dir(tags)}/{digest}; "
+        f'if [ -x "$f" ]; then exec "$f" {shlex.join(args)}; fi; echo {MISSING_MARKER}'
+    )
+
+
+def upload_commands(digest: str, content: bytes, args: List[str], tags: Optional[dict] = None) -> List[str]:
+    """Commands that upload ``content`` chunk by chunk; the last one verifies, installs and runs it."""
+    encoded = base64.b64encode(content).decode()
+    chunks = [encoded[i:i + UPLOAD_CHUNK] for i in range(0, len(encoded), UPLOAD_CHUNK)] or [""]
+    # Concurrent first runs each write their own temp file; the rename makes either one win
+    setup = f"d={remote_dir(tags)}; f=\"$d\"/{digest}; t=\"$f.{uuid.uuid4().hex}.tmp\"; "
+    commands = [
+        setup + f"mkdir -p \"$d\" && umask 077 && printf %s {chunk} | base64 -d {'>' if i == 0 else '>>'} \"$t\""
+        for i, chunk in enumerate(chunks)
+    ]
+    commands[-1] += (
+        " && { ! command -v sha256sum >/dev/null"
+        f" || [ \"$(sha256sum < \"$t\" | cut -d' ' -f1)\" = {digest} ]; }}"
+        " && chmod 700 \"$t\" && mv -f \"$t\" \"$f\""
+        f" || {{ rm -f \"$t\"; echo {FAILED_MARKER}; exit 1; }}; exec \"$f\" {shlex.join(args)}"
+    )
+    return commands
+
+
+def _is_marker(output: List[str], marker: str) -> bool:
+    return len(output) == 1 and output[0].strip() == marker
+
+
+def run_script(
+    store: ScriptStore,
+    digest: str,
+    args: List[str],
+    tags: Optional[dict],
+    execute: Callable[[str], List[str]],
+) -> Tuple[List[str], bool]:
+    """Run script ``digest`` via ``execute(command)``; returns (output lines, whether it was uploaded)."""
+    check_digest(digest)
+    output = execute(run_command(digest, args, tags))
+    if not _is_marker(output, MISSING_MARKER):
+        return output, False
+    for command in upload_commands(digest, store.get(digest), args, tags):
+        output = execute(command)
+    if _is_marker(output, FAILED_MARKER):
+        raise HTTPException(status_code=500, detail="Script upload failed on the remote host")
+    return output, True
+
+
+script_store = ScriptStore()
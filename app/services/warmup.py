@@ -0,0 +1,121 @@
+"""Pre-warm pooled SSH sessions.
+
+At startup, servers matching ``SSH_WARMUP_SELECTOR`` (e.g.
+``role=prod,status=online``) get a pooled transport before the first request
+needs one. Connects run concurrently but are started no faster than
+``SSH_WARMUP_RATE`` per second, so a restart does not hit every sshd (or our
+own CPU) with simultaneous handshakes. Warm transports are kept alive by the
+keepalive set in ``connect_server``.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..database import SessionLocal
+from ..repositories.server import ServerRepository
+from ..ssh.broker import broker_client
+from ..ssh.pool import SSHPool, ssh_pool
+
+SSH_WARMUP_SELECTOR = os.getenv("SSH_WARMUP_SELECTOR", "")
+SSH_WARMUP_RATE = float(os.getenv("SSH_WARMUP_RATE", "10"))
+SSH_WARMUP_CONCURRENCY = int(os.getenv("SSH_WARMUP_CONCURRENCY", "16"))
+
+SELECTOR_FIELDS = ("provider", "role", "status")
+
+logger = logging.getLogger(__name__)
+
+last_report: Optional[dict] = None
+
+
+def parse_selector(text: str) -> Dict[str, str]:
+    """Parse ``"role=prod,status=online"`` into repository filters."""
+    filters = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        key, _, value = part.partition("=")
+        key = key.strip()
+        if key not in SELECTOR_FIELDS or not value.strip():
+            raise ValueError(f"Invalid warm-up selector term {part!r}; use {', '.join(SELECTOR_FIELDS)}=value")
+        filters[key] = value.strip()
+    return filters
+
+
+def selector_targets(filters: Dict[str, str]) -> List[Tuple[str, Optional[dict]]]:
+    """(hostname, tags) for every inventory server matching ``filters``."""
+    db = SessionLocal()
+    try:
+        return [(server.hostname, server.tags) for server in ServerRepository(db).list(limit=None, **filters)]
+    finally:
+        db.close()
+
+
+def warm_up(
+    targets: Iterable[Tuple[str, Optional[dict]]],
+    pool: SSHPool = ssh_pool,
+    rate: float = SSH_WARMUP_RATE,
+    concurrency: int = SSH_WARMUP_CONCURRENCY,
+) -> dict:
+    """Connect a pooled transport for each target and report how long it took."""
+    global last_report
+    targets = list(dict((hostname, tags) for hostname, tags in targets).items())
+    interval = 1.0 / rate if rate > 0 else 0.0
+    lock = threading.Lock()
+    next_start = [time.monotonic()]
+    errors: Dict[str, str] = {}
+
+    def connect(target):
+        hostname, tags = target
+        with lock:
+            start_at = next_start[0]
+            next_start[0] = max(start_at, time.monotonic()) + interval
+        time.sleep(max(0.0, start_at - time.monotonic()))
+        try:
+            pool.get(hostname, tags)
+        except HTTPException as error:
+            errors[hostname] = str(error.detail)
+        except Exception as error:
+            errors[hostname] = f"{type(error).__name__}: {error}"
+
+    started = time.perf_counter()
+    if targets:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(targets))) as executor:
+            list(executor.map(connect, targets))
+    report = {
+        "hosts": len(targets),
+        "connected": len(targets) - len(errors),
+        "failed": len(errors),
+        "duration_s": round(time.perf_counter() - started, 3),
+        "errors": errors,
+        "finished_at": time.time(),
+    }
+    last_report = report
+    logger.info("SSH warm-up: %d/%d hosts in %.2fs", report["connected"], report["hosts"], report["duration_s"])
+    return report
+
+
+def warm_up_targets(targets: Iterable[Tuple[str, Optional[dict]]]) -> dict:
+    """Warm ``targets`` in whichever process owns the SSH sessions."""
+    global last_report
+    if broker_client is not None:
+        last_report = broker_client.call("warm", list(targets))
+        return last_report
+    return warm_up(targets)
+
+
+def start_warmup(filters: Dict[str, str]) -> threading.Thread:
+    """Warm the servers matching ``filters`` in a background thread so startup is not held up."""
+
+    def run():
+        try:
+            warm_up_targets(selector_targets(filters))
+        except Exception:
+            logger.exception("SSH warm-up failed")
+
+    thread = threading.Thread(target=run, name="ssh-warmup", daemon=True)
+    thread.start()
+    return thread
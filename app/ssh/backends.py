@@ -0,0 +1,31 @@
+"""Selects how remote commands are executed.
+
+``paramiko`` (the default) runs commands as channels on pooled in-process
+transports; ``openssh`` shells out to the system ``ssh`` binary with
+ControlMaster sockets. Set ``SSH_BACKEND`` to change the default, or an
+``ssh_backend`` tag to choose per server. Every backend exposes
+``execute(hostname, tags, command) -> list of output lines``.
+"""
+
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+from .pool import SSHPool
+
+SSH_BACKEND = os.getenv("SSH_BACKEND", "paramiko")
+
+BACKENDS = ("paramiko", "openssh")
+
+
+def backend_for(tags: Optional[dict], pool: SSHPool):
+    """Return the backend ``tags`` ask for; ``pool`` serves the paramiko backend."""
+    name = (tags or {}).get("ssh_backend", SSH_BACKEND)
+    if name == "paramiko":
+        return pool
+    if name == "openssh":
+        from .openssh import openssh_backend
+
+        return openssh_backend
+    raise HTTPException(status_code=500, detail=f"Unknown SSH backend {name!r}; use one of {', '.join(BACKENDS)}")
@@ -0,0 +1,197 @@
+"""Per-host circuit breakers for SSH connections.
+
+Consecutive connection failures open a host's circuit; while it is open,
+new connections fail immediately with 503 instead of waiting for TCP and
+banner timeouts. A background thread probes open hosts' SSH ports with
+exponential backoff and closes the circuit once the port answers again.
+"""
+
+import errno
+import os
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..metrics import SSH_BREAKERS_OPEN
+
+SSH_BREAKER_THRESHOLD = int(os.getenv("SSH_BREAKER_THRESHOLD", "3"))
+SSH_BREAKER_BACKOFF = float(os.getenv("SSH_BREAKER_BACKOFF", "5"))
+SSH_BREAKER_MAX_BACKOFF = float(os.getenv("SSH_BREAKER_MAX_BACKOFF", "300"))
+
+CLOSED = "closed"
+OPEN = "open"
+
+_UNREACHABLE_ERRNOS = {errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN}
+
+
+def is_host_failure(error: BaseException) -> bool:
+    """True if ``error`` means the host (not our configuration or credentials) is at fault."""
+    if isinstance(error, HTTPException):
+        if error.status_code != 500:
+            return False
+        error = error.__cause__
+    if isinstance(error, (ConnectionError, TimeoutError, socket.gaierror)):
+        return True
+    if isinstance(error, OSError):
+        return error.errno in _UNREACHABLE_ERRNOS
+    paramiko = sys.modules.get("paramiko")
+    return (
+        paramiko is not None
+        and isinstance(error, paramiko.SSHException)
+        and not isinstance(error, (paramiko.AuthenticationException, paramiko.BadHostKeyException))
+    )
+
+
+def tcp_probe(hostname: str, port: int, timeout: float = 2.0) -> bool:
+    """True if something accepts TCP connections on ``hostname:port``."""
+    try:
+        socket.create_connection((hostname, port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+@dataclass
+class HostCircuit:
+    hostname: str
+    port: int = 22
+    state: str = CLOSED
+    failures: int = 0
+    backoff: float = 0.0
+    opened_at: Optional[float] = None
+    next_probe: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        now = time.monotonic()
+        return {
+            "host": self.hostname,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "open_for_s": round(now - self.opened_at, 3) if self.opened_at is not None else None,
+            "next_probe_in_s": round(max(0.0, self.next_probe - now), 3) if self.next_probe is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class CircuitBreakers:
+    """Tracks one circuit per host and probes open ones in a daemon thread."""
+
+    def __init__(
+        self,
+        threshold: int = SSH_BREAKER_THRESHOLD,
+        backoff: float = SSH_BREAKER_BACKOFF,
+        max_backoff: float = SSH_BREAKER_MAX_BACKOFF,
+        probe: Callable[[str, int], bool] = tcp_probe,
+    ):
+        self.threshold = threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._probe = probe
+        self._circuits: Dict[str, HostCircuit] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self, hostname: str):
+        """Raise 503 right away if ``hostname``'s circuit is open."""
+        circuit = self._circuits.get(hostname)
+        if circuit is not None and circuit.state == OPEN:
+            retry_in = max(0.0, circuit.next_probe - time.monotonic())
+            raise HTTPException(
+                status_code=503,
+                detail=f"Host {hostname} is unreachable (circuit open, next probe in {retry_in:.0f}s): {circuit.last_error}",
+            )
+
+    def record_success(self, hostname: str):
+        with self._lock:
+            self._circuits.pop(hostname, None)
+
+    def record_failure(self, hostname: str, error: BaseException, port: int = 22):
+        detail = error.detail if isinstance(error, HTTPException) else f"{type(error).__name__}: {error}"
+        with self._lock:
+            circuit = self._circuits.setdefault(hostname, HostCircuit(hostname, port))
+            circuit.failures += 1
+            circuit.last_error = str(detail)
+            if circuit.state == CLOSED and circuit.failures >= self.threshold:
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+                circuit.backoff = self.backoff
+                circuit.next_probe = circuit.opened_at + circuit.backoff
+                opened = True
+            else:
+                opened = False
+        if opened:
+            self._ensure_prober()
+
+    def reset(self, hostname: str) -> bool:
+        """Close ``hostname``'s circuit by hand; returns False if none was tracked."""
+        with self._lock:
+            return self._circuits.pop(hostname, None) is not None
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {hostname: circuit.as_dict() for hostname, circuit in self._circuits.items()}
+
+    def open_count(self) -> int:
+        with self._lock:
+            return sum(1 for circuit in self._circuits.values() if circuit.state == OPEN)
+
+    def probe_due(self) -> Optional[float]:
+        """Probe every open circuit whose backoff has expired.
+
+        Returns seconds until the next probe is due, or None if no circuit is open.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [c for c in self._circuits.values() if c.state == OPEN and c.next_probe <= now]
+        for circuit in due:
+            recovered = self._probe(circuit.hostname, circuit.port)
+            with self._lock:
+                if recovered:
+                    self._circuits.pop(circuit.hostname, None)
+                else:
+                    circuit.backoff = min(circuit.backoff * 2, self.max_backoff)
+                    circuit.next_probe = time.monotonic() + circuit.backoff
+        with self._lock:
+            pending = [c.next_probe for c in self._circuits.values() if c.state == OPEN]
+        return max(0.0, min(pending) - time.monotonic()) if pending else None
+
+    def _ensure_prober(self):
+        with self._lock:
+            if self._thread is not None:
+                self._wake.set()
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ssh-breaker-prober", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.probe_due()
+            if wait is None:
+                with self._lock:
+                    if not any(c.state == OPEN for c in self._circuits.values()):
+                        self._thread = None
+                        return
+                continue
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        self._thread = None
+
+
+breakers = CircuitBreakers()
+SSH_BREAKERS_OPEN.set_function(breakers.open_count)
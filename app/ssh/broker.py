@@ -0,0 +1,430 @@
+"""SSH connection broker shared by all API worker processes.
+
+With several uvicorn workers, each process would otherwise hold its own SSH
+sessions. When ``SSH_BROKER_ADDRESS`` is set, workers instead send requests
+over a local socket to one broker process that owns every connection, so
+sessions are reused across workers and all of them report the same state.
+
+Besides single commands, the broker runs fleet edits and the metrics
+collector, and relays long-lived channels (log tails, greps, shells): each
+of those gets a connection of its own that carries the channel's bytes.
+
+Run it directly with ``python -m app.ssh.broker``; workers also start it on
+demand through ``ensure_broker``.
+"""
+
+import fcntl
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+from ..services.collector import FleetCollector, inventory_targets
+from .breaker import breakers
+from .pool import SSHPool, ssh_pool
+from .scheduler import CommandScheduler
+from .timeouts import latency_history
+
+BROKER_ADDRESS = os.getenv("SSH_BROKER_ADDRESS")
+
+logger = logging.getLogger(__name__)
+
+
+def broker_authkey() -> bytes:
+    return (os.getenv("SSH_BROKER_AUTHKEY") or os.getenv("API_KEY") or "vpsmanager").encode()
+
+
+def error_reply(error: Exception) -> tuple:
+    if isinstance(error, HTTPException):
+        return ("error", error.status_code, error.detail)
+    return ("error", 500, f"{type(error).__name__}: {error}")
+
+
+def _relay_input(conn, channel):
+    """Apply a worker's ("data" | "resize" | "close", ...) messages to ``channel``."""
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == "data":
+                channel.sendall(message[1])
+            elif message[0] == "resize":
+                channel.resize_pty(width=message[1], height=message[2])
+            else:
+                break
+    except Exception:
+        pass  # the worker went away, or the channel closed under a write or resize
+    finally:
+        # Unblocks the output side, which then ends the relay
+        channel.close()
+
+
+class BrokerServer:
+    """Serves ("exec" | "run" | "sessions" | "warm" | "breakers" | "reset_breaker" | "timeouts" |
+    "edit" | "collect" | "metrics" | "series" | "close" | "ping", ...) requests over a local
+    socket, plus ("channel", ...) requests that turn the connection into a channel relay.
+
+    Commands from every worker go through one scheduler, so the per-host and
+    global caps hold across the whole deployment.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, pool: Optional[SSHPool] = None):
+        self.address = address
+        self.authkey = authkey or broker_authkey()
+        self.pool = pool or SSHPool(breakers=breakers)
+        self.scheduler = CommandScheduler(pool=self.pool)
+        self.collector = FleetCollector(pool=self.pool)
+        self._listener: Optional[Listener] = None
+        self._stopped = threading.Event()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        old_umask = os.umask(0o177)  # socket readable by this user only
+        try:
+            self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        logger.info("SSH broker listening on %s", self.address)
+        while not self._stopped.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._stopped.is_set():
+                    break
+                continue
+            except Exception as error:  # failed authentication handshake
+                logger.warning("Rejected broker client: %s", error)
+                continue
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.close()
+        self.collector.stop()
+        if self.pool.breakers is not None:
+            self.pool.breakers.stop()
+        self.pool.close_all()
+
+    def _serve_client(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if request[0] == "channel":
+                    # From here on the connection carries this channel's bytes
+                    self._relay(conn, *request[1:])
+                    return
+                conn.send(self.handle(request))
+
+    def _relay(self, conn, hostname: str, tags: Optional[dict], options: dict):
+        """Pump one channel's output to the worker as ("data", bytes) messages, then ("exit", status)."""
+        opened = self.pool.channel(hostname, tags, **options)
+        try:
+            channel = opened.__enter__()
+        except Exception as error:
+            conn.send(error_reply(error))
+            return
+        try:
+            conn.send(("ok", None))
+        except OSError:
+            opened.__exit__(None, None, None)
+            return
+        reader = threading.Thread(target=_relay_input, args=(conn, channel), daemon=True)
+        reader.start()
+        status = -1
+        try:
+            while True:
+                data = channel.recv(32768)
+                if not data:
+                    break
+                conn.send(("data", data))
+            status = channel.recv_exit_status()
+        except OSError:
+            pass  # the worker went away
+        finally:
+            try:
+                conn.send(("exit", status))
+            except OSError:
+                pass
+            # The worker answers "exit" with "close" (or goes away), which ends
+            # the reader; only then may the connection be closed under it
+            reader.join()
+            opened.__exit__(None, None, None)
+
+    def handle(self, request: tuple) -> tuple:
+        op, *args = request
+        try:
+            if op == "exec":
+                hostname, tags, command = args
+                return ("ok", self.scheduler.run(hostname, tags, command)[0])
+            if op == "run":
+                hostname, tags, command, client_id = args
+                return ("ok", self.scheduler.run(hostname, tags, command, client_id))
+            if op == "sessions":
+                return ("ok", self.pool.hosts())
+            if op == "breakers":
+                return ("ok", self.pool.breakers.snapshot() if self.pool.breakers else {})
+            if op == "warm":
+                from ..services.warmup import warm_up
+
+                return ("ok", warm_up(args[0], self.pool))
+            if op == "timeouts":
+                return ("ok", latency_history.describe(*args))
+            if op == "edit":
+                from ..schemas.fleet import FleetEditRequest
+                from ..services.fleet_edit import edit_fleet
+
+                targets, request = args
+                results = edit_fleet(targets, FleetEditRequest.model_validate(request), self.pool)
+                return ("ok", [result.model_dump() for result in results])
+            if op == "collect":
+                return ("ok", self.collector.collect_once(args[0]))
+            if op == "metrics":
+                return ("ok", self.collector.latest())
+            if op == "series":
+                return ("ok", self.collector.series(*args))
+            if op == "reset_breaker":
+                return ("ok", bool(self.pool.breakers and self.pool.breakers.reset(args[0])))
+            if op == "close":
+                self.pool.discard(args[0])
+                return ("ok", None)
+            if op == "ping":
+                return ("ok", os.getpid())
+            return ("error", 400, f"Unknown broker operation: {op}")
+        except Exception as error:
+            return error_reply(error)
+
+
+class BrokerChannel:
+    """Worker-side stand-in for a channel that lives in the broker.
+
+    Supports the part of paramiko's ``Channel`` that streams and shells use;
+    ``fileno()`` becomes readable when output arrives, and ``recv`` returns
+    one relayed chunk at a time.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._timeout: Optional[float] = None
+        self._eof = False
+        self._exit_status: Optional[int] = None
+
+    def fileno(self) -> int:
+        return self._conn.fileno()
+
+    def settimeout(self, timeout: Optional[float]):
+        self._timeout = timeout
+
+    def recv(self, nbytes: int) -> bytes:
+        if self._eof:
+            return b""
+        if not self._conn.poll(self._timeout):
+            raise socket.timeout()
+        try:
+            message = self._conn.recv()
+        except (EOFError, OSError):
+            message = ("exit", None)
+        if message[0] == "data":
+            return message[1]
+        self._eof = True
+        self._exit_status = message[1]
+        return b""
+
+    def send(self, data: bytes) -> int:
+        self._conn.send(("data", bytes(data)))
+        return len(data)
+
+    def resize_pty(self, width: int = 80, height: int = 24):
+        self._conn.send(("resize", width, height))
+
+    def exit_status_ready(self) -> bool:
+        return self._exit_status is not None
+
+    def recv_exit_status(self) -> int:
+        while not self._eof:
+            try:
+                self.recv(32768)
+            except socket.timeout:
+                pass
+        return -1 if self._exit_status is None else self._exit_status
+
+    def close(self):
+        try:
+            self._conn.send(("close",))
+        except OSError:
+            pass
+        self._conn.close()
+
+
+class BrokerClient:
+    """Worker-side handle; keeps one broker connection per thread.
+
+    With ``spawn`` set, a broker that cannot be reached (e.g. it crashed) is
+    started again through ``ensure_broker`` before the request is retried.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, spawn: bool = True):
+        self.address = address
+        self.authkey = authkey or broker_authkey()
+        self.spawn = spawn
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        return conn
+
+    def _drop_connection(self):
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            conn.close()
+
+    def _restart(self):
+        if not self.spawn:
+            raise HTTPException(status_code=503, detail="SSH broker unavailable")
+        try:
+            ensure_broker(self.address)
+        except (RuntimeError, OSError):
+            raise HTTPException(status_code=503, detail="SSH broker unavailable")
+
+    def call(self, *request):
+        """Send ``request`` and return the broker's answer.
+
+        Only a request that never reached the broker is retried (after
+        restarting it if needed). Once sent it may already have run, so a
+        lost reply is a 503 rather than a second run of the command or edit.
+        """
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(request)
+                break
+            except OSError:
+                self._drop_connection()
+                if attempt:
+                    raise HTTPException(status_code=503, detail="SSH broker unavailable")
+                if self.spawn:
+                    self._restart()
+        try:
+            reply = conn.recv()
+        except (EOFError, OSError):
+            self._drop_connection()
+            raise HTTPException(status_code=503, detail="SSH broker unavailable")
+        if reply[0] == "error":
+            raise HTTPException(status_code=reply[1], detail=reply[2])
+        return reply[1]
+
+    def execute(self, hostname: str, tags: Optional[dict], command: str) -> List[str]:
+        return self.call("exec", hostname, tags, command)
+
+    def run(self, hostname: str, tags: Optional[dict], command: str, client_id: str = "") -> Tuple[List[str], float]:
+        """Like ``execute`` but queued fairly per ``client_id``; also returns the queue wait."""
+        output, waited = self.call("run", hostname, tags, command, client_id)
+        return output, waited
+
+    def sessions(self) -> List[str]:
+        return self.call("sessions")
+
+    @contextmanager
+    def channel(
+        self,
+        hostname: str,
+        tags: Optional[dict] = None,
+        command: Optional[str] = None,
+        term: str = "xterm-256color",
+        cols: int = 80,
+        rows: int = 24,
+        window_size: Optional[int] = None,
+    ) -> Iterator[BrokerChannel]:
+        """Like ``SSHPool.channel``, with the channel opened in the broker and relayed over its own connection."""
+        options = dict(command=command, term=term, cols=cols, rows=rows, window_size=window_size)
+        try:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        except OSError:
+            self._restart()
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        try:
+            conn.send(("channel", hostname, tags, options))
+            reply = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            raise HTTPException(status_code=503, detail="SSH broker unavailable")
+        if reply[0] == "error":
+            conn.close()
+            raise HTTPException(status_code=reply[1], detail=reply[2])
+        channel = BrokerChannel(conn)
+        try:
+            yield channel
+        finally:
+            channel.close()
+
+    def edit_fleet(self, targets: List[Tuple[str, Optional[dict]]], request) -> list:
+        """``services.fleet_edit.edit_fleet`` run in the broker, over its sessions."""
+        from ..schemas.fleet import HostEditResult
+
+        results = self.call("edit", list(targets), request.model_dump())
+        return [HostEditResult.model_validate(result) for result in results]
+
+    # The broker hosts the only metrics collector, so every worker serves the same samples
+    def collect_once(self, targets) -> List[dict]:
+        return self.call("collect", list(targets))
+
+    def latest(self) -> Dict[str, dict]:
+        return self.call("metrics")
+
+    def series(self, hostname: str, since: Optional[float] = None) -> List[dict]:
+        return self.call("series", hostname, since)
+
+
+def ensure_broker(address: str, timeout: float = 10.0) -> None:
+    """Start a broker process for ``address`` unless one is already answering.
+
+    A lock file makes sure only one of several starting workers spawns it.
+    """
+    with open(address + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            BrokerClient(address, spawn=False).call("ping")
+            return
+        except (HTTPException, OSError):
+            pass
+        subprocess.Popen(
+            [sys.executable, "-m", "app.ssh.broker"],
+            env=dict(os.environ, SSH_BROKER_ADDRESS=address),
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                BrokerClient(address, spawn=False).call("ping")
+                return
+            except (HTTPException, OSError):
+                time.sleep(0.1)
+        raise RuntimeError(f"SSH broker did not start on {address}")
+
+
+broker_client = BrokerClient(BROKER_ADDRESS) if BROKER_ADDRESS else None
+# Where this process's SSH sessions live: the shared broker, or its own pool
+session_owner: Union[BrokerClient, SSHPool] = broker_client if broker_client is not None else ssh_pool
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    server = BrokerServer(BROKER_ADDRESS or "/tmp/vpsmanager-ssh-broker.sock")
+    # Workers leave periodic collection to the broker so there is one set of samples
+    interval = float(os.getenv("COLLECTOR_INTERVAL", "0"))
+    if interval > 0:
+        server.collector.start(interval, inventory_targets)
+    server.serve_forever()
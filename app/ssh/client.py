@@ -0,0 +1,156 @@
+import os
+import socket
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ..metrics import SSH_PHASE_SECONDS
+from ..models.server import Server
+from .keys import host_key_store, load_private_key
+from .timeouts import latency_history
+
+if TYPE_CHECKING:
+    import paramiko
+
+# Seconds between keepalive packets on idle transports, so pooled and
+# pre-warmed sessions survive NAT and firewall idle timeouts
+SSH_KEEPALIVE = int(os.getenv("SSH_KEEPALIVE", "30"))
+
+
+def find_server(db: Session, server_name: str) -> Server:
+    """Look up a server by hostname or public IP, raising 404 if unknown."""
+    server = (
+        db.query(Server)
+        .filter((Server.hostname == server_name) | (Server.public_ip == server_name))
+        .first()
+    )
+    if not server:
+        raise HTTPException(status_code=404, detail="Server not found")
+    return server
+
+
+JUMP_CREDENTIAL_TAGS = ("username", "auth_type", "key_filename", "password_env")
+
+
+def jump_target(tags: Optional[dict]) -> Optional[Tuple[str, dict]]:
+    """Return ``(bastion hostname, bastion tags)`` if ``tags`` route through a jump host.
+
+    ``jump_host`` is ``"host"`` or ``"host:port"``. The bastion reuses the
+    target's credentials unless ``jump_username``, ``jump_auth_type``,
+    ``jump_key_filename``, ``jump_password_env`` or ``jump_port`` say otherwise.
+    """
+    tags = tags or {}
+    jump = tags.get("jump_host")
+    if not jump:
+        return None
+    host, separator, port = jump.rpartition(":")
+    if not separator or not port.isdigit():
+        host, port = jump, ""
+    jump_tags = {name: tags[name] for name in JUMP_CREDENTIAL_TAGS if name in tags}
+    if port:
+        jump_tags["port"] = port
+    for name, value in tags.items():
+        if name.startswith("jump_") and name != "jump_host":
+            jump_tags[name[len("jump_"):]] = value
+    return host, jump_tags
+
+
+def connect_server(
+    hostname: str, tags: Optional[dict], bastion: Optional["paramiko.SSHClient"] = None
+) -> "paramiko.SSHClient":
+    """Open an SSH connection using the credentials described by ``tags``.
+
+    Parameters
+    ----------
+    hostname: str
+        Host to connect to.
+    tags: dict
+        ``Server.tags``; ``username``, ``auth_type``, ``key_filename`` and
+        ``password_env`` are used, plus an optional ``port`` and the
+        ``*_timeout`` overrides read by ``latency_history`` and a
+        ``keepalive`` interval in seconds (0 disables it).
+    bastion: paramiko.SSHClient
+        Connected jump host (see ``jump_target``); the connection is tunnelled
+        through a ``direct-tcpip`` channel on its transport instead of a new
+        TCP socket.
+
+    Returns
+    -------
+    paramiko.SSHClient
+        Connected SSH client.
+    """
+    tags = tags or {}
+    username = tags.get("username", "root")
+    auth_type = tags.get("auth_type", "key")
+    key_filename = tags.get("key_filename")
+    password_env = tags.get("password_env")
+    port = int(tags.get("port", 22))
+
+    connect_kwargs = {"hostname": hostname, "port": port, "username": username}
+    if auth_type == "key":
+        if not key_filename:
+            raise HTTPException(status_code=500, detail="Missing SSH key path")
+        # Parsed once and reused rather than read from disk on every connect
+        connect_kwargs["pkey"] = load_private_key(key_filename)
+    elif auth_type == "password":
+        if not password_env:
+            raise HTTPException(status_code=500, detail="Missing password environment variable")
+        env_password = os.getenv(password_env)
+        if env_password is None:
+            raise HTTPException(status_code=500, detail=f"Environment variable '{password_env}' not set")
+        connect_kwargs["password"] = env_password
+    else:
+        raise ValueError("Invalid authentication type")
+
+    # Timeouts adapt to this host's observed latency
+    timeouts = latency_history.timeouts(hostname, tags)
+
+    # Open the TCP connection ourselves so its latency is measured separately
+    # from the SSH handshake and authentication.
+    start = time.perf_counter()
+    if bastion is not None:
+        try:
+            sock = bastion.get_transport().open_channel(
+                "direct-tcpip", (hostname, port), ("127.0.0.1", 0), timeout=timeouts.connect
+            )
+        except Exception as error:
+            raise HTTPException(
+                status_code=500, detail=f"SSH connection error: jump host could not reach {hostname}:{port}: {error}"
+            ) from error
+    else:
+        sock = socket.create_connection((hostname, port), timeout=timeouts.connect)
+    elapsed = time.perf_counter() - start
+    SSH_PHASE_SECONDS.observe(elapsed, phase="connect")
+    latency_history.observe(hostname, "connect", elapsed)
+
+    # paramiko and its cryptography stack are imported on first SSH use only
+    import paramiko
+
+    ssh_client = paramiko.SSHClient()
+    # Verify against the shared known_hosts store; new hosts are pinned on first contact
+    ssh_client.set_missing_host_key_policy(host_key_store.policy())
+
+    try:
+        start = time.perf_counter()
+        ssh_client.connect(
+            sock=sock,
+            timeout=timeouts.auth,
+            banner_timeout=timeouts.banner,
+            auth_timeout=timeouts.auth,
+            **connect_kwargs,
+        )
+        elapsed = time.perf_counter() - start
+        SSH_PHASE_SECONDS.observe(elapsed, phase="auth")
+        latency_history.observe(hostname, "handshake", elapsed)
+        ssh_client.get_transport().set_keepalive(int(tags.get("keepalive", SSH_KEEPALIVE)))
+        return ssh_client
+    except paramiko.AuthenticationException as error:
+        ssh_client.close()
+        sock.close()
+        raise HTTPException(status_code=401, detail="Authentication failed") from error
+    except paramiko.SSHException as error:
+        ssh_client.close()
+        sock.close()
+        raise HTTPException(status_code=500, detail=f"SSH connection error: {str(error)}") from error
@@ -0,0 +1,136 @@
+"""Shared SSH host-key store and private-key cache.
+
+Every SSH client in the process verifies servers against one in-memory copy
+of a known_hosts file instead of blindly accepting whatever key a server
+presents. Unknown hosts are trusted on first contact and written back to the
+file, so later connections (and other processes) pin that key; set
+``SSH_STRICT_HOST_KEYS=1`` to reject unknown hosts instead.
+
+Private keys are parsed once per file and reused until the file changes.
+"""
+
+import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import paramiko
+
+SSH_KNOWN_HOSTS = os.path.expanduser(os.getenv("SSH_KNOWN_HOSTS", "~/.ssh/vpsmanager_known_hosts"))
+SSH_STRICT_HOST_KEYS = os.getenv("SSH_STRICT_HOST_KEYS", "0").lower() in ("1", "true", "yes")
+
+
+class HostKeyStore:
+    """Thread-safe known_hosts file loaded once and shared by all clients.
+
+    Parameters
+    ----------
+    path: str
+        known_hosts file; created on the first new host.
+    strict: bool
+        Reject hosts that are not already in the file.
+    """
+
+    def __init__(self, path: str = SSH_KNOWN_HOSTS, strict: bool = SSH_STRICT_HOST_KEYS):
+        self.path = path
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._keys: Optional["paramiko.HostKeys"] = None
+        self._mtime: Optional[float] = None
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """(Re)read the file; called with the lock held."""
+        import paramiko
+
+        keys = paramiko.HostKeys()
+        mtime = self._file_mtime()
+        if mtime is not None:
+            keys.load(self.path)
+        self._keys, self._mtime = keys, mtime
+
+    def _lookup(self, hostname: str):
+        if self._keys is None:
+            self._load()
+        entry = self._keys.lookup(hostname)
+        # Another process may have added the host since we loaded the file
+        if entry is None and self._file_mtime() != self._mtime:
+            self._load()
+            entry = self._keys.lookup(hostname)
+        return entry
+
+    def _save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".known_hosts.", dir=directory)
+        os.close(fd)
+        try:
+            self._keys.save(temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._mtime = self._file_mtime()
+
+    def verify(self, hostname: str, key: "paramiko.PKey"):
+        """Accept ``key`` for ``hostname`` (``[host]:port`` for non-22 ports), or raise.
+
+        Raises ``paramiko.BadHostKeyException`` when a different key is pinned
+        and ``paramiko.SSHException`` for unknown hosts in strict mode.
+        """
+        import paramiko
+
+        with self._lock:
+            known = self._lookup(hostname)
+            if known is not None and key.get_name() in known:
+                if known[key.get_name()] != key:
+                    raise paramiko.BadHostKeyException(hostname, key, known[key.get_name()])
+                return
+            if known is not None:
+                # Pinned under another key type; treat a switch like a changed key
+                raise paramiko.BadHostKeyException(hostname, key, next(iter(known.values())))
+            if self.strict:
+                raise paramiko.SSHException(f"Server {hostname!r} not found in {self.path}")
+            self._keys.add(hostname, key.get_name(), key)
+            self._save()
+
+    def policy(self) -> "paramiko.MissingHostKeyPolicy":
+        """A paramiko policy that defers to this store."""
+        import paramiko
+
+        store = self
+
+        class StorePolicy(paramiko.MissingHostKeyPolicy):
+            def missing_host_key(self, client, hostname, key):
+                store.verify(hostname, key)
+
+        return StorePolicy()
+
+
+_private_keys: Dict[Tuple[str, Optional[str]], Tuple[float, "paramiko.PKey"]] = {}
+_private_keys_lock = threading.Lock()
+
+
+def load_private_key(path: str, passphrase: Optional[str] = None) -> "paramiko.PKey":
+    """Return the parsed key at ``path``, re-reading it only when the file changes."""
+    import paramiko
+
+    mtime = os.stat(path).st_mtime
+    cache_key = (os.path.abspath(path), passphrase)
+    with _private_keys_lock:
+        cached = _private_keys.get(cache_key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    key = paramiko.PKey.from_path(path, passphrase)
+    with _private_keys_lock:
+        _private_keys[cache_key] = (mtime, key)
+    return key
+
+
+host_key_store = HostKeyStore()
@@ -0,0 +1,179 @@
+"""Execution backend that drives the system ``ssh`` binary.
+
+Each host gets one OpenSSH ControlMaster connection whose socket lives in
+``SSH_CONTROL_DIR``; every command is a short-lived ``ssh`` process that
+multiplexes a new session over it, so key exchange and cipher work happen in
+OpenSSH's C code and outside the API process. Host keys are checked against
+the same known_hosts file as the paramiko backend.
+"""
+
+import os
+import shlex
+import stat
+import subprocess
+import tempfile
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from ..metrics import COMMANDS_IN_FLIGHT, SSH_PHASE_SECONDS
+from .breaker import CircuitBreakers, breakers
+from .client import jump_target
+from .keys import SSH_KNOWN_HOSTS, SSH_STRICT_HOST_KEYS
+from .timeouts import latency_history
+
+SSH_BINARY = os.getenv("SSH_BINARY", "ssh")
+SSH_CONTROL_DIR = os.getenv("SSH_CONTROL_DIR") or os.path.join(tempfile.gettempdir(), "vpsmanager-ssh-control")
+SSH_CONTROL_PERSIST = os.getenv("SSH_CONTROL_PERSIST", "10m")
+
+# ssh exits with 255 for its own errors; these mean the host is up but refused us
+_NOT_HOST_FAILURES = ("Permission denied", "Host key verification failed", "REMOTE HOST IDENTIFICATION HAS CHANGED")
+
+_ASKPASS_SCRIPT = '#!/bin/sh\nprintf "%s\\n" "$VPSMANAGER_SSH_PASSWORD"\n'
+
+
+class OpenSSHBackend:
+    """Runs commands with ``ssh`` over per-host ControlMaster sockets."""
+
+    def __init__(
+        self,
+        binary: str = SSH_BINARY,
+        control_dir: str = SSH_CONTROL_DIR,
+        persist: str = SSH_CONTROL_PERSIST,
+        known_hosts: str = SSH_KNOWN_HOSTS,
+        breakers: Optional[CircuitBreakers] = breakers,
+    ):
+        self.binary = binary
+        self.control_dir = control_dir
+        self.persist = persist
+        self.known_hosts = known_hosts
+        self.breakers = breakers
+
+    def _askpass(self) -> str:
+        """Path of a helper that hands ssh the password from the environment."""
+        path = os.path.join(self.control_dir, "askpass.sh")
+        if not os.path.exists(path):
+            fd, temp_path = tempfile.mkstemp(dir=self.control_dir)
+            with os.fdopen(fd, "w") as f:
+                f.write(_ASKPASS_SCRIPT)
+            os.chmod(temp_path, stat.S_IRWXU)
+            os.replace(temp_path, path)
+        return path
+
+    def _connection_options(self, tags: dict, connect_timeout: float) -> List[str]:
+        """Options shared by the connection to a host and to its jump host."""
+        args = [
+            "-o", f"UserKnownHostsFile={self.known_hosts}",
+            "-o", f"StrictHostKeyChecking={'yes' if SSH_STRICT_HOST_KEYS else 'accept-new'}",
+            "-o", f"ConnectTimeout={max(1, round(connect_timeout))}",
+            "-p", str(tags.get("port", 22)),
+            "-l", tags.get("username", "root"),
+        ]
+        if tags.get("auth_type", "key") == "key":
+            if not tags.get("key_filename"):
+                raise HTTPException(status_code=500, detail="Missing SSH key path")
+            args += ["-o", "BatchMode=yes", "-o", "IdentitiesOnly=yes", "-i", tags["key_filename"]]
+        else:
+            args += ["-o", "PreferredAuthentications=password", "-o", "NumberOfPasswordPrompts=1"]
+        return args
+
+    def _proxy_command(self, jump_host: str, jump_tags: dict, connect_timeout: float) -> str:
+        """ProxyCommand that tunnels through ``jump_host`` with the bastion's own credentials.
+
+        ``ssh -J`` would reuse the target's key and ignore the ``jump_*`` tags.
+        The askpass helper only carries the target's password, so bastions
+        must use key authentication.
+        """
+        if jump_tags.get("auth_type", "key") != "key":
+            raise HTTPException(
+                status_code=500, detail="The openssh backend supports only key authentication for jump hosts"
+            )
+        args = [self.binary, *self._connection_options(jump_tags, connect_timeout), "-W", "%h:%p", jump_host]
+        # ssh expands %-tokens in ProxyCommand; only -W's should survive
+        return " ".join(arg if arg == "%h:%p" else shlex.quote(arg).replace("%", "%%") for arg in args)
+
+    def command_line(self, hostname: str, tags: Optional[dict], command: str) -> List[str]:
+        tags = tags or {}
+        timeouts = latency_history.timeouts(hostname, tags)
+        args = [
+            self.binary,
+            "-o", "ControlMaster=auto",
+            # %C hashes host, port and user, keeping the socket path short
+            "-o", f"ControlPath={os.path.join(self.control_dir, '%C')}",
+            "-o", f"ControlPersist={self.persist}",
+            "-o", f"ServerAliveInterval={int(tags.get('keepalive', 30)) or 0}",
+            *self._connection_options(tags, timeouts.connect),
+        ]
+        jump = jump_target(tags)
+        if jump is not None:
+            jump_host, jump_tags = jump
+            args += ["-o", f"ProxyCommand={self._proxy_command(jump_host, jump_tags, timeouts.connect)}"]
+        return args + [hostname, "--", command]
+
+    def _environment(self, tags: dict) -> dict:
+        env = dict(os.environ)
+        if tags.get("auth_type", "key") == "password":
+            password_env = tags.get("password_env")
+            if not password_env or os.getenv(password_env) is None:
+                raise HTTPException(status_code=500, detail=f"Environment variable '{password_env}' not set")
+            env.update(
+                SSH_ASKPASS=self._askpass(),
+                SSH_ASKPASS_REQUIRE="force",
+                VPSMANAGER_SSH_PASSWORD=os.environ[password_env],
+            )
+        return env
+
+    def execute(self, hostname: str, tags: Optional[dict], command: str) -> List[str]:
+        """Run ``command`` on ``hostname`` and return its output lines."""
+        tags = tags or {}
+        if self.breakers is not None:
+            self.breakers.check(hostname)
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+        args = self.command_line(hostname, tags, command)
+        timeout = latency_history.timeouts(hostname, tags).command
+        with COMMANDS_IN_FLIGHT.track_inprogress():
+            start = time.perf_counter()
+            try:
+                result = subprocess.run(
+                    args,
+                    env=self._environment(tags),
+                    stdin=subprocess.DEVNULL,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    start_new_session=True,  # no controlling tty, so ssh uses SSH_ASKPASS
+                )
+            except subprocess.TimeoutExpired:
+                raise HTTPException(status_code=504, detail=f"Command on {hostname} timed out after {timeout:g}s")
+            elapsed = time.perf_counter() - start
+        # A remote command may exit 255 too; only a dead master means ssh itself failed
+        if result.returncode == 255 and not self._master_running(hostname, tags):
+            error = result.stderr.strip() or "ssh exited with status 255"
+            if self.breakers is not None and not any(marker in error for marker in _NOT_HOST_FAILURES):
+                self.breakers.record_failure(hostname, ConnectionError(error), int(tags.get("port", 22)))
+            raise HTTPException(status_code=500, detail=f"SSH connection error: {error}")
+        if self.breakers is not None:
+            self.breakers.record_success(hostname)
+        SSH_PHASE_SECONDS.observe(elapsed, phase="exec")
+        latency_history.observe(hostname, "command", elapsed)
+        return result.stdout.splitlines(keepends=True)
+
+    def _control(self, hostname: str, tags: Optional[dict], operation: str) -> subprocess.CompletedProcess:
+        """Send ``operation`` (``check``, ``exit``) to the ControlMaster for ``hostname``."""
+        args = self.command_line(hostname, tags, "true")
+        args[1:1] = ["-O", operation]
+        return subprocess.run(args[:-2], stdin=subprocess.DEVNULL, capture_output=True, timeout=10)
+
+    def _master_running(self, hostname: str, tags: dict) -> bool:
+        try:
+            return self._control(hostname, tags, "check").returncode == 0
+        except subprocess.TimeoutExpired:
+            return False
+
+    def close(self, hostname: str, tags: Optional[dict] = None):
+        """Ask the ControlMaster for ``hostname`` to exit."""
+        self._control(hostname, tags, "exit")
+
+
+openssh_backend = OpenSSHBackend()
@@ -0,0 +1,367 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from ..metrics import COMMANDS_IN_FLIGHT, SSH_CHANNELS, SSH_PHASE_SECONDS, SSH_SESSIONS
+from .breaker import CircuitBreakers, breakers, is_host_failure
+from .client import connect_server, jump_target
+from .timeouts import latency_history
+
+if TYPE_CHECKING:
+    import paramiko
+
+# OpenSSH's default MaxSessions is 10; stay below it so other users of the
+# same transport (SFTP, collector probes) still get a channel.
+SSH_MAX_CHANNELS = int(os.getenv("SSH_MAX_CHANNELS", "8"))
+SSH_MAX_TRANSPORTS = int(os.getenv("SSH_MAX_TRANSPORTS", "2"))
+# Connections tunnelled through one bastion transport. Forwarding channels do
+# not count against MaxSessions, so this can be well above SSH_MAX_CHANNELS.
+SSH_MAX_TUNNELS = int(os.getenv("SSH_MAX_TUNNELS", "64"))
+# Transports without channels or tunnels for this long are closed; 0 keeps them
+SSH_IDLE_SECONDS = float(os.getenv("SSH_IDLE_SECONDS", "300"))
+
+
+PoolKey = Tuple[str, int, str, str]
+
+
+def pool_key(hostname: str, tags: Optional[dict]) -> PoolKey:
+    """What a transport is shared by: inventory rows may share a hostname but
+    differ in port, user or jump host, and must not share a connection."""
+    tags = tags or {}
+    return hostname, int(tags.get("port", 22)), tags.get("username", "root"), tags.get("jump_host", "")
+
+
+class _Transport:
+    """One authenticated connection, the channels open on it and the
+    connections tunnelled through it.
+
+    A connection tunnelled through a jump host holds one tunnel slot on the
+    bastion's transport (``bastion``) for as long as it lives.
+    """
+
+    __slots__ = ("client", "channels", "tunnels", "bastion", "last_used")
+
+    def __init__(self, client: "paramiko.SSHClient", bastion: Optional["_Transport"] = None):
+        self.client = client
+        self.channels = 0
+        self.tunnels = 0
+        self.bastion = bastion
+        self.last_used = time.monotonic()
+
+    def alive(self) -> bool:
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def idle(self) -> bool:
+        return self.channels == 0 and self.tunnels == 0
+
+
+class SSHPool:
+    """Keeps connected ``SSHClient`` objects per host and multiplexes channels over them.
+
+    Transports are shared per ``pool_key`` (hostname, port, user, jump host).
+
+    Paramiko transports are thread-safe for opening channels, so concurrent
+    commands run as separate channels on one authenticated transport. Once a
+    transport has ``max_channels`` open, a second transport is connected, up
+    to ``max_transports`` per host; beyond that callers wait for a channel to
+    close. Dead transports are replaced on the next request.
+
+    Hosts behind a jump host tunnel through the bastion's transports, up to
+    ``max_tunnels`` each. Transports left without channels or tunnels for
+    ``idle_seconds`` are closed, which also frees their bastion tunnel; when a
+    bastion is full, its least recently used idle tunnel is closed at once.
+    """
+
+    def __init__(
+        self,
+        connector=connect_server,
+        max_channels: int = SSH_MAX_CHANNELS,
+        max_transports: int = SSH_MAX_TRANSPORTS,
+        wait_timeout: float = 30.0,
+        breakers: Optional[CircuitBreakers] = None,
+        max_tunnels: int = SSH_MAX_TUNNELS,
+        idle_seconds: float = SSH_IDLE_SECONDS,
+    ):
+        self._connector = connector
+        self.breakers = breakers
+        self.max_channels = max_channels
+        self.max_transports = max_transports
+        self.max_tunnels = max_tunnels
+        self.idle_seconds = idle_seconds
+        self.wait_timeout = wait_timeout
+        self._transports: Dict[PoolKey, List[_Transport]] = {}
+        self._connecting: Set[PoolKey] = set()
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _unlink(self, entry: _Transport):
+        """Give back the bastion tunnel of a dropped transport; called with the lock held."""
+        if entry.bastion is not None:
+            entry.bastion.tunnels -= 1
+            entry.bastion.last_used = time.monotonic()
+            entry.bastion = None
+            self._changed.notify_all()
+
+    def _evict(self, entries: List[_Transport]):
+        """Drop ``entries`` from the pool and close them; called with the lock held."""
+        for entry in entries:
+            for key, pooled in list(self._transports.items()):
+                if entry in pooled:
+                    pooled.remove(entry)
+                    if not pooled:
+                        del self._transports[key]
+            self._unlink(entry)
+            entry.client.close()
+
+    def _sweep(self):
+        """Close transports idle for ``idle_seconds``; called with the lock held."""
+        now = time.monotonic()
+        if not self.idle_seconds or now < self._next_sweep:
+            return
+        self._next_sweep = now + min(self.idle_seconds, 1.0)
+        self._evict([
+            entry
+            for entries in self._transports.values()
+            for entry in entries
+            if entry.idle() and now - entry.last_used >= self.idle_seconds
+        ])
+
+    def _evict_idle_tunnel(self, bastions: List[_Transport]) -> bool:
+        """Close the least recently used idle host tunnelled through ``bastions``;
+        called with the lock held. Returns whether a tunnel was freed."""
+        idle = [
+            entry
+            for entries in self._transports.values()
+            for entry in entries
+            if entry.bastion in bastions and entry.idle()
+        ]
+        if not idle:
+            return False
+        self._evict([min(idle, key=lambda e: e.last_used)])
+        return True
+
+    def _live(self, key: PoolKey) -> List[_Transport]:
+        """Drop dead transports for ``key``; called with the lock held."""
+        entries = self._transports.get(key, [])
+        live = [entry for entry in entries if entry.alive()]
+        for entry in entries:
+            if entry not in live:
+                self._unlink(entry)
+                entry.client.close()
+        if live:
+            self._transports[key] = live
+        else:
+            self._transports.pop(key, None)
+        return live
+
+    def _has_room(self, entry: _Transport, tunnel: bool) -> bool:
+        return entry.tunnels < self.max_tunnels if tunnel else entry.channels < self.max_channels
+
+    def _take(self, entry: _Transport, tunnel: bool):
+        if tunnel:
+            entry.tunnels += 1
+        else:
+            entry.channels += 1
+
+    def _acquire(self, hostname: str, tags: Optional[dict], tunnel: bool = False) -> _Transport:
+        """Reserve a channel slot, or with ``tunnel`` a slot for a connection
+        tunnelled through this host, connecting a new transport if all are full."""
+        key = pool_key(hostname, tags)
+        jump = jump_target(tags)
+        if jump is not None and pool_key(*jump)[:3] == key[:3]:
+            # The bastion lookup would wait on this very connect until it timed out
+            raise HTTPException(status_code=500, detail=f"jump_host of {hostname} points at the host itself")
+        deadline = time.monotonic() + self.wait_timeout
+        with self._changed:
+            while True:
+                self._sweep()
+                live = self._live(key)
+                free = [entry for entry in live if self._has_room(entry, tunnel)]
+                if free:
+                    entry = min(free, key=lambda e: e.tunnels if tunnel else e.channels)
+                    self._take(entry, tunnel)
+                    return entry
+                # Only one connect per host at a time; others wait for its result
+                if key not in self._connecting and len(live) < self.max_transports:
+                    self._connecting.add(key)
+                    break
+                if tunnel and self._evict_idle_tunnel(live):
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise HTTPException(
+                        status_code=503, detail=f"No free SSH {'tunnel' if tunnel else 'channel'} on {hostname}"
+                    )
+                self._changed.wait(remaining)
+
+        entry = None
+        try:
+            if self.breakers is not None:
+                self.breakers.check(hostname)
+            # Bastion failures are recorded against the bastion, not this host
+            bastion = self._acquire(*jump, tunnel=True) if jump is not None else None
+            try:
+                entry = _Transport(self._connect(hostname, tags, bastion and bastion.client), bastion)
+            except Exception as error:
+                if bastion is not None:
+                    self._release(bastion, tunnel=True)
+                # Breakers probe hosts directly, which cannot work for tunnelled hosts
+                if self.breakers is not None and bastion is None and is_host_failure(error):
+                    self.breakers.record_failure(hostname, error, int((tags or {}).get("port", 22)))
+                raise
+            if self.breakers is not None:
+                self.breakers.record_success(hostname)
+            self._take(entry, tunnel)
+        finally:
+            with self._changed:
+                self._connecting.discard(key)
+                if entry is not None:
+                    self._transports.setdefault(key, []).append(entry)
+                self._changed.notify_all()
+        return entry
+
+    def _connect(self, hostname: str, tags: Optional[dict], bastion) -> "paramiko.SSHClient":
+        if bastion is None:
+            return self._connector(hostname, tags)
+        # Every host behind a bastion tunnels through its one pooled transport
+        return self._connector(hostname, tags, bastion=bastion)
+
+    def _release(self, entry: _Transport, tunnel: bool = False):
+        with self._changed:
+            if tunnel:
+                entry.tunnels -= 1
+            else:
+                entry.channels -= 1
+            entry.last_used = time.monotonic()
+            self._changed.notify_all()
+
+    @contextmanager
+    def session(self, hostname: str, tags: Optional[dict] = None) -> Iterator["paramiko.SSHClient"]:
+        """Yield a live client with one channel slot reserved for the caller."""
+        entry = self._acquire(hostname, tags)
+        try:
+            yield entry.client
+        except Exception:
+            # A broken transport is replaced on the next request
+            if not entry.alive():
+                self._discard_entry(pool_key(hostname, tags), entry)
+            raise
+        finally:
+            self._release(entry)
+
+    @contextmanager
+    def channel(
+        self,
+        hostname: str,
+        tags: Optional[dict] = None,
+        command: Optional[str] = None,
+        term: str = "xterm-256color",
+        cols: int = 80,
+        rows: int = 24,
+        window_size: Optional[int] = None,
+    ) -> Iterator["paramiko.Channel"]:
+        """Yield a channel running ``command``, or an interactive shell on a PTY if it is None.
+
+        The channel keeps its slot on the host's transport until it is closed
+        on leaving the block.
+        """
+        with self.session(hostname, tags) as client:
+            transport = client.get_transport()
+            channel = transport.open_session(window_size=window_size) if window_size else transport.open_session()
+            try:
+                if command is None:
+                    channel.get_pty(term=term, width=cols, height=rows)
+                    channel.invoke_shell()
+                else:
+                    channel.exec_command(command)
+                yield channel
+            finally:
+                # Closing sends EOF, which long-running commands such as tail use to exit
+                channel.close()
+
+    def get(self, hostname: str, tags: Optional[dict] = None) -> "paramiko.SSHClient":
+        """Return a live client for ``hostname``, connecting if needed.
+
+        Unlike ``session`` this does not keep a channel slot reserved, so use
+        it only to connect (e.g. warm-up); open channels inside ``session``.
+        """
+        with self.session(hostname, tags) as client:
+            return client
+
+    def execute(self, hostname: str, tags: Optional[dict], command: str) -> List[str]:
+        """Run ``command`` on its own channel of one of the host's shared transports.
+
+        With a ``command_timeout`` tag, raises 504 if the command produces no
+        output for that long.
+        """
+        timeout = latency_history.timeouts(hostname, tags).command
+        with self.session(hostname, tags) as client:
+            with COMMANDS_IN_FLIGHT.track_inprogress():
+                start = time.perf_counter()
+                _, stdout, _ = client.exec_command(command, timeout=timeout)
+                try:
+                    output = stdout.readlines()
+                except socket.timeout:
+                    stdout.channel.close()
+                    raise HTTPException(
+                        status_code=504, detail=f"Command on {hostname} timed out after {timeout:g}s without output"
+                    )
+                elapsed = time.perf_counter() - start
+            SSH_PHASE_SECONDS.observe(elapsed, phase="exec")
+            latency_history.observe(hostname, "command", elapsed)
+            return output
+
+    def _discard_entry(self, key: PoolKey, entry: _Transport):
+        with self._changed:
+            entries = self._transports.get(key, [])
+            if entry in entries:
+                entries.remove(entry)
+                self._unlink(entry)
+                if not entries:
+                    del self._transports[key]
+            self._changed.notify_all()
+        entry.client.close()
+
+    def discard(self, hostname: str):
+        """Close and forget every transport to ``hostname``, e.g. after an error."""
+        with self._changed:
+            entries = []
+            for key in [key for key in self._transports if key[0] == hostname]:
+                entries.extend(self._transports.pop(key))
+            for entry in entries:
+                self._unlink(entry)
+            self._changed.notify_all()
+        for entry in entries:
+            entry.client.close()
+
+    def close_all(self):
+        for hostname in self.hosts():
+            self.discard(hostname)
+
+    def hosts(self) -> List[str]:
+        with self._lock:
+            return list(dict.fromkeys(key[0] for key in self._transports))
+
+    def transport_count(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._transports.values())
+
+    def channel_count(self) -> int:
+        with self._lock:
+            return sum(entry.channels for entries in self._transports.values() for entry in entries)
+
+    def tunnel_count(self) -> int:
+        with self._lock:
+            return sum(entry.tunnels for entries in self._transports.values() for entry in entries)
+
+
+ssh_pool = SSHPool(breakers=breakers)
+SSH_SESSIONS.set_function(ssh_pool.transport_count, pool="ssh_pool")
+SSH_CHANNELS.set_function(ssh_pool.channel_count, pool="ssh_pool")
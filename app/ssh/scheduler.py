@@ -0,0 +1,138 @@
+"""Fair scheduler in front of remote command execution.
+
+Commands wait in one FIFO queue per client (API key). When a slot frees,
+clients are served round-robin, and within a client the oldest command whose
+host is still below its cap runs next, so one busy host cannot hold up
+commands for the others. Admitted commands run on the host's execution
+backend (see ``backends``), by default as channels on its pooled transport.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..metrics import COMMANDS_QUEUED, QUEUE_WAIT_SECONDS
+from .backends import backend_for
+from .pool import SSHPool, ssh_pool
+
+SSH_GLOBAL_LIMIT = int(os.getenv("SSH_GLOBAL_LIMIT", "64"))
+SSH_PER_HOST_LIMIT = int(os.getenv("SSH_PER_HOST_LIMIT", "4"))
+SSH_QUEUE_TIMEOUT = float(os.getenv("SSH_QUEUE_TIMEOUT", "30"))
+
+
+@dataclass
+class _Ticket:
+    hostname: str
+    client_id: str
+    host_limit: int
+    granted: threading.Event = field(default_factory=threading.Event)
+
+
+class CommandScheduler:
+    """Admits remote commands under a global cap and a per-host cap.
+
+    A host's cap can be lowered or raised with a ``max_sessions`` entry in
+    ``Server.tags``.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = SSH_GLOBAL_LIMIT,
+        per_host_limit: int = SSH_PER_HOST_LIMIT,
+        queue_timeout: float = SSH_QUEUE_TIMEOUT,
+        pool: SSHPool = ssh_pool,
+    ):
+        self.global_limit = global_limit
+        self.per_host_limit = per_host_limit
+        self.queue_timeout = queue_timeout
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._active = 0
+        self._host_active: Dict[str, int] = {}
+
+    def _dispatch(self):
+        """Grant free slots to waiting tickets; called with the lock held."""
+        while self._active < self.global_limit and self._queues:
+            granted = None
+            for client_id, queue in self._queues.items():
+                for ticket in queue:
+                    if self._host_active.get(ticket.hostname, 0) < ticket.host_limit:
+                        granted = ticket
+                        break
+                if granted is not None:
+                    queue.remove(granted)
+                    # Move this client to the back of the rotation
+                    self._queues.move_to_end(client_id)
+                    if not queue:
+                        del self._queues[client_id]
+                    break
+            if granted is None:
+                return
+            self._active += 1
+            self._host_active[granted.hostname] = self._host_active.get(granted.hostname, 0) + 1
+            granted.granted.set()
+
+    def _release(self, ticket: _Ticket):
+        with self._lock:
+            self._active -= 1
+            remaining = self._host_active[ticket.hostname] - 1
+            if remaining:
+                self._host_active[ticket.hostname] = remaining
+            else:
+                del self._host_active[ticket.hostname]
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, hostname: str, client_id: str = "", host_limit: Optional[int] = None) -> Iterator[float]:
+        """Wait for a slot on ``hostname`` and yield the seconds spent queued.
+
+        Raises 503 if no slot frees up within ``queue_timeout``.
+        """
+        ticket = _Ticket(hostname, client_id, host_limit or self.per_host_limit)
+        start = time.perf_counter()
+        with self._lock:
+            self._queues.setdefault(client_id, deque()).append(ticket)
+            self._dispatch()
+        if not ticket.granted.is_set():
+            with COMMANDS_QUEUED.track_inprogress():
+                ticket.granted.wait(self.queue_timeout)
+            with self._lock:
+                if not ticket.granted.is_set():
+                    queue = self._queues.get(client_id)
+                    if queue is not None:
+                        queue.remove(ticket)
+                        if not queue:
+                            del self._queues[client_id]
+                    raise HTTPException(status_code=503, detail=f"Timed out waiting for an SSH slot on {hostname}")
+        waited = time.perf_counter() - start
+        QUEUE_WAIT_SECONDS.observe(waited)
+        try:
+            yield waited
+        finally:
+            self._release(ticket)
+
+    def run(
+        self, hostname: str, tags: Optional[dict], command: str, client_id: str = ""
+    ) -> Tuple[List[str], float]:
+        """Run ``command`` on ``hostname`` once admitted; returns (output lines, queue wait seconds)."""
+        host_limit = int((tags or {}).get("max_sessions", 0)) or None
+        with self.slot(hostname, client_id, host_limit) as waited:
+            return backend_for(tags, self.pool).execute(hostname, tags, command), waited
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "hosts": dict(self._host_active),
+            }
+
+
+command_scheduler = CommandScheduler()
@@ -0,0 +1,163 @@
+"""Interactive shells relayed over WebSockets.
+
+Each shell is a PTY channel on the host's pooled transport. No thread is
+held per shell: the event loop watches the channel's readiness pipe, and
+terminal output is read only once the previous frame has been sent, so a
+slow client stalls just its own channel, whose SSH window
+(``SSH_SHELL_WINDOW`` bytes) bounds what is buffered for it.
+
+Binary frames carry raw terminal bytes in both directions. Text frames from
+the client are JSON control messages; ``{"type": "resize", "cols": 120,
+"rows": 40}`` resizes the PTY. When the remote shell exits the server sends
+``{"type": "exit", "status": <code>}`` and closes the socket.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket
+
+from ..metrics import SSH_SHELLS
+from .broker import BrokerClient, session_owner
+from .pool import SSHPool
+
+SSH_SHELL_MAX = int(os.getenv("SSH_SHELL_MAX", "256"))
+SSH_SHELL_WINDOW = int(os.getenv("SSH_SHELL_WINDOW", str(256 * 1024)))
+
+_CHUNK = 32768
+# Back-off while the remote side's window is full
+_SEND_RETRY_SECONDS = 0.01
+# How long to wait for the exit status once the shell's output has ended
+_EXIT_STATUS_SECONDS = 5.0
+
+
+async def _readable(fd: int):
+    """Wait until ``fd`` is readable without keeping it registered afterwards."""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+    try:
+        await ready
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _send_all(channel, data: bytes):
+    # In a worker thread: a channel relayed by the broker writes to a blocking pipe
+    while data:
+        try:
+            sent = await run_in_threadpool(channel.send, data)
+        except socket.timeout:
+            sent = 0
+        data = data[sent:]
+        if data:
+            await asyncio.sleep(_SEND_RETRY_SECONDS)
+
+
+async def pump_output(websocket: WebSocket, channel):
+    """Forward terminal output until the channel reaches EOF."""
+    fd = channel.fileno()
+    while True:
+        await _readable(fd)
+        try:
+            data = channel.recv(_CHUNK)
+        except socket.timeout:
+            continue
+        if not data:
+            return
+        await websocket.send_bytes(data)
+
+
+async def pump_input(websocket: WebSocket, channel):
+    """Forward keystrokes and apply resize messages until the client goes away."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes") is not None:
+            await _send_all(channel, message["bytes"])
+        elif message.get("text"):
+            try:
+                control = json.loads(message["text"])
+                if control.get("type") == "resize":
+                    await run_in_threadpool(
+                        channel.resize_pty, width=int(control["cols"]), height=int(control["rows"])
+                    )
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+
+
+class ShellRelay:
+    """Opens PTY shells on pooled transports, at most ``max_shells`` at a time."""
+
+    def __init__(
+        self,
+        pool: Union[SSHPool, BrokerClient] = session_owner,
+        max_shells: int = SSH_SHELL_MAX,
+        window: int = SSH_SHELL_WINDOW,
+    ):
+        self.pool = pool
+        self.max_shells = max_shells
+        self.window = window
+        self._lock = threading.Lock()
+        self._open = 0
+
+    def count(self) -> int:
+        return self._open
+
+    @asynccontextmanager
+    async def open(
+        self, hostname: str, tags: Optional[dict], term: str = "xterm-256color", cols: int = 80, rows: int = 24
+    ) -> AsyncIterator:
+        """Yield a started PTY channel; raises 503 when ``max_shells`` are already open."""
+        with self._lock:
+            if self._open >= self.max_shells:
+                raise HTTPException(status_code=503, detail=f"Too many open shells (limit {self.max_shells})")
+            self._open += 1
+        try:
+            # The channel holds a slot on the host's transport for the shell's lifetime
+            opened = self.pool.channel(hostname, tags, term=term, cols=cols, rows=rows, window_size=self.window)
+            channel = await run_in_threadpool(opened.__enter__)
+            try:
+                channel.settimeout(0.0)
+                yield channel
+            finally:
+                opened.__exit__(None, None, None)
+        finally:
+            with self._lock:
+                self._open -= 1
+
+    async def relay(self, websocket: WebSocket, channel) -> Optional[int]:
+        """Pump bytes both ways until either side ends; returns the shell's exit status if it exited."""
+        tasks = [
+            asyncio.create_task(pump_output(websocket, channel)),
+            asyncio.create_task(pump_input(websocket, channel)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in done:
+            task.result()
+        if tasks[0] not in done:
+            return None  # the client left first
+        # The exit status follows the output's EOF, so wait for it rather than
+        # racing it; a channel that closes without one reports -1
+        try:
+            status = await asyncio.wait_for(run_in_threadpool(channel.recv_exit_status), _EXIT_STATUS_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+        return None if status == -1 else status
+
+
+shell_relay = ShellRelay()
+SSH_SHELLS.set_function(shell_relay.count)
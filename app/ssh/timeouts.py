@@ -0,0 +1,108 @@
+"""Adaptive per-host SSH timeouts.
+
+Each host keeps a rolling window of observed TCP connect, SSH handshake and
+command latencies. The connect, banner and auth timeouts are the window's
+p99 times ``SSH_TIMEOUT_FACTOR``, clamped to a per-phase floor and ceiling,
+so nearby hosts fail fast while distant ones are not cut off. Until enough
+samples exist the phase default is used. ``Server.tags`` may pin any of them
+with ``connect_timeout``, ``banner_timeout`` or ``auth_timeout`` (seconds).
+
+Command durations say nothing about how long the next, unrelated command
+may legitimately run, so commands have no timeout unless the server's
+``command_timeout`` tag sets one. Their latency is still recorded for
+``describe``.
+"""
+
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict, Optional
+
+SSH_TIMEOUT_FACTOR = float(os.getenv("SSH_TIMEOUT_FACTOR", "4"))
+SSH_TIMEOUT_WINDOW = int(os.getenv("SSH_TIMEOUT_WINDOW", "256"))
+SSH_TIMEOUT_MIN_SAMPLES = 5
+
+# phase -> (floor, default, ceiling) in seconds
+TIMEOUT_BOUNDS = {
+    "connect": (1.0, 10.0, 30.0),
+    "banner": (2.0, 15.0, 60.0),
+    "auth": (3.0, 20.0, 60.0),
+}
+
+# Which observed latency each timeout is derived from; the banner arrives
+# during the handshake, so it shares the handshake history with auth.
+_SOURCE_PHASE = {"connect": "connect", "banner": "handshake", "auth": "handshake"}
+
+
+@dataclass
+class HostTimeouts:
+    connect: float
+    banner: float
+    auth: float
+    # Only set by the ``command_timeout`` tag; None means no limit
+    command: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _p99(samples) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+class LatencyHistory:
+    """Rolling latency windows per (host, phase) and the timeouts derived from them."""
+
+    def __init__(
+        self,
+        window: int = SSH_TIMEOUT_WINDOW,
+        factor: float = SSH_TIMEOUT_FACTOR,
+        min_samples: int = SSH_TIMEOUT_MIN_SAMPLES,
+        bounds: Optional[Dict[str, tuple]] = None,
+    ):
+        self.window = window
+        self.factor = factor
+        self.min_samples = min_samples
+        self.bounds = dict(TIMEOUT_BOUNDS, **(bounds or {}))
+        self._samples: Dict[str, Dict[str, Deque[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, hostname: str, phase: str, seconds: float):
+        """Record one ``connect``, ``handshake`` or ``command`` latency."""
+        with self._lock:
+            phases = self._samples.setdefault(hostname, {})
+            samples = phases.get(phase)
+            if samples is None:
+                samples = phases[phase] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def _derive(self, hostname: str, timeout: str) -> float:
+        floor, default, ceiling = self.bounds[timeout]
+        samples = self._samples.get(hostname, {}).get(_SOURCE_PHASE[timeout])
+        if not samples or len(samples) < self.min_samples:
+            return default
+        return round(min(ceiling, max(floor, _p99(samples) * self.factor)), 3)
+
+    def timeouts(self, hostname: str, tags: Optional[dict] = None) -> HostTimeouts:
+        tags = tags or {}
+        with self._lock:
+            values = {name: self._derive(hostname, name) for name in self.bounds}
+        for name in (*values, "command"):
+            override = tags.get(f"{name}_timeout")
+            if override is not None:
+                values[name] = float(override)
+        return HostTimeouts(**values)
+
+    def describe(self, hostname: str, tags: Optional[dict] = None) -> dict:
+        """Current timeouts plus the sample counts and p99s behind them."""
+        with self._lock:
+            phases = {
+                phase: {"samples": len(samples), "p99_ms": round(_p99(samples) * 1000, 3)}
+                for phase, samples in self._samples.get(hostname, {}).items()
+            }
+        return {"host": hostname, "timeouts": self.timeouts(hostname, tags).as_dict(), "latency": phases}
+
+
+latency_history = LatencyHistory()
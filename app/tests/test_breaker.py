@@ -0,0 +1,69 @@
+import pytest
+from fastapi import HTTPException
+
+from app.ssh.breaker import OPEN, CircuitBreakers
+from app.ssh.pool import SSHPool
+
+
+class FlakyConnector:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, hostname, tags):
+        self.calls += 1
+        raise self.error
+
+
+def test_consecutive_failures_open_the_circuit_and_fail_fast():
+    breakers = CircuitBreakers(threshold=2, backoff=60)
+    connector = FlakyConnector(ConnectionRefusedError(111, "Connection refused"))
+    pool = SSHPool(connector=connector, breakers=breakers)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionRefusedError):
+            pool.get("down", {"port": "2222"})
+    with pytest.raises(HTTPException) as excinfo:
+        pool.get("down", {"port": "2222"})
+    assert excinfo.value.status_code == 503
+    assert connector.calls == 2
+    assert breakers.snapshot()["down"]["state"] == OPEN
+    breakers.stop()
+
+
+def test_auth_failures_do_not_trip_the_breaker():
+    breakers = CircuitBreakers(threshold=1)
+    pool = SSHPool(connector=FlakyConnector(HTTPException(status_code=401, detail="Authentication failed")),
+                   breakers=breakers)
+    for _ in range(3):
+        with pytest.raises(HTTPException) as excinfo:
+            pool.get("web")
+        assert excinfo.value.status_code == 401
+    assert breakers.snapshot() == {}
+
+
+def test_probes_back_off_and_close_the_circuit_on_recovery():
+    probes = []
+    up = {"value": False}
+    breakers = CircuitBreakers(threshold=1, backoff=0, max_backoff=0, probe=lambda host, port: probes.append((host, port)) or up["value"])
+    breakers._ensure_prober = lambda: None  # drive probes by hand
+    breakers.record_failure("db", TimeoutError("timed out"), port=2200)
+
+    breakers.probe_due()
+    assert breakers.snapshot()["db"]["state"] == OPEN
+
+    up["value"] = True
+    assert breakers.probe_due() is None
+    assert breakers.snapshot() == {}
+    assert probes == [("db", 2200), ("db", 2200)]
+
+
+def test_backoff_doubles_up_to_the_ceiling():
+    breakers = CircuitBreakers(threshold=1, backoff=1, max_backoff=3, probe=lambda host, port: False)
+    breakers._ensure_prober = lambda: None
+    breakers.record_failure("db", TimeoutError("timed out"))
+    circuit = breakers._circuits["db"]
+    for expected in (2, 3, 3):
+        circuit.next_probe = 0
+        breakers.probe_due()
+        assert circuit.backoff == expected
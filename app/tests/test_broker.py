@@ -0,0 +1,249 @@
+import asyncio
+import io
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.repositories.inventory import InventoryVersionRepository
+from app.schemas.fleet import FleetEditRequest
+from app.services.fleet_stream import FleetStream, StreamJob
+from app.services.inventory_sync import VersionWatcher
+from app.ssh.broker import BrokerClient, BrokerServer
+from app.ssh.pool import SSHPool
+
+
+class FakeChannel:
+    """Prints "ran <command>" and exits, or echoes input when it is a shell."""
+
+    def __init__(self):
+        self.output = queue.Queue()
+        self.sizes = []
+        self.closed = threading.Event()
+
+    def exec_command(self, command):
+        self.output.put(f"ran {command}\n".encode())
+        self.output.put(b"")
+
+    def get_pty(self, term, width, height):
+        self.sizes.append((width, height))
+
+    def invoke_shell(self):
+        pass
+
+    def resize_pty(self, width, height):
+        self.sizes.append((width, height))
+
+    def sendall(self, data):
+        self.output.put(data)
+
+    def recv(self, size):
+        return self.output.get()
+
+    def recv_exit_status(self):
+        return -1 if self.closed.is_set() else 0
+
+    def close(self):
+        self.closed.set()
+        self.output.put(b"")
+
+
+class FakeTransport:
+    def __init__(self):
+        self.channels = []
+
+    def is_active(self):
+        return True
+
+    def open_session(self, window_size=None):
+        self.channels.append(FakeChannel())
+        return self.channels[-1]
+
+
+class FakeClient:
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, command, timeout=None):
+        return None, io.StringIO(f"{self.hostname}: {command}\n"), None
+
+    def close(self):
+        pass
+
+
+def fake_connector(hostname, tags):
+    if hostname == "down":
+        raise HTTPException(status_code=500, detail="SSH connection error: refused")
+    return FakeClient(hostname)
+
+
+@pytest.fixture
+def broker_server(tmp_path):
+    server = BrokerServer(str(tmp_path / "broker.sock"), authkey=b"test", pool=SSHPool(connector=fake_connector))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def broker(broker_server):
+    client = BrokerClient(broker_server.address, authkey=b"test", spawn=False)
+    for _ in range(50):
+        try:
+            client.call("ping")
+            break
+        except HTTPException:
+            threading.Event().wait(0.05)
+    return client
+
+
+def test_broker_executes_and_shares_sessions(broker, tmp_path):
+    assert broker.execute("web-1", {}, "uptime") == ["web-1: uptime\n"]
+
+    # A second worker talking to the same broker sees the same pooled session
+    other_worker = BrokerClient(str(tmp_path / "broker.sock"), authkey=b"test", spawn=False)
+    assert other_worker.sessions() == ["web-1"]
+
+
+def test_broker_relays_http_errors(broker):
+    with pytest.raises(HTTPException) as excinfo:
+        broker.execute("down", {}, "uptime")
+    assert excinfo.value.status_code == 500
+    assert "refused" in excinfo.value.detail
+
+
+def test_streams_run_on_broker_channels(broker, broker_server):
+    jobs = [StreamJob(host, {}, "tail -F app.log", {"host": host}) for host in ("web-1", "down")]
+
+    async def collect():
+        return [event async for event in FleetStream(jobs, pool=broker).events() if event is not None]
+
+    events = asyncio.run(collect())
+
+    assert {"host": "web-1", "line": "ran tail -F app.log"} in events
+    assert {"host": "web-1", "exit_status": 0} in events
+    assert {"host": "down", "error": "SSH connection error: refused"} in events
+    assert broker_server.pool.channel_count() == 0
+
+
+def test_shell_input_and_resizes_are_relayed(broker, broker_server):
+    with broker.channel("web-1", {}, cols=100, rows=30) as shell:
+        shell.settimeout(5)
+        shell.send(b"ls\r")
+        assert shell.recv(1024) == b"ls\r"
+        shell.resize_pty(width=120, height=40)
+        shell.send(b"exit\r")
+        assert shell.recv(1024) == b"exit\r"
+        remote = broker_server.pool.get("web-1").transport.channels[0]
+        assert broker_server.pool.channel_count() == 1
+
+    assert remote.closed.wait(5)
+    assert remote.sizes == [(100, 30), (120, 40)]
+    deadline = time.monotonic() + 5
+    while broker_server.pool.channel_count() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert broker_server.pool.channel_count() == 0
+
+
+def test_edits_and_metrics_run_in_the_broker(broker, broker_server):
+    request = FleetEditRequest(servers=["down"], path="/etc/app.yaml", edits=[])
+
+    [result] = broker.edit_fleet([("down", {})], request)
+    assert result.server == "down" and result.error == "SSH connection error: refused"
+
+    assert broker.collect_once([("down", {})])[0]["ok"] is False
+    assert broker.latest() == broker_server.collector.latest() == {}
+    assert broker.series("down") == []
+
+
+def test_a_request_the_broker_received_is_not_sent_again(tmp_path):
+    address = str(tmp_path / "broker.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=b"test")
+    received = []
+
+    def die_mid_request():
+        # Takes each request, then goes away without answering
+        for _ in range(2):
+            with listener.accept() as conn:
+                received.append(conn.recv())
+
+    threading.Thread(target=die_mid_request, daemon=True).start()
+    client = BrokerClient(address, authkey=b"test", spawn=False)
+
+    with pytest.raises(HTTPException) as excinfo:
+        client.run("web-1", {}, "systemctl restart app")
+    assert excinfo.value.status_code == 503
+    time.sleep(0.2)
+    assert received == [("run", "web-1", {}, "systemctl restart app", "")]
+    listener.close()
+
+
+def test_client_restarts_a_broker_that_went_away(tmp_path):
+    address = str(tmp_path / "broker.sock")
+    client = BrokerClient(address)
+    pids = [client.call("ping")]
+    try:
+        os.kill(pids[0], signal.SIGTERM)
+        os.waitpid(pids[0], 0)  # spawned by this process, so it can be reaped once gone
+
+        pids.append(client.call("ping"))
+        assert pids[1] != pids[0]
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def test_version_watcher_sees_bumps_from_other_processes():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    writer = VersionWatcher("servers_json", poll_interval=0, session_factory=session_factory)
+    reader = VersionWatcher("servers_json", poll_interval=0, session_factory=session_factory)
+
+    assert reader.current() == 0
+    writer.bump()
+    writer.bump()
+    assert reader.current() == 2
+
+
+def test_concurrent_first_bumps_do_not_conflict(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'versions.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    start = threading.Barrier(8)
+    errors = []
+
+    def bump():
+        db = session_factory()
+        try:
+            start.wait()
+            InventoryVersionRepository(db).bump("servers_json")
+        except Exception as error:
+            errors.append(error)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert InventoryVersionRepository(session_factory()).get("servers_json") == 8
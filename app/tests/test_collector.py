@@ -0,0 +1,106 @@
+import io
+from contextlib import contextmanager
+
+from app.services.collector import PROBE_SCRIPT, FleetCollector, RingBuffer, parse_probe_output
+
+PROBE_OUTPUT = """@@hostname
+web-1
+@@uptime
+3600.50 7000.00
+@@loadavg
+0.50 0.25 0.10 1/100 1234
+@@meminfo
+MemTotal:        2000000 kB
+MemFree:          500000 kB
+MemAvailable:    1500000 kB
+SwapTotal:       1000000 kB
+SwapFree:         750000 kB
+@@stat
+cpu  {user} 0 100 {idle} 0 0 0 0 0 0
+@@df
+Filesystem     1024-blocks    Used Available Capacity Mounted on
+/dev/vda1         10000000 2500000   7500000      25% /
+"""
+
+
+class FakePool:
+    def __init__(self, output=PROBE_OUTPUT):
+        self.cycle = 0
+        self.output = output
+        self.timeouts = []
+        self.discarded = []
+
+    def get(self, hostname, tags=None):
+        pool = self
+
+        class Client:
+            def exec_command(self, command, timeout=None):
+                assert command == PROBE_SCRIPT
+                pool.cycle += 1
+                pool.timeouts.append(timeout)
+                output = pool.output.format(user=100 * pool.cycle, idle=300 * pool.cycle)
+                return None, io.BytesIO(output.encode()), None
+
+        return Client()
+
+    @contextmanager
+    def session(self, hostname, tags=None):
+        yield self.get(hostname, tags)
+
+    def discard(self, hostname):
+        self.discarded.append(hostname)
+
+
+def test_parse_probe_output():
+    sample = parse_probe_output(PROBE_OUTPUT.format(user=100, idle=300))
+
+    assert sample["hostname"] == "web-1"
+    assert sample["uptime_seconds"] == 3600.5
+    assert (sample["load1"], sample["load5"], sample["load15"]) == (0.5, 0.25, 0.1)
+    assert sample["mem_used_percent"] == 25.0
+    assert sample["swap_used_percent"] == 25.0
+    assert sample["disk_used_percent"] == 25.0
+    assert sample["cpu_total"] == 500
+
+
+def test_ring_buffer_keeps_latest_samples():
+    buffer = RingBuffer(capacity=3, fields=("timestamp", "load1"))
+    for i in range(5):
+        buffer.append({"timestamp": float(i), "load1": i / 10})
+
+    assert len(buffer) == 3
+    assert [row["timestamp"] for row in buffer.rows()] == [2.0, 3.0, 4.0]
+    assert [row["timestamp"] for row in buffer.rows(since=3.0)] == [4.0]
+
+
+def test_collector_derives_cpu_percent_between_cycles():
+    collector = FleetCollector(capacity=10, pool=FakePool())
+    collector.collect_once([("web-1", {})])
+    collector.collect_once([("web-1", {})])
+
+    series = collector.series("web-1")
+    assert len(series) == 2
+    assert series[0]["cpu_percent"] is None
+    # Between cycles: +100 user, +300 idle of +400 total jiffies -> 25% busy
+    assert series[1]["cpu_percent"] == 25.0
+    assert collector.latest()["web-1"]["hostname"] == "web-1"
+
+
+def test_unparsable_output_is_reported_without_dropping_the_hosts_transports():
+    pool = FakePool(output="@@loadavg\nnot numbers\n")
+    collector = FleetCollector(pool=pool)
+
+    [result] = collector.collect_once([("web-1", {})])
+
+    assert result["ok"] is False and "Unparsable" in result["error"]
+    assert pool.discarded == []
+    assert collector.latest() == {}
+
+
+def test_probes_have_a_timeout_even_without_a_tag():
+    pool = FakePool()
+    collector = FleetCollector(pool=pool, probe_timeout=7.0)
+
+    collector.collect_once([("web-1", {}), ("web-2", {"command_timeout": "3"})])
+
+    assert sorted(pool.timeouts) == [3.0, 7.0]
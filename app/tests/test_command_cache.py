@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.command_cache import ResultCache
+
+
+def test_fresh_results_are_reused_until_max_age():
+    cache = ResultCache()
+    calls = []
+
+    def run():
+        calls.append(1)
+        return ["42\n"], 0.0
+
+    assert cache.get_or_run(("web", "df -h"), 60, run) == ((["42\n"], 0.0), False)
+    assert cache.get_or_run(("web", "df -h"), 60, run) == ((["42\n"], 0.0), True)
+    assert cache.get_or_run(("web", "df -h"), 0, run)[1] is False
+    assert len(calls) == 2
+
+
+def test_concurrent_identical_requests_share_one_execution():
+    cache = ResultCache()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def run():
+        calls.append(1)
+        release.wait(5)
+        return ["active\n"], 0.0
+
+    def request():
+        results.append(cache.get_or_run(("web", "systemctl is-active nginx"), 60, run))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(cached for _, cached in results) == [False] + [True] * 7
+    assert all(value == (["active\n"], 0.0) for value, _ in results)
+
+
+def test_errors_are_shared_but_not_cached():
+    cache = ResultCache()
+
+    def fail():
+        raise HTTPException(status_code=500, detail="boom")
+
+    with pytest.raises(HTTPException):
+        cache.get_or_run(("web", "uptime"), 60, fail)
+    assert len(cache) == 0
+
+
+def test_eviction_is_lru_and_size_bounded():
+    cache = ResultCache(max_entries=2, max_bytes=10)
+    cache.get_or_run("a", 60, lambda: (["aaaa"], 0.0))
+    cache.get_or_run("b", 60, lambda: (["bbbb"], 0.0))
+    cache.get_or_run("a", 60, lambda: (["new"], 0.0))  # hit: "a" becomes most recent
+    cache.get_or_run("c", 60, lambda: (["cccc"], 0.0))
+    assert cache.get_or_run("a", 60, lambda: (["new"], 0.0)) == ((["aaaa"], 0.0), True)
+    assert cache.get_or_run("b", 60, lambda: (["bbbb"], 0.0))[1] is False
+
+    cache.get_or_run("huge", 60, lambda: (["x" * 11], 0.0))
+    assert cache.get_or_run("huge", 60, lambda: (["x" * 11], 0.0))[1] is False
@@ -0,0 +1,64 @@
+import pytest
+
+import file_editor
+from file_editor import FileEditor
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    path = tmp_path / "sample.conf"
+    path.write_text("alpha = 1\nbeta = 2\ngamma = 3\nbeta_extra = 4\n")
+    return path
+
+
+def test_replace_phrase_across_chunk_boundaries(tmp_path, monkeypatch):
+    """Matches straddling a chunk boundary are still replaced."""
+    monkeypatch.setattr(file_editor, "CHUNK_SIZE", 4)
+    path = tmp_path / "big.log"
+    path.write_text("xxneedlexx needle needleneedle\n")
+
+    FileEditor.replace_phrase_in_file(str(path), "needle", "pin")
+
+    assert path.read_text() == "xxpinxx pin pinpin\n"
+
+
+def test_replace_phrase_without_match_leaves_file_untouched(sample_file):
+    before = sample_file.stat().st_mtime_ns
+    FileEditor.replace_phrase_in_file(str(sample_file), "delta", "epsilon")
+    assert sample_file.stat().st_mtime_ns == before
+
+
+def test_replace_line_and_add_text(sample_file):
+    FileEditor.replace_line_in_file(str(sample_file), "gamma", "gamma = 30")
+    FileEditor.add_text_to_end_of_line(str(sample_file), "alpha", "# edited")
+
+    assert sample_file.read_text() == "alpha = 1 # edited\nbeta = 2\ngamma = 30\nbeta_extra = 4\n"
+
+
+def test_search_file_reports_line_numbers(sample_file):
+    assert FileEditor.search_file(str(sample_file), "beta") == [(2, "beta = 2"), (4, "beta_extra = 4")]
+    assert FileEditor.search_file(str(sample_file), "missing") == []
+
+
+def test_apply_edits_matches_sequential_operations(sample_file, tmp_path):
+    edits = [
+        ("replace-phrase", "beta", "BETA"),
+        ("replace-line", "gamma", "gamma = 3 # pinned"),
+        ("add-text-to-end-of-line", "pinned", "!"),
+        ("append-text", "delta = 5"),
+    ]
+    sequential = tmp_path / "sequential.conf"
+    sequential.write_text(sample_file.read_text())
+    FileEditor.replace_phrase_in_file(str(sequential), "beta", "BETA")
+    FileEditor.replace_line_in_file(str(sequential), "gamma", "gamma = 3 # pinned")
+    FileEditor.add_text_to_end_of_line(str(sequential), "pinned", "!")
+    FileEditor.append_text_to_file(str(sequential), "delta = 5")
+
+    FileEditor.apply_edits(str(sample_file), edits)
+
+    assert sample_file.read_text() == sequential.read_text()
+
+
+def test_apply_edits_rejects_unknown_operation(sample_file):
+    with pytest.raises(ValueError):
+        FileEditor.apply_edits(str(sample_file), [("truncate", "alpha", "")])
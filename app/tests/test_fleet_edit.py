@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+
+import yaml
+
+from app.schemas.fleet import FleetEditRequest
+from app.services.fleet_edit import edit_fleet
+
+
+class LocalSFTP:
+    """Minimal SFTP stand-in backed by the local filesystem."""
+
+    def __init__(self, root):
+        self.root = root
+        self.owners = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _path(self, path):
+        return self.root / path.lstrip("/")
+
+    def open(self, path, mode):
+        return open(self._path(path), mode)
+
+    def stat(self, path):
+        return self._path(path).stat()
+
+    def chmod(self, path, mode):
+        self._path(path).chmod(mode)
+
+    def chown(self, path, uid, gid):
+        self.owners[path] = (uid, gid)
+
+    def remove(self, path):
+        self._path(path).unlink()
+
+    def posix_rename(self, old, new):
+        self._path(old).replace(self._path(new))
+
+
+class FakePool:
+    def __init__(self, roots):
+        self.roots = roots
+        self.sftps = []
+
+    def get(self, hostname, tags=None):
+        root = self.roots[hostname]
+
+        sftps = self.sftps
+
+        class Client:
+            def open_sftp(self):
+                sftp = LocalSFTP(root)
+                sftps.append(sftp)
+                return sftp
+
+        return Client()
+
+    @contextmanager
+    def session(self, hostname, tags=None):
+        yield self.get(hostname, tags)
+
+
+def make_hosts(tmp_path, names):
+    roots = {}
+    for name in names:
+        root = tmp_path / name
+        (root / "etc").mkdir(parents=True)
+        (root / "etc" / "app.yaml").write_text("log:\n  level: info\n")
+        roots[name] = root
+    return roots
+
+
+def test_dry_run_reports_diff_without_writing(tmp_path):
+    roots = make_hosts(tmp_path, ["a", "b"])
+    request = FleetEditRequest(
+        servers=["a", "b"],
+        path="/etc/app.yaml",
+        edits=[{"op": "update", "path": ["log", "level"], "value": "debug"}],
+    )
+
+    results = edit_fleet([("a", {}), ("b", {})], request, pool=FakePool(roots))
+
+    assert [r.server for r in results] == ["a", "b"]
+    assert all(r.changed and not r.written for r in results)
+    assert "+  level: debug" in results[0].diff
+    assert (roots["a"] / "etc" / "app.yaml").read_text() == "log:\n  level: info\n"
+
+
+def test_apply_writes_and_reports_per_host_errors(tmp_path):
+    roots = make_hosts(tmp_path, ["a"])
+    roots["missing"] = tmp_path / "missing"
+    request = FleetEditRequest(
+        servers=["a", "missing"],
+        path="/etc/app.yaml",
+        kind="text",
+        edits=[["replace-phrase", "info", "warning"]],
+        dry_run=False,
+    )
+
+    pool = FakePool(roots)
+    ok, failed = edit_fleet([("a", {}), ("missing", {})], request, pool=pool)
+
+    assert ok.written and ok.error is None
+    # The replacement keeps the original's owner and leaves no temp file behind
+    target = roots["a"] / "etc" / "app.yaml"
+    [(temp_path, owner)] = [item for sftp in pool.sftps for item in sftp.owners.items()]
+    assert temp_path.startswith("/etc/app.yaml.vpsmanager.") and owner == (target.stat().st_uid, target.stat().st_gid)
+    assert sorted(p.name for p in target.parent.iterdir()) == ["app.yaml"]
+    assert yaml.safe_load((roots["a"] / "etc" / "app.yaml").read_text()) == {"log": {"level": "warning"}}
+    assert not failed.written and "FileNotFoundError" in failed.error
@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+
+from app.services.fleet_grep import grep_command, parse_match
+from app.services.fleet_stream import StreamJob
+
+
+def search(tmp_path, command, path_dirs):
+    result = subprocess.run(["sh", "-c", command], env={"PATH": os.pathsep.join(path_dirs)}, capture_output=True)
+    job = StreamJob("web", None, command, {"host": "web"})
+    return [parse_match(job, line) for line in result.stdout.decode().splitlines()]
+
+
+def make_logs(tmp_path):
+    logs = tmp_path / "logs"
+    (logs / "nested").mkdir(parents=True)
+    (logs / "app:1.log").write_text("ok\nERROR disk full\nok\n")
+    (logs / "nested" / "db.log").write_text("error: timeout\n")
+    return logs
+
+
+def test_grep_matches_carry_file_and_line_number(tmp_path):
+    logs = make_logs(tmp_path)
+    matches = search(tmp_path, grep_command("error", [str(logs)], ignore_case=True), os.environ["PATH"].split(os.pathsep))
+
+    assert sorted(matches, key=lambda m: m["file"]) == [
+        {"host": "web", "file": f"{logs}/app:1.log", "line_number": 2, "line": "ERROR disk full"},
+        {"host": "web", "file": f"{logs}/nested/db.log", "line_number": 1, "line": "error: timeout"},
+    ]
+
+
+def awk_only_path(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for tool in ("find", "awk", "sh"):
+        os.symlink(shutil.which(tool), bin_dir / tool)
+    return [str(bin_dir)]
+
+
+def test_hosts_without_grep_use_the_awk_helper(tmp_path):
+    logs = make_logs(tmp_path)
+    bin_dir = awk_only_path(tmp_path)[0]
+
+    matches = search(tmp_path, grep_command("ERROR|timeout", [str(logs)]), [str(bin_dir)])
+
+    assert sorted((m["file"], m["line_number"]) for m in matches) == [
+        (f"{logs}/app:1.log", 2),
+        (f"{logs}/nested/db.log", 1),
+    ]
+
+
+def test_unparseable_lines_are_skipped():
+    job = StreamJob("web", None, "", {"host": "web"})
+    assert parse_match(job, "grep: warning") is None
+
+
+def test_awk_helper_matches_the_same_regex_as_grep(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "hosts").write_text("10.0.0.1\n10x0x0x1\n")
+    command = grep_command(r"10\.0\.0\.1", [str(logs)])
+
+    with_grep = search(tmp_path, command, os.environ["PATH"].split(os.pathsep))
+    with_awk = search(tmp_path, command, awk_only_path(tmp_path))
+
+    assert [m["line"] for m in with_grep] == [m["line"] for m in with_awk] == ["10.0.0.1"]
@@ -0,0 +1,135 @@
+import asyncio
+import socket
+import threading
+from contextlib import contextmanager
+
+from app.services.fleet_stream import FleetStream, StreamJob
+from app.services.log_tail import tail_command, tail_jobs
+
+
+class FakeChannel:
+    """Serves ``chunks`` one per recv, then EOF (or blocks forever if ``follow``)."""
+
+    def __init__(self, chunks, follow=False):
+        self.chunks = list(chunks)
+        self.follow = follow
+        self.reads = 0
+        self.closed = threading.Event()
+        self.command = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def exec_command(self, command):
+        self.command = command
+
+    def recv(self, size):
+        if self.chunks:
+            self.reads += 1
+            return self.chunks.pop(0)
+        if self.follow and not self.closed.wait(self.timeout):
+            raise socket.timeout()
+        return b""
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        self.closed.set()
+
+
+class FakePool:
+    def __init__(self, channels):
+        self.channels = channels
+
+    @contextmanager
+    def channel(self, hostname, tags=None, command=None):
+        channel = self.channels[hostname]
+        channel.exec_command(command)
+        try:
+            yield channel
+        finally:
+            channel.close()
+
+
+async def collect(stream, limit=None):
+    events = []
+    async for event in stream.events(heartbeat=0.05):
+        if event is not None:
+            events.append(event)
+        if limit is not None and len(events) >= limit:
+            break
+    return events
+
+
+def test_lines_from_several_hosts_are_merged_and_tagged():
+    pool = FakePool({"a": FakeChannel([b"one\ntw", b"o\n"]), "b": FakeChannel([b"three"])})
+    jobs = [StreamJob(host, None, "cmd", {"host": host}) for host in ("a", "b")]
+
+    events = asyncio.run(collect(FleetStream(jobs, pool=pool)))
+
+    assert [e for e in events if e["host"] == "a"] == [
+        {"host": "a", "line": "one"},
+        {"host": "a", "line": "two"},
+        {"host": "a", "exit_status": 0},
+    ]
+    assert {"host": "b", "line": "three"} in events
+
+
+def test_a_slow_consumer_pauses_the_remote_reader():
+    channel = FakeChannel([f"{i}\n".encode() for i in range(100)], follow=True)
+    stream = FleetStream([StreamJob("a", None, "cmd", {"host": "a"})], buffer=4, pool=FakePool({"a": channel}))
+
+    async def consume_slowly():
+        events = stream.events(heartbeat=0.05)
+        first = await events.__anext__()
+        await asyncio.sleep(0.3)
+        reads = channel.reads
+        await events.aclose()
+        return first, reads
+
+    first, reads = asyncio.run(consume_slowly())
+    assert first == {"host": "a", "line": "0"}
+    # Only the buffered lines (plus the one being handed over) were pulled off the channel
+    assert reads <= 6
+    assert channel.closed.wait(2)
+
+
+def test_per_job_line_caps_truncate_the_job():
+    channel = FakeChannel([b"x\n" * 10])
+    stream = FleetStream([StreamJob("a", None, "cmd", {"host": "a"}, max_lines=3)], pool=FakePool({"a": channel}))
+
+    events = asyncio.run(collect(stream))
+
+    assert events[-1] == {"host": "a", "truncated": True}
+    assert len(events) == 4
+
+
+def test_output_without_newlines_is_cut_at_the_line_limit():
+    channel = FakeChannel([b"x" * 50] * 100 + [b"tail\nnext\n"])
+    stream = FleetStream([StreamJob("a", None, "cmd", {"host": "a"})], pool=FakePool({"a": channel}), max_line=120)
+
+    events = asyncio.run(collect(stream))
+
+    assert events == [
+        {"host": "a", "line": "x" * 120, "line_truncated": True},
+        {"host": "a", "line": "next"},
+        {"host": "a", "exit_status": 0},
+    ]
+
+
+def test_tail_filters_remotely_and_exits_with_the_channel():
+    command = tail_command("/var/log/app log", lines=5, pattern="ERROR|WARN")
+    assert command.startswith("tail -n 5 -F -- '/var/log/app log' | grep --line-buffered -E -e 'ERROR|WARN'")
+    assert command.endswith("& cat >/dev/null; kill 0")
+    jobs = tail_jobs([("a", None), ("b", None)], ["/x", "/y"])
+    assert [job.fields for job in jobs][:2] == [{"host": "a", "file": "/x"}, {"host": "a", "file": "/y"}]
+
+
+def test_limited_concurrency_still_runs_every_job():
+    pool = FakePool({host: FakeChannel([b"x\n"]) for host in "abc"})
+    jobs = [StreamJob(host, None, "cmd", {"host": host}) for host in "abc"]
+
+    events = asyncio.run(collect(FleetStream(jobs, pool=pool, concurrency=1)))
+
+    assert sorted(e["host"] for e in events if "exit_status" in e) == ["a", "b", "c"]
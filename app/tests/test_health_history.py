@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.health import HealthRollup
+from app.models.server import Provider, Role, Server, Status
+from app.repositories.health import DAY, HOUR, HealthRepository
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Server(hostname="prod-1", provider=Provider.AWS, public_ip="10.0.0.1", role=Role.prod, status=Status.online),
+        Server(hostname="dev-1", provider=Provider.LOCAL, public_ip="10.0.0.2", role=Role.dev, status=Status.online),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_record_folds_samples_into_rollups(db):
+    repo = HealthRepository(db)
+    start = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+    for minute in range(0, 120, 30):
+        repo.record(
+            [{"host": "prod-1", "reachable": True, "ssh_successful": minute != 30, "rtt_ms": 10.0 + minute}],
+            recorded_at=start + timedelta(minutes=minute),
+        )
+
+    hourly = db.query(HealthRollup).filter_by(host="prod-1", bucket_seconds=HOUR).order_by(HealthRollup.bucket_start).all()
+    daily = db.query(HealthRollup).filter_by(host="prod-1", bucket_seconds=DAY).all()
+    assert [r.samples for r in hourly] == [2, 2]
+    assert hourly[0].ssh_success_count == 1 and hourly[0].rtt_max_ms == 40.0
+    assert len(daily) == 1 and daily[0].samples == 4
+
+
+def test_availability_by_role_uses_rollups(db):
+    repo = HealthRepository(db)
+    now = datetime.now(timezone.utc)
+    for day in range(7):
+        repo.record(
+            [
+                {"host": "prod-1", "reachable": True, "ssh_successful": day % 2 == 0, "rtt_ms": 20.0},
+                {"host": "10.0.0.2", "reachable": False, "ssh_successful": False},
+            ],
+            recorded_at=now - timedelta(days=day),
+        )
+
+    prod = repo.availability(now - timedelta(days=7), now, role="prod")
+    assert list(prod) == ["prod-1"]
+    assert prod["prod-1"]["samples"] == 7
+    assert prod["prod-1"]["ssh_success_ratio"] == round(4 / 7, 4)
+    assert prod["prod-1"]["rtt_avg_ms"] == 20.0
+
+    # Servers can be referenced by public IP as well as hostname
+    dev = repo.availability(now - timedelta(days=7), now, role="dev")
+    assert dev["10.0.0.2"]["reachable_ratio"] == 0.0
+
+
+def test_prune_drops_old_raw_samples(db):
+    repo = HealthRepository(db)
+    now = datetime.now(timezone.utc)
+    repo.record([{"host": "prod-1", "reachable": True, "ssh_successful": True}], recorded_at=now - timedelta(days=10))
+    repo.record([{"host": "prod-1", "reachable": True, "ssh_successful": True}], recorded_at=now)
+
+    repo.prune(raw_before=now - timedelta(days=7))
+
+    assert len(repo.samples("prod-1", now - timedelta(days=30), now + timedelta(seconds=1))) == 1
+    assert repo.availability(now - timedelta(days=30), now, host="prod-1")["prod-1"]["samples"] == 2
@@ -0,0 +1,47 @@
+import os
+
+import paramiko
+import pytest
+
+from app.ssh.keys import HostKeyStore, load_private_key
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return paramiko.RSAKey.generate(1024), paramiko.RSAKey.generate(1024)
+
+
+def test_first_contact_pins_the_key(tmp_path, keys):
+    path = str(tmp_path / "known_hosts")
+    store = HostKeyStore(path)
+    store.verify("[web]:2222", keys[0])
+    store.verify("[web]:2222", keys[0])
+
+    # A fresh store (e.g. another worker) reads the pinned key from disk
+    other = HostKeyStore(path)
+    with pytest.raises(paramiko.BadHostKeyException):
+        other.verify("[web]:2222", keys[1])
+
+
+def test_store_sees_hosts_added_by_other_processes(tmp_path, keys):
+    path = str(tmp_path / "known_hosts")
+    reader = HostKeyStore(path, strict=True)
+    with pytest.raises(paramiko.SSHException):
+        reader.verify("db", keys[0])
+
+    HostKeyStore(path).verify("db", keys[0])
+    reader.verify("db", keys[0])
+
+
+def test_private_keys_are_parsed_once_per_file_version(tmp_path, keys):
+    path = str(tmp_path / "id_rsa")
+    keys[0].write_private_key_file(path)
+
+    first = load_private_key(path)
+    assert load_private_key(path) is first
+
+    keys[1].write_private_key_file(path)
+    os.utime(path, (0, os.stat(path).st_mtime + 1))
+    reloaded = load_private_key(path)
+    assert reloaded is not first
+    assert reloaded == keys[1]
@@ -0,0 +1,46 @@
+import os
+
+import httpx
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+
+os.environ["API_KEY"] = "testkey"
+
+from app.metrics import DB_QUERY_SECONDS, Histogram
+from main import app
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_latency():
+    transport = httpx.ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/")
+        resp = await client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert "# TYPE vpsmanager_http_request_duration_seconds histogram" in body
+    assert 'vpsmanager_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in body
+    assert 'vpsmanager_ssh_sessions{pool="session_manager"} 0' in body
+
+
+def test_db_queries_are_timed():
+    before = DB_QUERY_SECONDS.count(statement="SELECT")
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert DB_QUERY_SECONDS.count(statement="SELECT") == before + 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "test", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, kind="x")
+
+    lines = histogram.render()
+    assert 'h_bucket{kind="x",le="0.1"} 1' in lines
+    assert 'h_bucket{kind="x",le="1.0"} 2' in lines
+    assert 'h_bucket{kind="x",le="+Inf"} 3' in lines
+    assert 'h_count{kind="x"} 3' in lines
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.ssh.backends import backend_for
+from app.ssh.openssh import OpenSSHBackend, openssh_backend
+
+
+def test_backend_is_chosen_by_tag():
+    pool = object()
+    assert backend_for(None, pool) is pool
+    assert backend_for({"ssh_backend": "openssh"}, pool) is openssh_backend
+    with pytest.raises(HTTPException) as excinfo:
+        backend_for({"ssh_backend": "telnet"}, pool)
+    assert excinfo.value.status_code == 500
+
+
+def test_command_line_multiplexes_over_a_control_socket(tmp_path):
+    backend = OpenSSHBackend(binary="ssh", control_dir=str(tmp_path), known_hosts="/tmp/known", breakers=None)
+    tags = {"username": "deploy", "port": "2222", "key_filename": "/keys/id", "jump_host": "bastion:2200"}
+
+    args = backend.command_line("web", tags, "uptime -p")
+
+    assert f"ControlPath={tmp_path}/%C" in args
+    assert "UserKnownHostsFile=/tmp/known" in args
+    assert args[args.index("-i") + 1] == "/keys/id"
+    assert args[-3:] == ["web", "--", "uptime -p"]
+    proxy = next(arg for arg in args if arg.startswith("ProxyCommand="))
+    assert proxy.endswith("-p 2200 -l deploy -o BatchMode=yes -o IdentitiesOnly=yes -i /keys/id -W %h:%p bastion")
+
+
+def test_jump_host_uses_its_own_credentials(tmp_path):
+    backend = OpenSSHBackend(binary="ssh", control_dir=str(tmp_path), known_hosts="/tmp/known", breakers=None)
+    tags = {
+        "key_filename": "/keys/app",
+        "jump_host": "bastion",
+        "jump_username": "jump",
+        "jump_key_filename": "/keys/100% bastion",
+    }
+
+    args = backend.command_line("web", tags, "true")
+
+    assert args[args.index("-i") + 1] == "/keys/app"
+    proxy = next(arg for arg in args if arg.startswith("ProxyCommand="))
+    assert "-l jump" in proxy
+    assert "-i '/keys/100%% bastion'" in proxy
+    assert "/keys/app" not in proxy
+
+
+def test_jump_host_password_auth_is_rejected(tmp_path):
+    backend = OpenSSHBackend(control_dir=str(tmp_path), breakers=None)
+    tags = {"key_filename": "/keys/app", "jump_host": "bastion", "jump_auth_type": "password"}
+    with pytest.raises(HTTPException) as excinfo:
+        backend.command_line("web", tags, "true")
+    assert excinfo.value.status_code == 500
+
+
+def test_key_auth_requires_a_key_path(tmp_path):
+    backend = OpenSSHBackend(control_dir=str(tmp_path), breakers=None)
+    with pytest.raises(HTTPException):
+        backend.command_line("web", {}, "true")
+
+
+class RecordingBreakers:
+    def __init__(self):
+        self.failures = []
+
+    def check(self, hostname):
+        pass
+
+    def record_failure(self, hostname, error, port=22):
+        self.failures.append(hostname)
+
+    def record_success(self, hostname):
+        pass
+
+
+def fake_ssh(tmp_path, master_running):
+    """An ``ssh`` whose commands exit 255; ``-O check`` reports the master as asked."""
+    path = tmp_path / "ssh"
+    path.write_text(
+        "#!/bin/sh\n"
+        'case " $* " in *" -O check "*) exit %d ;; esac\n'
+        "echo partial output\n"
+        "echo 'ssh: connect to host web port 22: Connection refused' >&2\n"
+        "exit 255\n" % (0 if master_running else 255)
+    )
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def test_remote_exit_255_is_not_a_connection_error(tmp_path):
+    breakers = RecordingBreakers()
+    backend = OpenSSHBackend(binary=fake_ssh(tmp_path, master_running=True), control_dir=str(tmp_path), breakers=breakers)
+    tags = {"auth_type": "key", "key_filename": "/tmp/key"}
+    assert backend.execute("web", tags, "exit 255") == ["partial output\n"]
+    assert breakers.failures == []
+
+
+def test_exit_255_without_a_master_trips_the_breaker(tmp_path):
+    breakers = RecordingBreakers()
+    backend = OpenSSHBackend(binary=fake_ssh(tmp_path, master_running=False), control_dir=str(tmp_path), breakers=breakers)
+    tags = {"auth_type": "key", "key_filename": "/tmp/key"}
+    with pytest.raises(HTTPException) as error:
+        backend.execute("web", tags, "uptime")
+    assert "Connection refused" in error.value.detail
+    assert breakers.failures == ["web"]
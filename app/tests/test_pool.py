@@ -0,0 +1,184 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.ssh.pool import SSHPool
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeClient:
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.transport.active = False
+
+
+class Connector:
+    def __init__(self):
+        self.clients = []
+
+    def __call__(self, hostname, tags):
+        client = FakeClient(hostname)
+        self.clients.append(client)
+        return client
+
+
+def test_channels_share_a_transport_then_spill_to_a_second():
+    connector = Connector()
+    pool = SSHPool(connector=connector, max_channels=2, max_transports=2, wait_timeout=0.05)
+
+    with pool.session("web") as first, pool.session("web") as second:
+        assert first is second
+        assert len(connector.clients) == 1
+        with pool.session("web") as third:
+            assert third is not first
+            assert pool.transport_count() == 2
+            assert pool.channel_count() == 3
+
+    assert pool.channel_count() == 0
+    assert len(connector.clients) == 2
+
+
+def test_waits_for_a_free_channel_when_all_transports_are_full():
+    pool = SSHPool(connector=Connector(), max_channels=1, max_transports=1, wait_timeout=1.0)
+    acquired = []
+
+    with pool.session("web"):
+        waiter = threading.Thread(target=lambda: acquired.append(pool.get("web")))
+        waiter.start()
+        waiter.join(0.1)
+        assert not acquired
+    waiter.join()
+    assert len(acquired) == 1
+
+    pool.wait_timeout = 0.05
+    with pool.session("web"):
+        with pytest.raises(HTTPException) as excinfo:
+            pool.get("web")
+    assert excinfo.value.status_code == 503
+
+
+def test_dead_transports_are_replaced():
+    connector = Connector()
+    pool = SSHPool(connector=connector)
+
+    client = pool.get("web")
+    client.close()
+    assert pool.get("web") is not client
+    assert pool.hosts() == ["web"]
+    assert pool.transport_count() == 1
+
+
+def test_hosts_behind_a_bastion_share_one_bastion_transport():
+    connected = []
+
+    def connector(hostname, tags, bastion=None):
+        connected.append((hostname, tags, bastion.hostname if bastion else None))
+        return FakeClient(hostname)
+
+    pool = SSHPool(connector=connector)
+    tags = {"jump_host": "bastion:2200", "username": "deploy", "jump_username": "jump", "port": "22"}
+    for i in range(3):
+        pool.get(f"app-{i}", tags)
+
+    bastions = [entry for entry in connected if entry[0] == "bastion"]
+    assert bastions == [("bastion", {"username": "jump", "port": "2200"}, None)]
+    assert [entry[2] for entry in connected if entry[0] != "bastion"] == ["bastion"] * 3
+    assert pool.transport_count() == 4
+    # Each tunnel holds a tunnel slot, not a channel, on the bastion until its transport goes away
+    assert pool.channel_count() == 0
+    assert pool.tunnel_count() == 3
+    pool.discard("app-0")
+    assert pool.tunnel_count() == 2
+
+
+def bastion_connector(connected):
+    def connector(hostname, tags, bastion=None):
+        client = FakeClient(hostname)
+        connected.append(client)
+        return client
+
+    return connector
+
+
+def test_more_hosts_than_bastion_channel_slots_tunnel_through_one_bastion():
+    connected = []
+    pool = SSHPool(connector=bastion_connector(connected), max_channels=8, max_transports=2, wait_timeout=0.05)
+    tags = {"jump_host": "bastion"}
+    for i in range(40):
+        with pool.session(f"app-{i}", tags):
+            pass
+
+    assert [client.hostname for client in connected].count("bastion") == 1
+    assert pool.tunnel_count() == 40
+    with pool.session("bastion") as client:
+        assert client.hostname == "bastion"
+
+
+def test_a_full_bastion_closes_its_least_recently_used_idle_tunnel():
+    connected = []
+    pool = SSHPool(connector=bastion_connector(connected), max_transports=1, max_tunnels=2, wait_timeout=0.05)
+    tags = {"jump_host": "bastion"}
+    with pool.session("app-0", tags):
+        pass
+    with pool.session("app-1", tags):
+        with pool.session("app-2", tags):
+            pass
+
+    first = next(client for client in connected if client.hostname == "app-0")
+    assert not first.transport.is_active()
+    assert sorted(pool.hosts()) == ["app-1", "app-2", "bastion"]
+
+    # Tunnels with open channels are never closed
+    with pool.session("app-1", tags), pool.session("app-2", tags):
+        with pytest.raises(HTTPException) as excinfo:
+            pool.get("app-3", tags)
+    assert excinfo.value.status_code == 503
+    assert "tunnel" in excinfo.value.detail
+
+
+def test_idle_transports_are_closed_and_free_their_bastion_tunnel():
+    connected = []
+    pool = SSHPool(connector=bastion_connector(connected), idle_seconds=0.05)
+    with pool.session("app-0", {"jump_host": "bastion"}):
+        pass
+    time.sleep(0.1)
+    pool.get("web")
+
+    assert sorted(pool.hosts()) == ["bastion", "web"]
+    assert pool.tunnel_count() == 0
+    assert not connected[1].transport.is_active()
+
+
+def test_rows_sharing_a_hostname_but_not_port_or_user_get_separate_transports():
+    connector = Connector()
+    pool = SSHPool(connector=connector)
+
+    first = pool.get("web", {"port": "22", "username": "deploy"})
+    assert pool.get("web", {"port": "2222", "username": "deploy"}) is not first
+    assert pool.get("web", {"port": "22", "username": "root"}) is not first
+    assert pool.get("web", {"port": "22", "username": "deploy"}) is first
+    assert pool.hosts() == ["web"]
+    assert pool.transport_count() == 3
+
+
+def test_a_host_jumping_through_itself_is_rejected():
+    pool = SSHPool(connector=Connector(), wait_timeout=5)
+    with pytest.raises(HTTPException) as excinfo:
+        pool.get("web", {"jump_host": "web:22"})
+    assert excinfo.value.status_code == 500
+    assert "itself" in excinfo.value.detail
@@ -0,0 +1,43 @@
+import asyncio
+import socket
+
+import pytest
+
+from app.services import prober
+from app.services.prober import icmp_available, probe_hosts, probe_tcp
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_tcp_probe_open_and_refused_ports_count_as_reachable():
+    server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        open_result = await probe_tcp("127.0.0.1", port, count=3, timeout=1)
+    refused_result = await probe_tcp("127.0.0.1", free_port(), count=2, timeout=1)
+
+    assert open_result.reachable and open_result.received == 3 and open_result.loss == 0
+    assert len(open_result.rtts_ms) == 3
+    assert refused_result.reachable and refused_result.received == 2
+
+
+@pytest.mark.asyncio
+async def test_probe_hosts_reports_unresolvable_hosts(monkeypatch):
+    monkeypatch.setattr(prober, "_icmp_available", False)
+    results = await probe_hosts(["127.0.0.1", "unresolvable.invalid"], timeout=0.5)
+
+    assert results["127.0.0.1"].reachable
+    unresolved = results["unresolvable.invalid"].as_dict()
+    assert unresolved["reachable"] is False and unresolved["loss"] == 1.0 and unresolved["error"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not icmp_available(), reason="unprivileged ICMP sockets not permitted")
+async def test_icmp_probe_localhost():
+    result = await prober.probe_icmp("127.0.0.1", count=2, timeout=1)
+    assert result.received == 2
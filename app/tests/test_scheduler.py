@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.ssh.scheduler import CommandScheduler
+
+
+class RecordingPool:
+    """Stands in for SSHPool; blocks each command until released."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = {}
+        self.order = []
+        self.release = threading.Event()
+
+    def execute(self, hostname, tags, command):
+        with self.lock:
+            self.running[hostname] = self.running.get(hostname, 0) + 1
+            self.peak[hostname] = max(self.peak.get(hostname, 0), self.running[hostname])
+            self.order.append(command)
+        self.release.wait(5)
+        with self.lock:
+            self.running[hostname] -= 1
+        return [command + "\n"]
+
+
+def run_all(scheduler, jobs):
+    threads = [threading.Thread(target=scheduler.run, args=job) for job in jobs]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)  # keep submission order deterministic
+    return threads
+
+
+def test_per_host_and_global_caps():
+    pool = RecordingPool()
+    scheduler = CommandScheduler(global_limit=3, per_host_limit=2, pool=pool)
+    threads = run_all(scheduler, [("web", {}, f"cmd{i}") for i in range(5)] + [("db", {}, "db0")])
+
+    time.sleep(0.1)
+    assert scheduler.stats()["hosts"] == {"web": 2, "db": 1}
+    assert scheduler.stats()["queued"] == 3
+    pool.release.set()
+    for thread in threads:
+        thread.join()
+    assert pool.peak == {"web": 2, "db": 1}
+    assert scheduler.stats() == {"active": 0, "queued": 0, "hosts": {}}
+
+
+def test_clients_are_served_round_robin():
+    pool = RecordingPool()
+    scheduler = CommandScheduler(global_limit=1, per_host_limit=1, pool=pool)
+    jobs = [("web", {}, "blocker", "a")]
+    jobs += [("web", {}, f"a{i}", "a") for i in range(3)]
+    jobs += [("web", {}, f"b{i}", "b") for i in range(2)]
+    threads = run_all(scheduler, jobs)
+
+    pool.release.set()
+    for thread in threads:
+        thread.join()
+    assert pool.order == ["blocker", "a0", "b0", "a1", "b1", "a2"]
+
+
+def test_queue_wait_is_reported_and_times_out():
+    pool = RecordingPool()
+    scheduler = CommandScheduler(global_limit=1, per_host_limit=1, queue_timeout=0.05, pool=pool)
+    threads = run_all(scheduler, [("web", {}, "slow")])
+
+    with pytest.raises(HTTPException) as excinfo:
+        scheduler.run("web", {}, "late")
+    assert excinfo.value.status_code == 503
+    assert scheduler.stats()["queued"] == 0
+
+    pool.release.set()
+    threads[0].join()
+    output, waited = scheduler.run("web", {}, "fast")
+    assert output == ["fast\n"]
+    assert waited >= 0
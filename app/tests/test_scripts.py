@@ -0,0 +1,60 @@
+import os
+import subprocess
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import scripts
+from app.services.scripts import ScriptStore, run_script
+
+
+class LocalShell:
+    """Runs commands with ``sh -c`` in a fake home directory, like a remote host would."""
+
+    def __init__(self, home):
+        self.home = str(home)
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        result = subprocess.run(["sh", "-c", command], env={"HOME": self.home, "PATH": os.environ["PATH"]},
+                                capture_output=True, text=True)
+        return result.stdout.splitlines(keepends=True)
+
+
+def test_script_is_uploaded_once_then_run_by_hash(tmp_path):
+    store = ScriptStore(str(tmp_path / "store"))
+    digest = store.put(b'#!/bin/sh\necho "hello $1"\n')
+    shell = LocalShell(tmp_path / "home")
+
+    assert run_script(store, digest, ["a b"], None, shell) == (["hello a b\n"], True)
+    assert len(shell.commands) == 2
+
+    shell.commands.clear()
+    assert run_script(store, digest, ["c"], None, shell) == (["hello c\n"], False)
+    assert len(shell.commands) == 1
+    assert len(shell.commands[0]) < 200
+
+
+def test_large_scripts_upload_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(scripts, "UPLOAD_CHUNK", 64)
+    store = ScriptStore(str(tmp_path / "store"))
+    body = "".join(f"echo line{i}\n" for i in range(50))
+    digest = store.put(("#!/bin/sh\n" + body).encode())
+    shell = LocalShell(tmp_path / "home")
+
+    output, uploaded = run_script(store, digest, [], {"script_dir": str(tmp_path / "cache")}, shell)
+
+    assert uploaded and len(output) == 50
+    assert os.listdir(tmp_path / "cache") == [digest]
+
+
+def test_unknown_or_invalid_hashes_are_rejected(tmp_path):
+    store = ScriptStore(str(tmp_path / "store"))
+    shell = LocalShell(tmp_path / "home")
+    with pytest.raises(HTTPException) as excinfo:
+        run_script(store, "0" * 64, [], None, shell)
+    assert excinfo.value.status_code == 404
+    with pytest.raises(HTTPException) as excinfo:
+        run_script(store, "../etc/passwd", [], None, shell)
+    assert excinfo.value.status_code == 400
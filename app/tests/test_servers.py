@@ -1,5 +1,6 @@
 import os
 import json
+import tempfile
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
@@ -14,7 +15,9 @@ from app.database import Base, get_db
 from app.models.server import Server, Provider, Role, Status
 from main import app
 
-DATABASE_URL = "sqlite:///./test.db"
+# A file (so concurrent requests get their own connections) outside the
+# repository, so running the suite leaves the tree clean
+DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='vpsmanager-tests-'), 'test.db')}"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+
+from app.ssh.shell import ShellRelay
+
+
+class FakeChannel:
+    """PTY channel whose readiness is signalled through a real pipe, like paramiko's."""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.output = []
+        self.sent = b""
+        self.sizes = []
+        self.pty = None
+        self.closed = False
+
+    def feed(self, data):
+        self.output.append(data)
+        os.write(self.write_fd, b"*")
+
+    def fileno(self):
+        return self.read_fd
+
+    def recv(self, size):
+        if not self.output:
+            raise socket.timeout()
+        os.read(self.read_fd, 1)
+        return self.output.pop(0)
+
+    def send(self, data):
+        self.sent += data
+        return len(data)
+
+    def resize_pty(self, width, height):
+        self.sizes.append((width, height))
+
+    def get_pty(self, term, width, height):
+        self.pty = (term, width, height)
+
+    def invoke_shell(self):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+    def exit_status_ready(self):
+        return True
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWebSocket:
+    def __init__(self, incoming):
+        self.incoming = asyncio.Queue()
+        for message in incoming:
+            self.incoming.put_nowait(message)
+        self.frames = []
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_bytes(self, data):
+        self.frames.append(data)
+
+
+class FakePool:
+    def __init__(self, shell):
+        self.shell = shell
+        self.sessions = 0
+
+    @contextmanager
+    def channel(self, hostname, tags=None, command=None, term="xterm-256color", cols=80, rows=24, window_size=None):
+        self.sessions += 1
+        self.shell.get_pty(term=term, width=cols, height=rows)
+        self.shell.invoke_shell()
+        try:
+            yield self.shell
+        finally:
+            self.shell.close()
+            self.sessions -= 1
+
+
+def test_shell_relays_bytes_and_resizes_until_the_remote_exits():
+    channel = FakeChannel()
+    pool = FakePool(channel)
+    relay = ShellRelay(pool=pool)
+    websocket = FakeWebSocket([
+        {"type": "websocket.receive", "bytes": b"ls\r"},
+        {"type": "websocket.receive", "text": json.dumps({"type": "resize", "cols": 120, "rows": 40})},
+    ])
+
+    async def session():
+        async with relay.open("web", None, cols=100, rows=30) as opened:
+            assert relay.count() == 1 and pool.sessions == 1
+            relaying = asyncio.create_task(relay.relay(websocket, opened))
+            channel.feed(b"$ ")
+            for _ in range(100):
+                if channel.sizes:
+                    break
+                await asyncio.sleep(0.01)
+            channel.feed(b"")  # EOF: the remote shell exited
+            return await relaying
+
+    assert asyncio.run(session()) == 0
+    assert channel.pty == ("xterm-256color", 100, 30)
+    assert websocket.frames == [b"$ "]
+    assert channel.sent == b"ls\r"
+    assert channel.sizes == [(120, 40)]
+    assert channel.closed and relay.count() == 0 and pool.sessions == 0
+
+
+def test_shell_limit_is_enforced():
+    relay = ShellRelay(pool=FakePool(FakeChannel()), max_shells=1)
+
+    async def open_two():
+        async with relay.open("web", None):
+            async with relay.open("web", None):
+                pass
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(open_two())
+    assert excinfo.value.status_code == 503
+    assert relay.count() == 0
+
+
+class LateStatusChannel(FakeChannel):
+    """Reports its exit status a little after the output's EOF, and sends slowly."""
+
+    def __init__(self):
+        super().__init__()
+        self.status = threading.Event()
+
+    def send(self, data):
+        time.sleep(0.2)  # e.g. a blocking pipe write to the broker
+        return super().send(data)
+
+    def exit_status_ready(self):
+        return self.status.is_set()
+
+    def recv_exit_status(self):
+        self.status.wait()
+        return 3
+
+
+def test_slow_sends_do_not_block_and_a_late_exit_status_is_awaited():
+    channel = LateStatusChannel()
+    relay = ShellRelay(pool=FakePool(channel))
+    websocket = FakeWebSocket([{"type": "websocket.receive", "bytes": b"exit\r"}])
+
+    async def session():
+        async with relay.open("web", None) as opened:
+            relaying = asyncio.create_task(relay.relay(websocket, opened))
+            started = time.monotonic()
+            await asyncio.sleep(0.05)
+            # The event loop kept running while the send was in progress
+            assert time.monotonic() - started < 0.15
+            channel.feed(b"")
+            await asyncio.sleep(0.05)
+            threading.Timer(0.1, channel.status.set).start()
+            return await relaying
+
+    assert asyncio.run(session()) == 3
+    assert channel.sent == b"exit\r"
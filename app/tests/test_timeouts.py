@@ -0,0 +1,42 @@
+from app.ssh.timeouts import TIMEOUT_BOUNDS, LatencyHistory
+
+
+def test_defaults_until_enough_samples():
+    history = LatencyHistory(min_samples=5)
+    for _ in range(4):
+        history.observe("web", "connect", 0.01)
+    assert history.timeouts("web").connect == TIMEOUT_BOUNDS["connect"][1]
+
+
+def test_timeouts_follow_p99_within_floor_and_ceiling():
+    history = LatencyHistory(factor=4, min_samples=5)
+    for _ in range(50):
+        history.observe("near", "connect", 0.001)
+        history.observe("far", "connect", 0.5)
+        history.observe("far", "handshake", 2.0)
+        history.observe("stuck", "handshake", 100.0)
+
+    assert history.timeouts("near").connect == TIMEOUT_BOUNDS["connect"][0]
+    assert history.timeouts("far").connect == 2.0
+    assert history.timeouts("far").banner == 8.0
+    assert history.timeouts("far").auth == 8.0
+    assert history.timeouts("stuck").auth == TIMEOUT_BOUNDS["auth"][2]
+
+
+def test_window_forgets_old_samples_and_tags_override():
+    history = LatencyHistory(window=10, factor=2, min_samples=5)
+    for _ in range(10):
+        history.observe("web", "connect", 10.0)
+    for _ in range(10):
+        history.observe("web", "connect", 3.0)
+    assert history.timeouts("web").connect == 6.0
+    assert history.timeouts("web", {"connect_timeout": "45"}).connect == 45.0
+    assert history.describe("web")["latency"]["connect"]["samples"] == 10
+
+
+def test_commands_have_no_timeout_unless_tagged():
+    history = LatencyHistory(min_samples=5)
+    for _ in range(20):
+        history.observe("web", "command", 0.01)
+    assert history.timeouts("web").command is None
+    assert history.timeouts("web", {"command_timeout": "900"}).command == 900.0
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import warmup
+from app.services.warmup import parse_selector, warm_up
+
+
+class RecordingPool:
+    def __init__(self):
+        self.started = []
+
+    def get(self, hostname, tags=None):
+        self.started.append((hostname, time.monotonic()))
+        if hostname == "down":
+            raise HTTPException(status_code=503, detail="Host down is unreachable")
+
+
+def test_parse_selector():
+    assert parse_selector("role=prod, status=online") == {"role": "prod", "status": "online"}
+    assert parse_selector("") == {}
+    with pytest.raises(ValueError):
+        parse_selector("hostname=web")
+
+
+def test_warm_up_is_rate_limited_and_reports_failures():
+    pool = RecordingPool()
+    targets = [("web-1", {}), ("web-2", {}), ("down", {}), ("web-1", {})]
+
+    report = warm_up(targets, pool=pool, rate=20, concurrency=4)
+
+    assert report["hosts"] == 3
+    assert report["connected"] == 2
+    assert report["errors"] == {"down": "Host down is unreachable"}
+    starts = sorted(started for _, started in pool.started)
+    assert starts[-1] - starts[0] >= 2 / 20 * 0.9
+    assert warmup.last_report is report
@@ -0,0 +1,54 @@
+import pytest
+import yaml
+
+from yaml_editor import YamlEditor
+
+
+@pytest.fixture
+def compose_file(tmp_path):
+    path = tmp_path / "compose.yaml"
+    path.write_text("services:\n  web:\n    image: nginx:1.25\n    ports: ['80:80']\n")
+    return path
+
+
+def test_transaction_writes_once(compose_file, monkeypatch):
+    editor = YamlEditor(str(compose_file))
+    saves = []
+    original_save = YamlEditor.save_yaml
+    monkeypatch.setattr(YamlEditor, "save_yaml", lambda self: saves.append(self._transaction_depth) or original_save(self))
+
+    with editor.transaction():
+        for i in range(50):
+            editor.add_entry(["services", f"worker{i}", "image"], "busybox")
+        editor.remove_entry(["services", "web", "ports"])
+
+    data = yaml.safe_load(compose_file.read_text())
+    assert len(data["services"]) == 51
+    assert "ports" not in data["services"]["web"]
+    assert [depth for depth in saves if depth == 0] == [0]
+
+
+def test_transaction_rolls_back_on_error(compose_file):
+    editor = YamlEditor(str(compose_file))
+    with pytest.raises(RuntimeError):
+        with editor.transaction():
+            editor.update_entry(["services", "web", "image"], "nginx:1.27")
+            raise RuntimeError("abort")
+
+    assert editor.get_entry(["services", "web", "image"]) == "nginx:1.25"
+    assert yaml.safe_load(compose_file.read_text())["services"]["web"]["image"] == "nginx:1.25"
+
+
+def test_apply_patch(compose_file):
+    editor = YamlEditor(str(compose_file))
+    editor.apply_patch([
+        {"op": "update", "path": ["services", "web", "image"], "value": "nginx:1.27"},
+        {"op": "add", "path": ["volumes", "data"], "value": {}},
+        {"op": "remove", "path": ["services", "web", "ports"]},
+    ])
+
+    data = yaml.safe_load(compose_file.read_text())
+    assert data == {"services": {"web": {"image": "nginx:1.27"}}, "volumes": {"data": {}}}
+
+    with pytest.raises(ValueError):
+        editor.apply_patch([{"op": "rename", "path": ["services"]}])
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency benchmarks for the VPS Manager API.
+
+Starts an in-process SSH stand-in (benchmarks/ssh_stub.py), seeds a throwaway
+SQLite inventory with N servers pointing at it, and drives the ASGI app
+in-process with httpx. Results are written as JSON so runs can be compared.
+
+Usage:
+    python -m benchmarks.run_benchmarks --servers 50 --requests 500 --output bench_report.json
+    python -m benchmarks.run_benchmarks --baseline bench_report.json   # exit 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.ssh_stub import StubSSHServer
+
+API_KEY = "bench"
+PASSWORD_ENV = "BENCH_SSH_PASSWORD"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of floats."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def ssh_master_cpu_seconds():
+    """CPU used so far by live ControlMaster processes under ``SSH_CONTROL_DIR``.
+
+    Masters detach from the ``ssh`` client that started them, so they never
+    show up in ``RUSAGE_CHILDREN`` although they do all of the crypto. They
+    are found by their control path, which OpenSSH puts in the process title.
+    Returns None where ``/proc`` is not available.
+    """
+    control_dir = os.environ.get("SSH_CONTROL_DIR")
+    if not control_dir:
+        return 0.0
+    if not os.path.isdir("/proc"):
+        return None
+    marker = os.fsencode(control_dir)
+    ticks = 0
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if marker not in f.read():
+                    continue
+            with open(f"/proc/{pid}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are fields 14 and 15
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        ticks += int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def cpu_seconds():
+    """CPU used by this process, its reaped children (e.g. ``ssh`` clients) and
+    any ControlMaster; None if the masters cannot be sampled."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    masters = ssh_master_cpu_seconds()
+    if masters is None:
+        return None
+    return time.process_time() + children.ru_utime + children.ru_stime + masters
+
+
+def summarize(name, latencies, errors, elapsed):
+    return {
+        "scenario": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "duration_s": round(elapsed, 4),
+        "req_per_s": round((len(latencies) + errors) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+    }
+
+
+async def run_scenario(name, make_request, total, concurrency):
+    """Run ``total`` calls of ``make_request(i)`` with bounded concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await make_request(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start, cpu_start = time.perf_counter(), cpu_seconds()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    result = summarize(name, latencies, errors, time.perf_counter() - start)
+    # Includes the in-process stub's share. Masters that exit mid-run lose their
+    # share, so scenarios close them only after this sample.
+    cpu_end = cpu_seconds()
+    measured = total and cpu_start is not None and cpu_end is not None
+    result["cpu_ms_per_req"] = round((cpu_end - cpu_start) / total * 1000, 3) if measured else None
+    print(f"  {name:<24} {result['req_per_s']} req/s  p50={result['p50_ms']}ms  "
+          f"p99={result['p99_ms']}ms  cpu={result['cpu_ms_per_req']}ms/req  errors={errors}")
+    return result
+
+
+def seed_inventory(session_factory, count, port, subnet=200, tags=None):
+    """Insert ``count`` servers that all resolve to the stub; returns their public IPs."""
+    from app.models.server import Provider, Role, Server, Status
+
+    db = session_factory()
+    addresses = []
+    for i in range(count):
+        address = f"10.{subnet}.{i // 250}.{i % 250 + 1}"
+        db.add(Server(
+            hostname="127.0.0.1",
+            provider=Provider.LOCAL,
+            public_ip=address,
+            role=Role.prod if i % 2 else Role.dev,
+            status=Status.online,
+            tags={"auth_type": "password", "password_env": PASSWORD_ENV, "port": str(port), **(tags or {})},
+        ))
+        addresses.append(address)
+    db.commit()
+    db.close()
+    return addresses
+
+
+def measure_startup(runs, workdir):
+    """Time cold ``import main`` plus lifespan startup in fresh interpreters.
+
+    Each run gets its own database under ``workdir`` so the probe starts cold
+    and never creates one in the repository.
+    """
+    probe = (
+        "import asyncio, sys, time; t = time.perf_counter(); import main; imported = time.perf_counter() - t; "
+        "paramiko_loaded = 'paramiko' in sys.modules; "
+        "ctx = main.lifespan(main.app); asyncio.run(ctx.__aenter__()); "
+        "print(imported, time.perf_counter() - t, paramiko_loaded)"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    imports, startups, errors, paramiko_loaded = [], [], 0, False
+    for i in range(runs):
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, f'startup-{i}.db')}")
+        proc = subprocess.run([sys.executable, "-c", probe], cwd=root, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            errors += 1
+            continue
+        imported, started, loaded = proc.stdout.split()[-3:]
+        imports.append(float(imported))
+        startups.append(float(started))
+        paramiko_loaded = paramiko_loaded or loaded == "True"
+    results = [
+        summarize("startup_import", imports, errors, sum(imports) or 1),
+        summarize("startup_lifespan", startups, errors, sum(startups) or 1),
+    ]
+    for result in results:
+        result["paramiko_loaded_at_import"] = paramiko_loaded
+        print(f"  {result['scenario']:<24} mean={result['mean_ms']}ms  p50={result['p50_ms']}ms  "
+              f"paramiko at import={paramiko_loaded}")
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Return a list of regressions against a previous report."""
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["scenario"])
+        if not previous or not previous.get("req_per_s") or not result.get("req_per_s"):
+            continue
+        if result["scenario"].startswith("startup_"):
+            if previous.get("mean_ms") and result["mean_ms"] > previous["mean_ms"] * (1 + tolerance):
+                regressions.append(f"{result['scenario']}: mean {previous['mean_ms']}ms -> {result['mean_ms']}ms")
+            continue
+        if result["req_per_s"] < previous["req_per_s"] * (1 - tolerance):
+            regressions.append(f"{result['scenario']}: req/s {previous['req_per_s']} -> {result['req_per_s']}")
+        if previous.get("p99_ms") and result.get("p99_ms") and result["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p99 {previous['p99_ms']}ms -> {result['p99_ms']}ms")
+    return regressions
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="vpsmanager-bench-")
+    startup = measure_startup(args.startup_runs, workdir) if args.startup_runs else []
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["API_KEY"] = API_KEY
+    # The stub's host key is new on every run; keep it out of the real known_hosts file
+    os.environ["SSH_KNOWN_HOSTS"] = os.path.join(workdir, "known_hosts")
+    os.environ["SSH_CONTROL_DIR"] = os.path.join(workdir, "control")
+
+    stub = StubSSHServer(latency=args.latency).start()
+    os.environ[PASSWORD_ENV] = stub.password
+
+    import httpx
+    import main
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    addresses = seed_inventory(SessionLocal, args.servers, stub.port)
+    # Same stub, executed through the system ssh client instead of paramiko
+    openssh_addresses = seed_inventory(SessionLocal, args.servers, stub.port, subnet=201, tags={"ssh_backend": "openssh"})
+    main.API_KEY = API_KEY
+    # /healthz walks the legacy servers.json mapping; point it at part of the seeded inventory.
+    main.servers = {address: {"hostname": "127.0.0.1"} for address in addresses[:args.healthz_hosts]}
+
+    headers = {"Authorization": API_KEY}
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def list_servers(i):
+            resp = await client.get("/servers", params={"limit": args.servers}, headers=headers)
+            return resp.status_code == 200
+
+        async def server_command(i):
+            resp = await client.post(
+                "/ssh_execute/server_command",
+                json={"server_name": addresses[i % len(addresses)], "command": "uptime -p"},
+                headers=headers,
+            )
+            return resp.status_code == 200
+
+        async def openssh_server_command(i):
+            resp = await client.post(
+                "/ssh_execute/server_command",
+                json={"server_name": openssh_addresses[i % len(openssh_addresses)], "command": "uptime -p"},
+                headers=headers,
+            )
+            return resp.status_code == 200
+
+        async def healthz(i):
+            resp = await client.get("/healthz")
+            return resp.status_code == 200
+
+        async def batch(i):
+            responses = await asyncio.gather(*(
+                client.post(
+                    "/ssh_execute/server_command",
+                    json={"server_name": address, "command": "hostname"},
+                    headers=headers,
+                )
+                for address in addresses
+            ))
+            return all(resp.status_code == 200 for resp in responses)
+
+        print(f"Benchmarking {args.servers} servers, stub latency {args.latency}s, concurrency {args.concurrency}")
+        results.append(await run_scenario("servers_list", list_servers, args.requests, args.concurrency))
+        results.append(await run_scenario("ssh_server_command", server_command, args.requests, args.concurrency))
+        if shutil.which("ssh"):
+            results.append(await run_scenario(
+                "openssh_server_command", openssh_server_command, args.requests, args.concurrency
+            ))
+        else:
+            print("  openssh_server_command   skipped: no ssh binary on PATH")
+        results.append(await run_scenario("healthz", healthz, args.healthz_requests, 1))
+        results.append(await run_scenario("batch_server_command", batch, args.batches, 1))
+
+    if shutil.which("ssh"):
+        from app.ssh.openssh import openssh_backend
+
+        openssh_backend.close("127.0.0.1", {"auth_type": "password", "port": str(stub.port)})
+    stub.stop()
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "ssh_connections": stub.connections,
+        "ssh_commands": stub.commands_run,
+        "results": startup + results,
+    }
+    return report
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the VPS Manager API against a local SSH stub.")
+    parser.add_argument("--servers", type=int, default=20, help="Number of servers to seed.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per single-call scenario.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests.")
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated remote command latency (s).")
+    parser.add_argument("--healthz-hosts", type=int, default=5, help="Hosts checked by /healthz.")
+    parser.add_argument("--healthz-requests", type=int, default=5, help="Number of /healthz calls.")
+    parser.add_argument("--batches", type=int, default=5, help="Fan-out batches across all servers.")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Cold-start measurements (0 to skip).")
+    parser.add_argument("--output", default="bench_report.json", help="Where to write the JSON report.")
+    parser.add_argument("--baseline", help="Previous report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(report["results"], args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
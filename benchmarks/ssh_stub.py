@@ -0,0 +1,201 @@
+"""In-process SSH server used as a stand-in for real VPSes in benchmarks.
+
+Every exec request sleeps for ``latency`` seconds and then returns canned
+output, so benchmark numbers reflect the manager's own overhead plus a
+controllable amount of simulated remote work.
+"""
+
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Optional
+
+import paramiko
+
+# Client disconnects show up as socket errors on the server side; keep them quiet.
+LOG_CHANNEL = "benchmarks.ssh_stub"
+logging.getLogger(LOG_CHANNEL).setLevel(logging.CRITICAL)
+
+DEFAULT_OUTPUT = {
+    "hostname": "bench-host\n",
+    "uptime -p": "up 3 days, 4 hours\n",
+}
+
+
+class StubServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: "StubSSHServer"):
+        self.server = server
+
+    def check_auth_password(self, username, password):
+        if password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        # Acts as a jump host: the accept loop pipes the channel to ``destination``
+        self.server._forwards[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        # Started by StubTransport once the success reply is on the wire, so
+        # the client never sees the channel close before the request is acknowledged.
+        channel.transport.pending_commands[channel.remote_chanid] = (channel, command)
+        return True
+
+
+class StubTransport(paramiko.Transport):
+    """Server transport that starts exec commands right after acknowledging them."""
+
+    MSG_CHANNEL_SUCCESS = 99
+
+    def __init__(self, sock, server: "StubSSHServer"):
+        super().__init__(sock)
+        self.stub_server = server
+        self.pending_commands: Dict[int, tuple] = {}
+
+    def _send_user_message(self, data):
+        super()._send_user_message(data)
+        raw = data.asbytes()
+        if raw[:1] == bytes([self.MSG_CHANNEL_SUCCESS]):
+            pending = self.pending_commands.pop(struct.unpack(">I", raw[1:5])[0], None)
+            if pending is not None:
+                threading.Thread(target=self.stub_server._run_command, args=pending, daemon=True).start()
+
+
+class StubSSHServer:
+    """Listens on localhost and serves canned command output over SSH.
+
+    Parameters
+    ----------
+    latency: float
+        Seconds each command takes before replying.
+    password: str
+        Password accepted for password authentication; any public key is accepted.
+    outputs: dict
+        Command -> stdout mapping; unknown commands echo the command back.
+    """
+
+    def __init__(self, latency: float = 0.0, password: str = "bench", outputs: Optional[Dict[str, str]] = None):
+        self.latency = latency
+        self.password = password
+        self.outputs = dict(DEFAULT_OUTPUT, **(outputs or {}))
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.commands_run = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(512)
+        self.port = self._sock.getsockname()[1]
+        self._stopped = threading.Event()
+        self._transports = []
+        # Accepted channels waiting for their exec request; paramiko closes
+        # a Channel once it is garbage collected.
+        self._open_channels = set()
+        self._forwards: Dict[int, tuple] = {}
+        self.tunnels = 0
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+
+    def start(self) -> "StubSSHServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+        for transport in list(self._transports):
+            transport.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket):
+        transport = StubTransport(client, self)
+        transport.set_log_channel(LOG_CHANNEL)
+        transport.add_server_key(self.host_key)
+        interface = StubServerInterface(self)
+        try:
+            transport.start_server(server=interface)
+        except (paramiko.SSHException, EOFError, OSError):
+            return
+        with self._lock:
+            self.connections += 1
+            self._transports.append(transport)
+        # Keep accepting channels until the client disconnects.
+        while transport.is_active() and not self._stopped.is_set():
+            channel = transport.accept(timeout=1)
+            if channel is None:
+                continue
+            destination = self._forwards.pop(channel.get_id(), None)
+            if destination is not None:
+                threading.Thread(target=self._forward, args=(channel, destination), daemon=True).start()
+                continue
+            with self._lock:
+                self._open_channels.add(channel)
+        with self._lock:
+            self._transports.remove(transport)
+
+    def _forward(self, channel: paramiko.Channel, destination: tuple):
+        try:
+            upstream = socket.create_connection(destination)
+        except OSError:
+            channel.close()
+            return
+        with self._lock:
+            self.tunnels += 1
+
+        def pump(source, sink):
+            try:
+                while True:
+                    data = source.recv(32768)
+                    if not data:
+                        break
+                    sink.sendall(data)
+            except (OSError, EOFError):
+                pass
+            finally:
+                channel.close()
+                upstream.close()
+
+        threading.Thread(target=pump, args=(upstream, channel), daemon=True).start()
+        pump(channel, upstream)
+
+    def _run_command(self, channel: paramiko.Channel, command: bytes):
+        text = command.decode(errors="replace")
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            channel.sendall(self.outputs.get(text, text + "\n").encode())
+            channel.send_exit_status(0)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            channel.close()
+            with self._lock:
+                self._open_channels.discard(channel)
+                self.commands_run += 1
@@ -1,69 +1,223 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Size of the text chunks read while streaming phrase replacements.
+CHUNK_SIZE = 1024 * 1024
+
+
+@contextmanager
+def _atomic_rewrite(file_path):
+    """
+    Yields a writable temp file next to file_path and atomically renames it over
+    file_path on success, so the original is never truncated mid-edit.
+
+    :param file_path: Path to the file being rewritten.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(file_path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline='') as temp_file:
+            yield temp_file
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def _count_newlines(buffer, start, end):
+    """Counts newlines in buffer[start:end] without copying the whole range at once."""
+    count = 0
+    while start < end:
+        stop = min(start + CHUNK_SIZE, end)
+        count += buffer[start:stop].count(b'\n')
+        start = stop
+    return count
+
+
+def _replace_line(line, target_phrase, new_line):
+    return new_line + '\n' if target_phrase in line else line
+
+
+def _add_text_to_end_of_line(line, target_phrase, text_to_add):
+    return line.strip() + ' ' + text_to_add + '\n' if target_phrase in line else line
+
+
+def _replace_phrase(line, target_phrase, replacement_phrase):
+    return line.replace(target_phrase, replacement_phrase)
+
+
 class FileEditor:
     @staticmethod
     def append_text_to_file(file_path, text):
         """
         Appends given text to the end of the file specified by file_path.
-        
+
         :param file_path: Path to the file to append the text to.
         :param text: Text to be appended.
         """
         with open(file_path, 'a') as file:
             file.write(text + '\n')
 
+    @staticmethod
+    def search_file(file_path, target_phrase):
+        """
+        Returns (line_number, line) pairs for every line containing target_phrase.
+
+        The file is memory-mapped and scanned with mmap.find, so only the matching
+        lines are decoded and the file is never loaded into memory as a whole.
+
+        :param file_path: Path to the file to search.
+        :param target_phrase: The phrase to look for.
+        :return: List of (1-based line number, line text without the newline) tuples.
+        """
+        needle = target_phrase.encode()
+        if not needle or os.path.getsize(file_path) == 0:
+            return []
+
+        matches = []
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            line_number = 1
+            counted_to = 0
+            position = mm.find(needle)
+            while position != -1:
+                line_start = mm.rfind(b'\n', 0, position) + 1
+                line_end = mm.find(b'\n', position)
+                if line_end == -1:
+                    line_end = len(mm)
+                line_number += _count_newlines(mm, counted_to, line_start)
+                counted_to = line_start
+                matches.append((line_number, mm[line_start:line_end].decode(errors='replace').rstrip('\r')))
+                position = mm.find(needle, line_end)
+        return matches
+
+    @staticmethod
+    def contains_phrase(file_path, target_phrase):
+        """
+        Returns True if target_phrase occurs anywhere in the file, using a memory-mapped scan.
+
+        :param file_path: Path to the file to search.
+        :param target_phrase: The phrase to look for.
+        """
+        needle = target_phrase.encode()
+        if os.path.getsize(file_path) == 0:
+            return not needle
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(needle) != -1
+
     @staticmethod
     def replace_phrase_in_file(file_path, target_phrase, replacement_phrase):
         """
         Replaces all instances of target_phrase with replacement_phrase in the file specified by file_path.
-        
+
+        The file is streamed in chunks into a temp file which then replaces the original,
+        so memory use is bounded by CHUNK_SIZE and matches spanning chunk boundaries are kept.
+
         :param file_path: Path to the file where the replacement should occur.
         :param target_phrase: The phrase to be replaced.
         :param replacement_phrase: The phrase to replace with.
         """
-        with open(file_path, 'r') as file:
-            file_contents = file.read()
-        
-        file_contents = file_contents.replace(target_phrase, replacement_phrase)
-        
-        with open(file_path, 'w') as file:
-            file.write(file_contents)
+        if not target_phrase:
+            raise ValueError("target_phrase must not be empty")
+        if not FileEditor.contains_phrase(file_path, target_phrase):
+            return
+
+        # Matches starting before `cut` are guaranteed to be complete in the buffer;
+        # anything after it is carried over to the next chunk.
+        overlap = len(target_phrase) - 1
+        with open(file_path, 'r', newline='') as source, _atomic_rewrite(file_path) as target:
+            pending = ''
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    target.write(pending.replace(target_phrase, replacement_phrase))
+                    break
+                buffer = pending + chunk
+                cut = len(buffer) - overlap
+                position = 0
+                while True:
+                    index = buffer.find(target_phrase, position)
+                    if index == -1 or index >= cut:
+                        break
+                    target.write(buffer[position:index])
+                    target.write(replacement_phrase)
+                    position = index + len(target_phrase)
+                keep_from = max(position, cut)
+                target.write(buffer[position:keep_from])
+                pending = buffer[keep_from:]
 
     @staticmethod
     def replace_line_in_file(file_path, target_phrase, new_line):
         """
         Replaces an entire line containing the target_phrase with new_line in the file specified by file_path.
-        
+
         :param file_path: Path to the file where the replacement should occur.
         :param target_phrase: The phrase that identifies the line to be replaced.
         :param new_line: The new line that will replace the old line.
         """
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-        
-        with open(file_path, 'w') as file:
-            for line in lines:
-                if target_phrase in line:
-                    file.write(new_line + '\n')
-                else:
-                    file.write(line)
+        FileEditor.apply_edits(file_path, [('replace-line', target_phrase, new_line)])
 
     @staticmethod
     def add_text_to_end_of_line(file_path, target_phrase, text_to_add):
         """
         Adds text to the end of lines containing the target_phrase in the file specified by file_path.
-        
+
         :param file_path: Path to the file where the text should be added.
         :param target_phrase: The phrase that identifies the lines to be modified.
         :param text_to_add: The text to add to the end of the identified lines.
         """
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-        
-        with open(file_path, 'w') as file:
-            for line in lines:
-                if target_phrase in line:
-                    file.write(line.strip() + ' ' + text_to_add + '\n')
-                else:
-                    file.write(line)
+        FileEditor.apply_edits(file_path, [('add-text-to-end-of-line', target_phrase, text_to_add)])
+
+    @staticmethod
+    def apply_edits(file_path, edits):
+        """
+        Applies many edits to the file in a single streaming pass.
+
+        Each edit is an (operation, *arguments) sequence using the CLI operation names:
+        replace-phrase, replace-line, add-text-to-end-of-line and append-text. Line edits
+        are applied to every line in the order given, which gives the same result as
+        running the operations one after another. Phrases must not span lines.
+
+        :param file_path: Path to the file to edit.
+        :param edits: Iterable of (operation, *arguments) sequences.
+        """
+        line_operations = {
+            'replace-phrase': _replace_phrase,
+            'replace-line': _replace_line,
+            'add-text-to-end-of-line': _add_text_to_end_of_line,
+        }
+        line_edits = []
+        appended = []
+        for operation, *args in edits:
+            if operation == 'append-text':
+                appended.append(args[0] + '\n')
+            elif operation in line_operations:
+                if '\n' in args[0]:
+                    raise ValueError(f"{operation}: target phrase must not span lines")
+                line_edits.append((line_operations[operation], args[0], args[1]))
+            else:
+                raise ValueError(f"Unknown operation: {operation}")
+
+        if line_edits and not any(FileEditor.contains_phrase(file_path, target) for _, target, _ in line_edits):
+            line_edits = []
+        if not line_edits:
+            for text in appended:
+                FileEditor.append_text_to_file(file_path, text[:-1])
+            return
+
+        with open(file_path, 'r', newline='') as source, _atomic_rewrite(file_path) as target:
+            for line in source:
+                for edit, target_phrase, argument in line_edits:
+                    line = edit(line, target_phrase, argument)
+                target.write(line)
+            target.writelines(appended)
 
 import sys
 
@@ -75,6 +229,8 @@ if __name__ == '__main__':
         print("  replace-phrase <file_path> <target_phrase> <replacement_phrase> - Replace a phrase in a file")
         print("  replace-line <file_path> <target_phrase> <new_line> - Replace an entire line in a file")
         print("  add-text-to-end-of-line <file_path> <target_phrase> <text_to_add> - Add text to the end of a line in a file")
+        print("  search <file_path> <target_phrase> - Print the lines containing a phrase")
+        print("  batch <file_path> <edits_json> - Apply a JSON list of [operation, args...] edits in one pass")
         sys.exit(1)
 
     operation = sys.argv[1]
@@ -89,5 +245,11 @@ if __name__ == '__main__':
 
     if operation in operations:
         operations[operation](*args)
+    elif operation == 'search':
+        for line_number, line in FileEditor.search_file(*args):
+            print(f"{line_number}: {line}")
+    elif operation == 'batch':
+        with open(args[1], 'r') as edits_file:
+            FileEditor.apply_edits(args[0], json.load(edits_file))
     else:
-        print(f"Unknown operation: {operation}")
\ No newline at end of file
+        print(f"Unknown operation: {operation}")
@@ -1,29 +1,75 @@
-from fastapi import FastAPI, Depends, HTTPException, Body
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Body, WebSocket, WebSocketException, status
 from fastapi.security import APIKeyHeader
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 import os
-import paramiko
+import json
+import asyncio
+import logging
+import tempfile
 import subprocess
-import platform
+from typing import TYPE_CHECKING, Optional
 
 from session_manager import SSHSessionManager
 from app.routers.servers import router as servers_router
+from app.routers.fleet import router as fleet_router, ws_router as fleet_ws_router
+from app.routers.metrics import router as metrics_router
+from app.routers.health import router as health_router
+from app.routers.ssh import router as ssh_router, ws_router as ssh_ws_router
+from app.routers.scripts import router as scripts_router
 from app.database import get_db
+from app.metrics import COMMANDS_IN_FLIGHT, SSH_PHASE_SECONDS, SSH_SESSIONS, MetricsMiddleware
+from app.services.collector import collector, inventory_targets
+from app.services.command_cache import command_cache
+from app.services.health_history import record_healthz
+from app.services.inventory_sync import servers_json_version
+from app.services.prober import probe_hosts_sync
+from app.services.scripts import run_script, script_store
+from app.services.warmup import SSH_WARMUP_SELECTOR, parse_selector, start_warmup
+from app.ssh.breaker import breakers
+from app.ssh.broker import BROKER_ADDRESS, broker_client, ensure_broker, session_owner
+from app.ssh.client import connect_server, find_server
+from app.ssh.scheduler import command_scheduler
+
+if TYPE_CHECKING:
+    import paramiko  # imported lazily on first SSH use
 
 load_dotenv()  # Load environment variables from .env file
 
 API_KEY = os.getenv("API_KEY")
 
-app = FastAPI()
+COLLECTOR_INTERVAL = float(os.getenv("COLLECTOR_INTERVAL", "0"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work lives here rather than at import time
+    get_servers()
+    # With several workers, SSH sessions live in one shared broker process
+    if BROKER_ADDRESS:
+        await asyncio.to_thread(ensure_broker, BROKER_ADDRESS)
+    # Open pooled sessions to e.g. "role=prod,status=online" servers before traffic needs them
+    if SSH_WARMUP_SELECTOR:
+        start_warmup(parse_selector(SSH_WARMUP_SELECTOR))
+    # Periodic fleet metrics collection is opt-in via COLLECTOR_INTERVAL (seconds);
+    # with a broker, the broker collects once for all workers
+    if COLLECTOR_INTERVAL > 0 and not BROKER_ADDRESS:
+        collector.start(COLLECTOR_INTERVAL, inventory_targets)
+    yield
+    collector.stop()
+    breakers.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 session_manager = SSHSessionManager()
+SSH_SESSIONS.set_function(lambda: len(session_manager.sessions), pool="session_manager")
 
 # API key authentication
 api_key_header = APIKeyHeader(name="Authorization")
 
-import json
-
 # Function to load server configurations from servers.json
 def load_server_configs():
     with open("servers.json", "r") as f:
@@ -31,31 +77,47 @@ def load_server_configs():
 
 # Function to save server configurations to servers.json
 def save_server_configs(configs):
-    with open("servers.json", "w") as f:
+    # Write to a temp file and rename so other workers never read a partial file
+    fd, temp_path = tempfile.mkstemp(prefix=".servers.", suffix=".json", dir=".")
+    with os.fdopen(fd, "w") as f:
         json.dump(configs, f, indent=4)
+    os.replace(temp_path, "servers.json")
+    servers_json_version.bump()
 
-# Load initial server configurations
-servers = load_server_configs()
+# Server configurations, loaded on startup (or first use) rather than at import
+servers = None
+_servers_version = None
+
+
+def get_servers() -> dict:
+    """Return the servers.json configurations, reloading them when another worker changed them."""
+    global servers, _servers_version
+    version = servers_json_version.current()
+    if servers is None or (_servers_version is not None and version != _servers_version):
+        try:
+            servers = load_server_configs()
+        except FileNotFoundError:
+            logging.warning("servers.json not found in %s; starting with no legacy servers", os.getcwd())
+            servers = {}
+        _servers_version = version
+    return servers
 
 
 def ping_vps(hostname: str) -> bool:
-    """Return True if the host responds to a single ping."""
-    # Platform-specific parameters for ping command
-    count_param = "-n" if platform.system().lower() == "windows" else "-c"
-    timeout_param = "-w" if platform.system().lower() == "windows" else "-W"
-    try:
-        subprocess.check_call(
-            ["ping", count_param, "1", timeout_param, "1", hostname],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    """Return True if the host responds to a single probe."""
+    return probe_hosts_sync([hostname])[hostname].reachable
 
 def get_api_key(api_key: str = Depends(api_key_header)):
     if API_KEY is None or api_key != API_KEY:
         raise HTTPException(status_code=401, detail="That API key is invalid. Try again.")
+    return api_key
+
+def get_websocket_api_key(websocket: WebSocket):
+    # Browsers cannot set headers on WebSocket requests, so also accept ?api_key=
+    api_key = websocket.headers.get("Authorization") or websocket.query_params.get("api_key")
+    if API_KEY is None or api_key != API_KEY:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="That API key is invalid. Try again.")
+    return api_key
 
 @app.get("/")
 def read_root():
@@ -101,46 +163,10 @@ def connect_to_ssh(server_name: str, db: Session):
         Connected SSH client.
     """
 
-    from app.models.server import Server
-
-    server = (
-        db.query(Server)
-        .filter((Server.hostname == server_name) | (Server.public_ip == server_name))
-        .first()
-    )
-    if not server:
-        raise HTTPException(status_code=404, detail="Server not found")
-
-    tags = server.tags or {}
-    username = tags.get("username", "root")
-    auth_type = tags.get("auth_type", "key")
-    key_filename = tags.get("key_filename")
-    password_env = tags.get("password_env")
-
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    server = find_server(db, server_name)
+    return connect_server(server.hostname, server.tags)
 
-    try:
-        if auth_type == "key":
-            if not key_filename:
-                raise HTTPException(status_code=500, detail="Missing SSH key path")
-            ssh_client.connect(hostname=server.hostname, username=username, key_filename=key_filename)
-        elif auth_type == "password":
-            if not password_env:
-                raise HTTPException(status_code=500, detail="Missing password environment variable")
-            env_password = os.getenv(password_env)
-            if env_password is None:
-                raise HTTPException(status_code=500, detail=f"Environment variable '{password_env}' not set")
-            ssh_client.connect(hostname=server.hostname, username=username, password=env_password)
-        else:
-            raise ValueError("Invalid authentication type")
-        return ssh_client
-    except paramiko.AuthenticationException:
-        raise HTTPException(status_code=401, detail="Authentication failed")
-    except paramiko.SSHException as error:
-        raise HTTPException(status_code=500, detail=f"SSH connection error: {str(error)}")
-
-def execute_remote_command(ssh_client: paramiko.SSHClient, command: str) -> list:
+def execute_remote_command(ssh_client: "paramiko.SSHClient", command: str) -> list:
     """Execute a command on the remote server and return its output lines.
 
     Parameters
@@ -155,9 +181,12 @@ def execute_remote_command(ssh_client: paramiko.SSHClient, command: str) -> list
     list
         Lines of output produced by the command.
     """
+    import paramiko
+
     try:
-        stdin, stdout, stderr = ssh_client.exec_command(command)
-        output = stdout.readlines()
+        with COMMANDS_IN_FLIGHT.track_inprogress(), SSH_PHASE_SECONDS.time(phase="exec"):
+            stdin, stdout, stderr = ssh_client.exec_command(command)
+            output = stdout.readlines()
         return output
     except paramiko.SSHException as error:
         raise HTTPException(status_code=500, detail=f"Command execution error: {str(error)}")
@@ -165,23 +194,77 @@ def execute_remote_command(ssh_client: paramiko.SSHClient, command: str) -> list
 class ServerCommandRequest(BaseModel):
     server_name: str
     command: str
+    # Opt-in: accept a cached result up to this many seconds old (0 only coalesces concurrent calls)
+    max_age: Optional[float] = Field(default=None, ge=0)
 
 class CommandOutput(BaseModel):
     output: list[str]
+    queue_wait_ms: Optional[float] = None
+    cached: bool = False
 
-@app.post(
-    "/ssh_execute/server_command",
-    response_model=CommandOutput,
-    dependencies=[Depends(get_api_key)],
-)
+@app.post("/ssh_execute/server_command", response_model=CommandOutput)
 def execute_server_command(
-    request: ServerCommandRequest, db: Session = Depends(get_db)
+    request: ServerCommandRequest, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)
 ):
-    """Execute a shell command on the specified server via SSH."""
+    """Execute a shell command on the specified server via SSH.
+
+    Commands are admitted by the scheduler (per-host and global caps, fair
+    across hosts and API keys) and run on the host's shared transport;
+    ``queue_wait_ms`` reports how long the command waited for a slot.
+
+    With ``max_age`` set, identical (server, command) requests share one
+    execution and reuse its result for up to ``max_age`` seconds; only use
+    it for read-only commands.
+    """
     try:
-        with connect_to_ssh(request.server_name, db) as ssh_client:
-            output = execute_remote_command(ssh_client, request.command)
-        return CommandOutput(output=output)
+        server = find_server(db, request.server_name)
+        runner = broker_client if broker_client is not None else command_scheduler
+
+        def run():
+            return runner.run(server.hostname, server.tags, request.command, api_key)
+
+        if request.max_age is None:
+            (output, waited), cached = run(), False
+        else:
+            (output, waited), cached = command_cache.get_or_run((server.id, request.command), request.max_age, run)
+        return CommandOutput(output=output, queue_wait_ms=round(waited * 1000, 3), cached=cached)
+    except HTTPException as http_error:
+        raise http_error
+    except Exception as error:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(error)}")
+
+
+class ScriptRunRequest(BaseModel):
+    server_name: str
+    sha256: str
+    args: list[str] = []
+
+class ScriptOutput(BaseModel):
+    output: list[str]
+    uploaded: bool
+    queue_wait_ms: float
+
+@app.post("/ssh_execute/script", response_model=ScriptOutput)
+def execute_script(request: ScriptRunRequest, db: Session = Depends(get_db), api_key: str = Depends(get_api_key)):
+    """Run a script stored via ``POST /scripts`` on a server, by hash.
+
+    The script is uploaded to the host's hash-addressed cache only the first
+    time; later runs send just the hash and ``args``. ``uploaded`` reports
+    whether this run had to upload it.
+    """
+    try:
+        server = find_server(db, request.server_name)
+        runner = broker_client if broker_client is not None else command_scheduler
+        waited = 0.0
+
+        def execute(command):
+            nonlocal waited
+            output, wait = runner.run(server.hostname, server.tags, command, api_key)
+            waited += wait
+            return output
+
+        output, uploaded = run_script(script_store, request.sha256, request.args, server.tags, execute)
+        return ScriptOutput(output=output, uploaded=uploaded, queue_wait_ms=round(waited * 1000, 3))
     except HTTPException as http_error:
         raise http_error
     except Exception as error:
@@ -254,6 +337,9 @@ def list_open_sessions():
     Lists all open SSH sessions.
     """
     try:
+        if broker_client is not None:
+            # The broker owns all pooled sessions, so every worker gives the same answer
+            return {"open_sessions": session_manager.get_open_sessions(), "pooled_sessions": broker_client.sessions()}
         return {"open_sessions": session_manager.get_open_sessions()}
     except Exception as error:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(error)}")
@@ -263,7 +349,7 @@ def list_servers():
     """
     Returns a list of available servers.
     """
-    return {"servers": list(servers.keys())}
+    return {"servers": list(get_servers().keys())}
 
 class RenameServerRequest(BaseModel):
     old_name: str
@@ -274,6 +360,7 @@ def rename_server(request: RenameServerRequest):
     """
     Renames a server configuration.
     """
+    servers = get_servers()
     if request.old_name not in servers:
         raise HTTPException(status_code=404, detail="Server not found")
     if request.new_name in servers:
@@ -287,21 +374,37 @@ def rename_server(request: RenameServerRequest):
 @app.get("/healthz")
 def healthz(db: Session = Depends(get_db)):
     """Ping all registered servers and report their reachability, hostname, and uptime."""
+    import paramiko
+
+    servers = get_servers()
     host_status = {}
+    # Probe every host concurrently up front instead of one ping per loop iteration
+    probes = probe_hosts_sync(
+        [config["hostname"] for config in servers.values()],
+        ports={config["hostname"]: int(config.get("port", 22)) for config in servers.values()},
+    )
     for name, config in servers.items():
-        # First, ping the server to check for reachability
-        reachable = ping_vps(config["hostname"])
-        host_status[name] = {"ping_reachable": reachable}
+        probe = probes[config["hostname"]]
+        host_status[name] = {
+            "ping_reachable": probe.reachable,
+            "probe": probe.as_dict(),
+        }
 
         # Always attempt to connect via SSH to get hostname and uptime
         try:
-            with connect_to_ssh(name, db) as ssh_client:
-                hostname_output = execute_remote_command(ssh_client, "hostname")
-                uptime_output = execute_remote_command(ssh_client, "uptime -p")
-
-                host_status[name]["ssh_successful"] = True
-                host_status[name]["hostname"] = hostname_output[0].strip() if hostname_output else "N/A"
-                host_status[name]["uptime"] = uptime_output[0].strip() if uptime_output else "N/A"
+            server = find_server(db, name)
+            # One channel on the host's pooled transport for all values
+            output = session_owner.execute(
+                server.hostname, server.tags, "hostname; uptime -p; cut -d' ' -f1 /proc/uptime"
+            )
+
+            host_status[name]["ssh_successful"] = True
+            host_status[name]["hostname"] = output[0].strip() if len(output) > 0 else "N/A"
+            host_status[name]["uptime"] = output[1].strip() if len(output) > 1 else "N/A"
+            try:
+                host_status[name]["uptime_seconds"] = float(output[2])
+            except (IndexError, ValueError):
+                pass
 
         except FileNotFoundError as e:
             host_status[name]["ssh_successful"] = False
@@ -322,12 +425,26 @@ def healthz(db: Session = Depends(get_db)):
             host_status[name]["ssh_successful"] = False
             host_status[name]["error"] = f"Unexpected error: {str(e)}"
 
+    # Keep a history of every check; a storage failure must not fail the health check
+    try:
+        record_healthz(db, host_status)
+    except Exception:
+        db.rollback()
+
     # Overall status is OK if all hosts were successfully contacted via SSH
     overall = "OK" if all(h.get("ssh_successful") for h in host_status.values()) else "NOT_OK"
     return {"status": overall, "hosts": host_status}
 
 # include server inventory router with API key auth
 app.include_router(servers_router, dependencies=[Depends(get_api_key)])
+app.include_router(fleet_router, dependencies=[Depends(get_api_key)])
+app.include_router(fleet_ws_router, dependencies=[Depends(get_websocket_api_key)])
+app.include_router(health_router, dependencies=[Depends(get_api_key)])
+app.include_router(ssh_router, dependencies=[Depends(get_api_key)])
+app.include_router(ssh_ws_router, dependencies=[Depends(get_websocket_api_key)])
+app.include_router(scripts_router, dependencies=[Depends(get_api_key)])
+# metrics are scraped without an API key, like /healthz
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
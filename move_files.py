@@ -1,47 +1,354 @@
 import os
+import json
 import time
+import errno
 import shutil
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def move_files_with_delay(source_dir, dest_dir, delay_seconds):
+LOG_FILE = '/app/file_move.log'
+
+# Buffer used for cross-device copies when the kernel copy paths are unavailable.
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. consume() blocks until enough tokens are available.
+    A rate of None disables limiting.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount=1):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Requests larger than the bucket are let through once it is full,
+                # otherwise a single big file could never be moved.
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class MoveManifest:
+    """
+    Append-only JSON-lines checkpoint of a migration.
+
+    Records the planned file list once the source tree has been scanned and every
+    completed move, so an interrupted run resumes without rescanning the source or
+    retrying finished files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.planned = {}
+        self.done = set()
+        self.scanned = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, 'a')
+
+    def _load(self):
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line from a crash
+                if entry['op'] == 'plan':
+                    self.planned[entry['path']] = entry['size']
+                elif entry['op'] == 'scanned':
+                    self.scanned = True
+                elif entry['op'] == 'done':
+                    self.done.add(entry['path'])
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def record_plan(self, relative_path, size):
+        self.planned[relative_path] = size
+        self._write({'op': 'plan', 'path': relative_path, 'size': size})
+
+    def mark_scanned(self):
+        self.scanned = True
+        self._write({'op': 'scanned'})
+
+    def mark_renamed(self, relative_path):
+        self._write({'op': 'renamed', 'path': relative_path})
+
+    def mark_done(self, relative_path):
+        with self._lock:
+            self.done.add(relative_path)
+        self._write({'op': 'done', 'path': relative_path})
+
+    def pending(self):
+        return [(path, size) for path, size in self.planned.items() if path not in self.done]
+
+    def close(self):
+        self._file.close()
+
+
+class MoveStats:
+    """Counters shared by the workers, used for progress and throughput reporting."""
+
+    def __init__(self, total_files=0, total_bytes=0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.renamed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, size):
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.files}/{self.total_files} files, "
+            f"{self.bytes / 1e6:.1f}/{self.total_bytes / 1e6:.1f} MB, "
+            f"{self.renamed} whole entries renamed, "
+            f"{self.errors} errors, "
+            f"{self.files / elapsed:.1f} files/s, {self.bytes / elapsed / 1e6:.2f} MB/s"
+        )
+
+
+def file_checksum(path):
+    """Returns the SHA-256 hex digest of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(COPY_BUFFER_SIZE)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+def copy_file(source_path, dest_path):
+    """
+    Copies file contents using copy_file_range or sendfile where the platform has them,
+    falling back to a large-buffer userspace copy.
     """
-    Moves all files from source_dir to dest_dir while preserving directory structure.
+    with open(source_path, 'rb') as source, open(dest_path, 'wb') as dest:
+        remaining = os.fstat(source.fileno()).st_size
+        kernel_copy = getattr(os, 'copy_file_range', None)
+        if kernel_copy is None and hasattr(os, 'sendfile') and os.uname().sysname == 'Linux':
+            kernel_copy = lambda src, dst, count: os.sendfile(dst, src, None, count)  # noqa: E731
+        if kernel_copy is not None:
+            try:
+                while remaining > 0:
+                    copied = kernel_copy(source.fileno(), dest.fileno(), min(remaining, 1 << 30))
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining <= 0:
+                    return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                    raise
+            # Restart from scratch with a plain copy if the kernel path bailed out.
+            source.seek(0)
+            dest.seek(0)
+            dest.truncate()
+        shutil.copyfileobj(source, dest, COPY_BUFFER_SIZE)
+
+
+def move_file(source_path, dest_path, verify=False):
+    """
+    Moves one file. Same-filesystem moves are a metadata-only rename; cross-device
+    moves copy to a .part file, optionally compare checksums, rename the copy into
+    place and only then unlink the source.
+
+    :return: 'renamed' or 'copied'.
+    """
+    try:
+        os.replace(source_path, dest_path)
+        return 'renamed'
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    part_path = dest_path + '.part'
+    try:
+        copy_file(source_path, part_path)
+        shutil.copystat(source_path, part_path)
+        if verify and file_checksum(source_path) != file_checksum(part_path):
+            raise IOError(f"Checksum mismatch copying {source_path}")
+        os.replace(part_path, dest_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.unlink(part_path)
+        raise
+    os.unlink(source_path)
+    return 'copied'
+
+
+def rename_tree(source_dir, dest_dir, relative='', renamed=None):
+    """
+    Renames whole subtrees of source_dir into dest_dir when they don't exist at the
+    destination yet, recursing only into directories present on both sides. Only
+    valid when both directories are on the same filesystem.
+
+    :return: List of relative paths that were renamed in one step.
+    """
+    renamed = [] if renamed is None else renamed
+    with os.scandir(os.path.join(source_dir, relative)) as entries:
+        entries = list(entries)
+    for entry in entries:
+        entry_relative = os.path.join(relative, entry.name)
+        dest_path = os.path.join(dest_dir, entry_relative)
+        if not os.path.lexists(dest_path):
+            os.rename(entry.path, dest_path)
+            renamed.append(entry_relative)
+        elif entry.is_dir(follow_symlinks=False) and os.path.isdir(dest_path):
+            rename_tree(source_dir, dest_dir, entry_relative, renamed)
+    return renamed
+
+
+def scan_source(source_dir):
+    """Yields (relative_path, size) for every file below source_dir."""
+    stack = [source_dir]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    yield os.path.relpath(entry.path, source_dir), entry.stat(follow_symlinks=False).st_size
+
+
+def move_files_parallel(source_dir, dest_dir, workers=8, files_per_sec=None, bytes_per_sec=None,
+                        manifest_path=None, progress_interval=10.0, verify=False):
     """
-    logging.basicConfig(filename='/app/file_move.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    Moves all files from source_dir to dest_dir while preserving directory structure,
+    using a pool of workers throttled by files/sec and bytes/sec token buckets.
 
+    :param source_dir: Directory to move files from.
+    :param dest_dir: Directory to move files into.
+    :param workers: Number of concurrent move workers.
+    :param files_per_sec: Maximum files started per second, or None for unlimited.
+    :param bytes_per_sec: Maximum bytes started per second, or None for unlimited.
+    :param manifest_path: Checkpoint file; defaults to .move_manifest.jsonl in dest_dir.
+    :param progress_interval: Seconds between progress reports.
+    :param verify: Compare SHA-256 checksums before unlinking sources of cross-device copies.
+    :return: The final MoveStats.
+    """
     print(f"Starting file transfer from {source_dir} to {dest_dir}...")
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = MoveManifest(manifest_path or os.path.join(dest_dir, '.move_manifest.jsonl'))
+
+    # On the same filesystem, move whole directories with a single rename each
+    # and leave only the entries that collide with the destination to the workers.
+    renamed = []
+    if os.stat(source_dir).st_dev == os.stat(dest_dir).st_dev:
+        renamed = rename_tree(source_dir, dest_dir)
+        for relative_path in renamed:
+            manifest.mark_renamed(relative_path)
+            logging.info(f"Renamed: {os.path.join(source_dir, relative_path)} -> {os.path.join(dest_dir, relative_path)}")
+
+    if not manifest.scanned:
+        for relative_path, size in scan_source(source_dir):
+            if relative_path not in manifest.planned:
+                manifest.record_plan(relative_path, size)
+        manifest.mark_scanned()
+
+    pending = manifest.pending()
+    stats = MoveStats(len(pending), sum(size for _, size in pending))
+    stats.renamed = len(renamed)
+    if len(pending) < len(manifest.planned):
+        print(f"Resuming: {len(manifest.planned) - len(pending)} files already moved.")
+
+    file_bucket = TokenBucket(files_per_sec)
+    byte_bucket = TokenBucket(bytes_per_sec)
+    # Bound the number of queued moves so huge trees don't create a future per file up front.
+    slots = threading.BoundedSemaphore(workers * 4)
 
+    def move_one(relative_path, size):
+        source_path = os.path.join(source_dir, relative_path)
+        dest_path = os.path.join(dest_dir, relative_path)
+        try:
+            file_bucket.consume(1)
+            byte_bucket.consume(size)
+            if os.path.exists(source_path):
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                method = move_file(source_path, dest_path, verify=verify)
+                logging.info(f"Moved ({method}): {source_path} -> {dest_path}")
+            elif not os.path.exists(dest_path):
+                raise FileNotFoundError(source_path)
+            manifest.mark_done(relative_path)
+            stats.add(size)
+        except Exception as e:
+            stats.add_error()
+            logging.error(f"Error moving {source_path}: {e}")
+            print(f"Error moving {source_path}: {e}")
+        finally:
+            slots.release()
+
+    finished = threading.Event()
+
+    def report_progress():
+        while not finished.wait(progress_interval):
+            print(f"Progress: {stats.summary()}")
+            logging.info(f"Progress: {stats.summary()}")
+
+    reporter = threading.Thread(target=report_progress, daemon=True)
+    reporter.start()
     try:
-        for root, _, files in os.walk(source_dir):
-            for filename in files:
-                source_path = os.path.join(root, filename)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for relative_path, size in pending:
+                slots.acquire()
+                executor.submit(move_one, relative_path, size)
+    finally:
+        finished.set()
+        reporter.join()
+        manifest.close()
 
-                # Get relative path of the file inside source_dir
-                relative_path = os.path.relpath(source_path, source_dir)
-                dest_path = os.path.join(dest_dir, relative_path)
+    logging.info(f"Finished {source_dir} -> {dest_dir}: {stats.summary()}")
+    print(f"Finished file transfer from {source_dir} to {dest_dir}: {stats.summary()}\n")
+    return stats
 
-                try:
-                    # Create necessary directories in the destination
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-                    # Move file while keeping structure
-                    shutil.move(source_path, dest_path)
-                    logging.info(f"Moved: {source_path} -> {dest_path}")
-                    print(f"Moved: {source_path} -> {dest_path}")
-                    
-                    time.sleep(delay_seconds)  # Delay between moves
-                except Exception as e:
-                    logging.error(f"Error moving {source_path}: {e}")
-                    print(f"Error moving {source_path}: {e}")
-
-    except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
-        print(f"An unexpected error occurred: {e}")
-
-    print(f"Finished file transfer from {source_dir} to {dest_dir}.\n")
-
-# Move OneDrive files to HiDrive (keeping structure)
-move_files_with_delay("/app/onedrive", "/app/hidrive/onedrive", 5)
-
-# Move Google Drive files to HiDrive (keeping structure)
-move_files_with_delay("/app/gdrive", "/app/hidrive/googledrive", 5)
\ No newline at end of file
+
+def move_files_with_delay(source_dir, dest_dir, delay_seconds):
+    """
+    Moves all files from source_dir to dest_dir while preserving directory structure,
+    one file at a time and at most one file every delay_seconds.
+    """
+    files_per_sec = 1.0 / delay_seconds if delay_seconds else None
+    return move_files_parallel(source_dir, dest_dir, workers=1, files_per_sec=files_per_sec)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Move OneDrive files to HiDrive (keeping structure)
+    move_files_parallel("/app/onedrive", "/app/hidrive/onedrive", workers=8, bytes_per_sec=50 * 1024 * 1024)
+
+    # Move Google Drive files to HiDrive (keeping structure)
+    move_files_parallel("/app/gdrive", "/app/hidrive/googledrive", workers=8, bytes_per_sec=50 * 1024 * 1024)
@@ -1,6 +1,10 @@
-import paramiko
 import os
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
+
+from app.ssh.keys import host_key_store, load_private_key
+
+if TYPE_CHECKING:
+    import paramiko
 
 # Server configurations
 servers = {
@@ -29,16 +33,19 @@ def connect_to_ssh(server_name):
     if server_name not in servers:
         raise ValueError("Invalid server name")  # Raise ValueError for internal errors
     
+    import paramiko  # imported on first use to keep application startup fast
+
     server = servers[server_name]
     ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    
+    # Same pinned known_hosts store as the inventory-backed connections
+    ssh_client.set_missing_host_key_policy(host_key_store.policy())
+
     try:
         if server["auth_type"] == "key":
             ssh_client.connect(
                 hostname=server["hostname"],
                 username=server["username"],
-                key_filename=server["key_filename"],
+                pkey=load_private_key(server["key_filename"]),
             )
         elif server["auth_type"] == "password":
             env_password = os.getenv(server["password"])
@@ -62,9 +69,9 @@ def connect_to_ssh(server_name):
 
 class SSHSessionManager:
     def __init__(self):
-        self.sessions: Dict[str, paramiko.SSHClient] = {}
+        self.sessions: Dict[str, "paramiko.SSHClient"] = {}
 
-    def get_session(self, server_name: str) -> paramiko.SSHClient:
+    def get_session(self, server_name: str) -> "paramiko.SSHClient":
         if server_name not in self.sessions:
             self.sessions[server_name] = connect_to_ssh(server_name)
         return self.sessions[server_name]
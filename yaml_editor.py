@@ -10,74 +10,92 @@ Usage Examples:
 - Update an entry: python yaml_editor.py file.yaml update parent child new_value
 - Remove an entry: python yaml_editor.py file.yaml remove parent child
 - Get an entry: python yaml_editor.py file.yaml get parent child
+- Apply a patch list in one write: python yaml_editor.py file.yaml patch edits.yaml
 """
 
+import os
+import shutil
+import tempfile
 import yaml
 import argparse
+from contextlib import contextmanager
 from typing import Any, Union, List
 
+# Prefer the libyaml-backed C loader/dumper when PyYAML was built with it.
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 
 class YamlEditor:
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.data = self.load_yaml()
+        self._transaction_depth = 0
 
     def load_yaml(self) -> Union[dict, list]:
         """Load YAML file into memory."""
         with open(self.file_path, 'r') as file:
-            return yaml.safe_load(file)
+            return yaml.load(file, Loader=SafeLoader)
 
     def save_yaml(self):
-        """Save the current data back to the YAML file."""
-        with open(self.file_path, 'w') as file:
-            yaml.safe_dump(self.data, file)
-
-    def get_entry(self, path: List[str]) -> Any:
-        """Retrieve an entry from the YAML data based on a list of keys."""
-        current_data = self.data
-        for key in path:
-            current_data = current_data.get(key, None)
-            if current_data is None:
-                break
-        return current_data
-
-    def add_entry(self, path: List[str], value: Any):
-        """Add a new entry to the YAML data."""
-        current_data = self.data
-        for key in path[:-1]:
-            current_data = current_data.setdefault(key, {})
-        current_data[path[-1]] = value
+        """Save the current data back to the YAML file.
+
+        Inside a transaction this is deferred until the outermost transaction
+        exits. The document is written to a temp file and renamed into place.
+        """
+        if self._transaction_depth:
+            return
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, temp_path = tempfile.mkstemp(prefix='.yaml_editor.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as file:
+                yaml.dump(self.data, file, Dumper=SafeDumper)
+            if os.path.exists(self.file_path):
+                shutil.copymode(self.file_path, temp_path)
+            os.replace(temp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """Batch edits in memory and write the file once on exit.
+
+        If the block raises, the in-memory data is reloaded from disk and
+        nothing is written.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if not self._transaction_depth:
+                self.data = self.load_yaml()
+            raise
+        self._transaction_depth -= 1
         self.save_yaml()
 
-    def update_entry(self, path: List[str], value: Any):
-        """Update the value of an existing entry."""
-        self.add_entry(path, value)
-
-    def remove_entry(self, path: List[str]):
-        """Remove an entry from the YAML data."""
-        current_data = self.data
-        for key in path[:-1]:
-            current_data = current_data.get(key, None)
-            if current_data is None:
-                return  # Early exit if path does not exist
-        current_data.pop(path[-1], None)
-        self.save_yaml()
-
-
-class YamlEditor:
-    def __init__(self, file_path: str):
-        self.file_path = file_path
-        self.data = self.load_yaml()
-
-    def load_yaml(self) -> Union[dict, list]:
-        """Load YAML file into memory."""
-        with open(self.file_path, 'r') as file:
-            return yaml.safe_load(file)
-
-    def save_yaml(self):
-        """Save the current data back to the YAML file."""
-        with open(self.file_path, 'w') as file:
-            yaml.safe_dump(self.data, file)
+    def apply_patch(self, patch: List[dict]):
+        """Apply a list of {"op", "path", "value"} edits and save once.
+
+        Supported ops are add, update and remove.
+        """
+        operations = {
+            'add': self.add_entry,
+            'update': self.update_entry,
+        }
+        with self.transaction():
+            for edit in patch:
+                op = edit.get('op')
+                if op in operations:
+                    operations[op](edit['path'], edit.get('value'))
+                elif op == 'remove':
+                    self.remove_entry(edit['path'])
+                else:
+                    raise ValueError(f"Unknown patch operation: {op}")
 
     def get_entry(self, path: List[str]) -> Any:
         """Retrieve an entry from the YAML data based on a list of keys."""
@@ -135,6 +153,10 @@ def parse_arguments():
     parser_get = subparsers.add_parser('get', help="Get the value of an entry from the YAML file.")
     parser_get.add_argument('path', nargs='+', help="Path to the entry to retrieve (nested paths separated by space).")
 
+    # Sub-parser for applying a list of edits in a single write
+    parser_patch = subparsers.add_parser('patch', help="Apply a YAML/JSON list of edits and save once.")
+    parser_patch.add_argument('patch_file', help="File containing a list of {op, path, value} edits.")
+
     return parser.parse_args()
 
 
@@ -154,6 +176,11 @@ def main():
     elif args.command == 'get':
         value = editor.get_entry(args.path)
         print(f"Value at {' '.join(args.path)}: {value}")
+    elif args.command == 'patch':
+        with open(args.patch_file, 'r') as file:
+            patch = yaml.load(file, Loader=SafeLoader)
+        editor.apply_patch(patch)
+        print(f"Applied {len(patch)} edits to {args.file_path}")
 
 if __name__ == '__main__':
     main()